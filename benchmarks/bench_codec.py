@@ -0,0 +1,83 @@
+"""
+Micro-benchmark of the JSON codecs in smc.api.codec on engine payloads.
+
+Encoding is measured on an ElementCache holding an engine, as sent by
+update operations, and decoding on the response bytes of an engine GET
+and an element list search. The stdlib codec is compared to the previous
+``json.dumps(cls=CacheEncoder)`` and ``response.json()`` code path and to
+the other available codecs.
+
+Run from the repository root::
+
+    python benchmarks/bench_codec.py [--interfaces 8] [--vlans 16] [--number 200]
+"""
+import os
+import sys
+import json
+import timeit
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from smc.api.codec import CacheEncoder, get_codec  # noqa
+from smc.base.model import ElementCache  # noqa
+import payloads  # noqa
+
+
+def available_codecs():
+    codecs = []
+    for name in ('json', 'orjson'):
+        try:
+            codecs.append(get_codec(name))
+        except ImportError:
+            print('Skipping codec %s, not installed' % name)
+    return codecs
+
+
+def best(stmt, number, repeat=5):
+    """
+    Best time per call in microseconds
+    """
+    return min(timeit.repeat(stmt, number=number, repeat=repeat)) / number * 1e6
+
+
+def report(title, size, results):
+    baseline = results[0][1]
+    print('\n%s (%.1f KB)' % (title, size / 1024.0))
+    print('  %-22s %12s %10s %8s' % ('codec', 'usec/op', 'MB/s', 'speedup'))
+    for name, usec in results:
+        print('  %-22s %12.1f %10.1f %7.1fx' % (
+            name, usec, size / usec, baseline / usec))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--interfaces', type=int, default=8)
+    parser.add_argument('--vlans', type=int, default=16)
+    parser.add_argument('--elements', type=int, default=5000)
+    parser.add_argument('--number', type=int, default=200)
+    args = parser.parse_args()
+
+    codecs = available_codecs()
+    cache = ElementCache(payloads.engine(
+        interfaces=args.interfaces, vlans=args.vlans), etag='1')
+    engine_bytes = json.dumps(cache.data).encode('utf-8')
+    list_bytes = json.dumps(payloads.element_list(args.elements)).encode('utf-8')
+
+    results = [('json (CacheEncoder)', best(
+        lambda: json.dumps(cache, cls=CacheEncoder), args.number))]
+    for codec in codecs:
+        results.append((codec.name, best(lambda: codec.dumps(cache), args.number)))
+    report('Encode engine ElementCache', len(engine_bytes), results)
+
+    for title, body in (('Decode engine response', engine_bytes),
+                        ('Decode element list response', list_bytes)):
+        results = [('json (response.json)', best(
+            lambda: json.loads(body.decode('utf-8')), args.number))]
+        for codec in codecs:
+            results.append((codec.name, best(lambda: codec.loads(body), args.number)))
+        report(title, len(body), results)
+
+
+if __name__ == '__main__':
+    main()
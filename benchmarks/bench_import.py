@@ -0,0 +1,99 @@
+"""
+Benchmark of the startup cost of smc-python for short lived CLI tools.
+
+Each sample runs in a new interpreter and measures ``import smc`` and
+the first element resolved from an href, as done by ``Element.from_href``
+(the response is provided so no SMC is needed). Element modules are
+imported on first lookup through the class manifest; ``--eager`` imports
+every element module first, as done before the lazy registry, for
+comparison. The import time of ``requests`` alone is reported as the floor
+set by the HTTP library. The number of smc modules loaded is reported
+after the import and after the first element.
+
+Modules are compiled on the first run, run again to measure with compiled
+bytecode (unless ``PYTHONDONTWRITEBYTECODE`` is set). Run from the
+repository root::
+
+    python benchmarks/bench_import.py [--samples 15] [--eager]
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE = r'''
+import sys, json
+from timeit import default_timer
+start = default_timer()
+%(imports)s
+imported = default_timer()
+modules = len([m for m in sys.modules if m.startswith('smc.')])
+%(eager)s
+from smc.base.model import ElementFactory
+
+class Result(object):
+    etag = '"1"'
+    msg = None
+    json = {'name': 'fw', 'key': 1, 'link': [{
+        'rel': 'self', 'type': 'single_fw', 'method': 'GET',
+        'href': 'https://smc:8082/6.4/elements/single_fw/1'}]}
+
+engine = ElementFactory('https://smc:8082/6.4/elements/single_fw/1', Result())
+assert type(engine).__name__ == 'Layer3Firewall', type(engine)
+done = default_timer()
+json.dump({'import': imported - start, 'total': done - start,
+           'import_modules': modules,
+           'modules': len([m for m in sys.modules if m.startswith('smc.')])},
+          sys.stdout)
+'''
+
+
+def sample(imports, eager=False):
+    code = SAMPLE % {
+        'imports': imports,
+        'eager': 'import smc.base.registry; smc.base.registry.import_all()'
+            if eager else ''}
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [ROOT] + [p for p in [env.get('PYTHONPATH')] if p])
+    out = subprocess.check_output([sys.executable, '-c', code], env=env)
+    return json.loads(out.decode('utf-8'))
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def report(title, samples):
+    print('%-36s import %7.1f ms   first element %7.1f ms   '
+        'smc modules %3d / %3d' % (
+        title,
+        median([s['import'] for s in samples]) * 1000,
+        median([s['total'] for s in samples]) * 1000,
+        samples[0]['import_modules'], samples[0]['modules']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--samples', type=int, default=15)
+    parser.add_argument('--eager', action='store_true',
+        help='also measure importing all element modules')
+    args = parser.parse_args()
+
+    print('Median of %s runs, each in a new interpreter\n' % args.samples)
+    floor = [sample('import requests') for _ in range(args.samples)]
+    print('%-36s import %7.1f ms' % ('requests', median(
+        [s['import'] for s in floor]) * 1000))
+    report('smc (lazy registry)',
+        [sample('import smc') for _ in range(args.samples)])
+    if args.eager:
+        report('smc (all element modules)',
+            [sample('import smc', eager=True) for _ in range(args.samples)])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,301 @@
+"""
+Benchmark suite of smc-python hot paths, with baselines to track regressions.
+
+Cases run against synthetic payloads (see payloads.py) and, for paths that
+send requests, a local stand-in SMC (:mod:`smc.tests.standin`), so no SMC
+is needed. Each case reports the best time per operation and the peak
+memory allocated by one operation (tracemalloc).
+
+Run from the repository root::
+
+    python benchmarks/bench_suite.py [--quick] [--filter collection]
+
+Record a baseline, then compare a later run to it. The comparison exits
+with status 1 if a case is slower, or allocates more memory, than the
+baseline by more than the tolerance::
+
+    python benchmarks/bench_suite.py --save benchmarks/baseline.json
+    python benchmarks/bench_suite.py --compare benchmarks/baseline.json
+
+Baselines are only comparable on the same machine and Python version, the
+comparison warns when the Python version of the baseline differs.
+"""
+import os
+import sys
+import json
+import time
+import timeit
+import platform
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(1, os.path.join(ROOT, 'smc-monitoring'))
+
+from smc import session  # noqa
+from smc.base.model import ElementCache, ElementFactory, LoadElement  # noqa
+from smc.tests.standin import StandInSMC  # noqa
+import payloads  # noqa
+
+try:
+    import tracemalloc
+except ImportError: # Python 2
+    tracemalloc = None
+
+
+#: Registered cases, in run order: (name, setup, quick)
+CASES = []
+
+
+def case(name, quick=True):
+    """
+    Register a benchmark case. The decorated function is called with the
+    stand-in server and returns the callable to measure. Cases with
+    quick=False only run without ``--quick``.
+    """
+    def register(setup):
+        CASES.append((name, setup, quick))
+        return setup
+    return register
+
+
+class Result(object):
+    """
+    Response of a GET, to build elements without a request
+    """
+    msg = None
+
+    def __init__(self, json, etag='"1"'):
+        self.json = json
+        self.etag = etag
+
+
+class Rule(object):
+    """
+    Rule holding the data of the rule fields
+    """
+    typeof = 'fw_ipv4_access_rule'
+
+    def __init__(self, data):
+        self.data = data
+
+
+def seed_hosts(server, count):
+    return [server.add_element('host', {'name': 'host-%s' % i,
+        'address': '10.%s.%s.%s' % (i // 65536 % 256, i // 256 % 256, i % 256)})
+        for i in range(count)]
+
+
+def engine(interfaces, vlans):
+    data = payloads.engine(interfaces=interfaces, vlans=vlans)
+    return ElementFactory(data['link'][0]['href'], Result(data))
+
+
+def iterate_collection(server, count):
+    from smc.elements.network import Host
+    seed_hosts(server, count)
+    return lambda: sum(1 for _ in Host.objects.all())
+
+
+@case('collection_iter_10k')
+def collection_iter_10k(server):
+    return iterate_collection(server, 10000)
+
+
+@case('collection_iter_100k', quick=False)
+def collection_iter_100k(server):
+    return iterate_collection(server, 100000)
+
+
+@case('element_cache_engine')
+def element_cache_engine(server):
+    data = payloads.engine(interfaces=8, vlans=16)
+    return lambda: ElementCache(data, etag='"1"')
+
+
+@case('element_factory_engine')
+def element_factory_engine(server):
+    data = payloads.engine(interfaces=8, vlans=16)
+    href = data['link'][0]['href']
+    return lambda: ElementFactory(href, Result(data))
+
+
+@case('load_element_engine')
+def load_element_engine(server):
+    href = server.add_element('single_fw', payloads.engine(interfaces=8, vlans=16))
+    return lambda: LoadElement(href)
+
+
+@case('interface_get_200')
+def interface_get_200(server):
+    fw = engine(interfaces=200, vlans=4)
+    return lambda: fw.interface.get(199)
+
+
+@case('interface_get_vlan_200')
+def interface_get_vlan_200(server):
+    fw = engine(interfaces=200, vlans=4)
+    return lambda: fw.interface.get('199.4')
+
+
+def routing_tree():
+    from smc.core.route import Routing
+    data = payloads.routing(interfaces=50, networks=4, gateways=2)
+    return Routing(href=data['href'], data=data)
+
+
+@case('routing_walk')
+def routing_walk(server):
+    routing = routing_tree()
+    def walk(node):
+        return 1 + sum(walk(child) for child in node)
+    return lambda: walk(routing)
+
+
+@case('routing_as_tree')
+def routing_as_tree(server):
+    routing = routing_tree()
+    return routing.as_tree
+
+
+@case('rule_sources_all_50')
+def rule_sources_all_50(server):
+    from smc.policy.rule_elements import Source
+    hrefs = seed_hosts(server, 50)
+    rule = Rule({'sources': {'src': hrefs}})
+    return lambda: Source(rule).all()
+
+
+def formatter(server, formatter_class):
+    from smc_monitoring.monitors.logs import LogQuery
+    fmt = formatter_class(LogQuery(fetch_size=200))
+    records = payloads.log_records(fmt.headers, 200)
+    return lambda: fmt.formatted(list(records))
+
+
+@case('csv_format_200')
+def csv_format_200(server):
+    from smc_monitoring.models.formatters import CSVFormat
+    return formatter(server, CSVFormat)
+
+
+@case('table_format_200')
+def table_format_200(server):
+    from smc_monitoring.models.formatters import TableFormat
+    return formatter(server, TableFormat)
+
+
+def measure(fn, repeat, min_time=0.2):
+    """
+    Return the best time per call in seconds and the peak memory of one
+    call in KB (None if tracemalloc is not available).
+    """
+    start = timeit.default_timer()
+    fn()
+    elapsed = timeit.default_timer() - start
+    number = max(1, int(min_time / elapsed)) if elapsed > 0 else 1000
+    seconds = min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+    peak_kb = None
+    if tracemalloc is not None:
+        tracemalloc.start()
+        try:
+            fn()
+            peak_kb = tracemalloc.get_traced_memory()[1] / 1024.0
+        finally:
+            tracemalloc.stop()
+    return seconds, peak_kb
+
+
+def run(args):
+    results = {}
+    with StandInSMC() as server:
+        session.login(url=server.url, api_key=server.api_key)
+        try:
+            for name, setup, quick in CASES:
+                if args.filter and args.filter not in name:
+                    continue
+                if args.quick and not quick:
+                    continue
+                try:
+                    fn = setup(server)
+                except ImportError as e:
+                    print('%-26s skipped: %s' % (name, e))
+                    continue
+                seconds, peak_kb = measure(fn, repeat=3 if args.quick else 5)
+                results[name] = {'seconds': seconds, 'peak_kb': peak_kb}
+                print('%-26s %12.3f ms/op %12s KB peak' % (
+                    name, seconds * 1000,
+                    '%.1f' % peak_kb if peak_kb is not None else '-'))
+        finally:
+            session.logout()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print the change of each case from the baseline and return the
+    names of cases that regressed.
+
+    :rtype: list
+    """
+    recorded = baseline.get('meta', {}).get('python')
+    if recorded != platform.python_version():
+        print('\nWARNING: baseline recorded with Python %s, running Python %s, '
+            'results are not comparable' % (recorded, platform.python_version()))
+    regressions = []
+    print('\n%-26s %12s %12s' % ('change from baseline', 'time', 'memory'))
+    for name, result in sorted(results.items()):
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        time_ratio = result['seconds'] / base['seconds']
+        memory_ratio = result['peak_kb'] / base['peak_kb'] if \
+            result['peak_kb'] and base.get('peak_kb') else None
+        regressed = time_ratio > 1 + tolerance or \
+            (memory_ratio is not None and memory_ratio > 1 + tolerance)
+        if regressed:
+            regressions.append(name)
+        print('%-26s %+11.1f%% %12s%s' % (
+            name, (time_ratio - 1) * 100,
+            '%+.1f%%' % ((memory_ratio - 1) * 100) if memory_ratio else '-',
+            '  REGRESSION' if regressed else ''))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--quick', action='store_true',
+        help='skip the largest cases and repeat less')
+    parser.add_argument('--filter', help='only run cases containing this text')
+    parser.add_argument('--save', metavar='FILE', help='save results as a baseline')
+    parser.add_argument('--compare', metavar='FILE', help='compare to a baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+        help='allowed slowdown or memory growth before a regression '
+             '(default: 0.25)')
+    args = parser.parse_args()
+
+    results = run(args)
+    status = 0
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print('\n%s case(s) regressed: %s' % (
+                len(regressions), ', '.join(regressions)))
+            status = 1
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'meta': {
+                    'python': platform.python_version(),
+                    'platform': platform.platform(),
+                    'date': time.strftime('%Y-%m-%d'),
+                    'quick': args.quick},
+                'results': results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print('\nSaved baseline to %s' % args.save)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""
+Synthetic SMC payloads used by the benchmarks. The structure follows the
+JSON returned by the SMC API for engines and element lists; sizes are
+controlled by arguments so results scale with real deployments.
+"""
+
+BASE = 'https://smc.example.com:8082/6.4/elements'
+
+
+def links(href, rels):
+    return [{'href': '%s/%s' % (href, rel), 'method': 'GET', 'rel': rel}
+            for rel in rels]
+
+
+ENGINE_RELS = (
+    'refresh', 'upload', 'generate_snapshot', 'snapshots', 'export', 'alias_resolving',
+    'routing', 'antispoofing', 'routing_monitoring', 'internal_gateway', 'blacklist',
+    'flush_blacklist', 'add_route', 'nodes', 'permissions', 'interfaces',
+    'physical_interface', 'tunnel_interface', 'modem_interface', 'adsl_interface',
+    'wireless_interface', 'switch_physical_interface', 'pending_changes',
+    'approve_all_changes', 'disapprove_all_changes', 'virtual_resources',
+    'contact_addresses', 'search_category_tags_from_element', 'references_by_element')
+
+
+def physical_interface(engine_href, interface_id, vlans=0):
+    href = '%s/physical_interface/%s' % (engine_href, interface_id)
+    vlan_interfaces = []
+    for vlan in range(1, vlans + 1):
+        vlan_interfaces.append({
+            'interface_id': '%s.%s' % (interface_id, vlan),
+            'interfaces': [{'single_node_interface': {
+                'address': '10.%s.%s.1' % (interface_id, vlan),
+                'network_value': '10.%s.%s.0/24' % (interface_id, vlan),
+                'nicid': '%s.%s' % (interface_id, vlan),
+                'auth_request': False, 'backup_heartbeat': False,
+                'dynamic': False, 'outgoing': False, 'primary_mgt': False,
+                'key': 200 + vlan, 'nodeid': 1}}],
+            'virtual_mapping': None, 'zone_ref': None,
+            'comment': 'VLAN %s' % vlan})
+    return {'physical_interface': {
+        'interface_id': str(interface_id),
+        'interfaces': [{'single_node_interface': {
+            'address': '172.18.%s.1' % interface_id,
+            'network_value': '172.18.%s.0/24' % interface_id,
+            'nicid': str(interface_id),
+            'auth_request': interface_id == 0,
+            'backup_heartbeat': False, 'dynamic': False,
+            'outgoing': interface_id == 0, 'primary_mgt': interface_id == 0,
+            'key': 100 + interface_id, 'nodeid': 1}}],
+        'vlanInterfaces': vlan_interfaces,
+        'zone_ref': '%s/interface_zone/%s' % (BASE, interface_id),
+        'qos_mode': 'no_qos', 'mtu': 1500, 'aggregate_mode': 'none',
+        'arp_entry': [], 'cvi_mode': 'none', 'duplicate_address_detection': True,
+        'link': links(href, ('self', 'vlan_interface', 'contact_addresses'))}}
+
+
+def engine(engine_id=1, interfaces=8, vlans=16):
+    """
+    Single firewall engine as returned by GET of the engine href.
+
+    :param int interfaces: number of physical interfaces
+    :param int vlans: number of VLANs per interface
+    :rtype: dict
+    """
+    href = '%s/single_fw/%s' % (BASE, engine_id)
+    return {
+        'name': 'fw-%s' % engine_id, 'comment': 'benchmark engine',
+        'key': engine_id, 'read_only': False, 'system': False,
+        'admin_domain': '%s/admin_domain/1' % BASE,
+        'antivirus': {'antivirus_enabled': False, 'antivirus_update': 'daily',
+                      'antivirus_update_day': 'mo', 'antivirus_update_time': 21600000,
+                      'virus_log_level': 'stored', 'virus_mirror': 'update.nai.com/Products/CommonUpdater'},
+        'file_reputation_settings': {'file_reputation_context': 'disabled'},
+        'default_nat': True, 'domain_server_address': [
+            {'rank': i, 'value': '8.8.%s.%s' % (i, i)} for i in range(4)],
+        'dynamic_routing': {'antispoofing_ne_ref': [], 'ecmp_type': 'none',
+                            'ospfv2_profile_ref': None, 'bgp': {'enabled': False}},
+        'log_server_ref': '%s/log_server/1' % BASE,
+        'location_ref': '%s/location/1' % BASE,
+        'nodes': [{'firewall_node': {
+            'activate_test': True, 'disabled': False, 'loopback_node_dedicated_interface': [],
+            'name': 'fw-%s node 1' % engine_id, 'nodeid': 1,
+            'link': links('%s/node/1' % href, ('self', 'initial_contact', 'appliance_info',
+                'status', 'go_online', 'go_offline', 'go_standby', 'lock_online',
+                'lock_offline', 'reset_user_db', 'diagnostic', 'reboot', 'sginfo',
+                'ssh', 'change_ssh_pwd', 'time_sync', 'certificate_info'))}}],
+        'physicalInterfaces': [physical_interface(href, i, vlans)
+                               for i in range(interfaces)],
+        'tunnelInterfaces': [],
+        'scan_detection': {'scan_detection_icmp_events': 220,
+                           'scan_detection_icmp_timewindow': 60,
+                           'scan_detection_type': 'default off'},
+        'sidewinder_proxy_enabled': False,
+        'snmp_agent_ref': None,
+        'link': [{'href': href, 'method': 'GET', 'rel': 'self', 'type': 'single_fw'}] +
+            links(href, ENGINE_RELS),
+    }
+
+
+def element_list(count=1000, typeof='host'):
+    """
+    Result of a search at an entry point, for example `GET elements/host`.
+
+    :param int count: number of elements in the result
+    :rtype: dict
+    """
+    return {'result': [
+        {'href': '%s/%s/%s' % (BASE, typeof, i), 'name': '%s-%s' % (typeof, i),
+         'type': typeof} for i in range(count)]}
+
+
+def routing(engine_id=1, interfaces=50, networks=4, gateways=2):
+    """
+    Routing tree of an engine as returned by GET of the engine `routing`
+    link: interface, network and gateway levels.
+
+    :param int interfaces: number of interfaces
+    :param int networks: number of networks per interface
+    :param int gateways: number of gateways per network
+    :rtype: dict
+    """
+    href = '%s/single_fw/%s/routing' % (BASE, engine_id)
+
+    def node(path, **data):
+        data.update(
+            href='%s/%s' % (BASE, path), read_only=False, system=False,
+            link=links('%s/%s' % (href, path), ('self',)))
+        return data
+
+    return node('root', name='fw-%s' % engine_id, level='engine_cluster',
+        related_element_type='single_fw', routing_node=[
+        node('interface/%s' % i, name='Interface %s' % i, nic_id=str(i),
+             level='interface', related_element_type='physical_interface',
+             routing_node=[
+            node('network/%s/%s' % (i, n), name='network-10.%s.%s.0/24' % (i, n),
+                 ip='10.%s.%s.0/24' % (i, n), level='network',
+                 related_element_type='network', routing_node=[
+                node('router/%s/%s/%s' % (i, n, g),
+                     name='router-10.%s.%s.%s' % (i, n, g + 1),
+                     ip='10.%s.%s.%s' % (i, n, g + 1), level='gateway',
+                     related_element_type='router', routing_node=[])
+                for g in range(gateways)])
+            for n in range(networks)])
+        for i in range(interfaces)])
+
+
+def log_records(headers, count=200):
+    """
+    Monitoring records keyed by the field headers of a formatter.
+
+    :param list headers: field names
+    :param int count: number of records
+    :rtype: list(dict)
+    """
+    return [{header: '%s value %s' % (header, i) for header in headers}
+            for i in range(count)]
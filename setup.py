@@ -1,5 +1,7 @@
 import os
+import sys
 from setuptools import setup, find_packages
+from setuptools.command.build_py import build_py
 from codecs import open
 
 here = os.path.abspath(os.path.dirname(__file__))
@@ -17,7 +19,19 @@ with open('README.rst', encoding='utf-8') as f:
 with open('HISTORY.rst', encoding='utf-8') as f:
     history = f.read()
 
-    
+
+class BuildPy(build_py):
+    """
+    Skip modules using async syntax on python versions that cannot
+    compile them.
+    """
+    def find_package_modules(self, package, package_dir):
+        modules = build_py.find_package_modules(self, package, package_dir)
+        if sys.version_info < (3, 5):
+            modules = [m for m in modules if (m[0], m[1]) != ('smc.api', 'aio')]
+        return modules
+
+
 setup(name='smc-python',
       version=about['__version__'],
       description=about['__description__'],
@@ -28,9 +42,15 @@ setup(name='smc-python',
       license=about['__license__'],
       packages=find_packages(exclude=["*.tests", "*.tests.*", "tests.*", "tests"]),
       install_requires=[
-        'requests>=2.12.0'
+        'requests>=2.12.0',
+        'futures;python_version<"3.2"'
       ],
+      extras_require={
+        'async': ['aiohttp>=3.0'],
+        'orjson': ['orjson']
+      },
       include_package_data=True,
+      cmdclass={'build_py': BuildPy},
       classifiers=[
         "Development Status :: 5 - Production/Stable",
         "Programming Language :: Python",
@@ -6,6 +6,7 @@ import logging
 import threading
 from pprint import pformat
 from smc import session
+from smc.api import tracing, profiling
 
 import websocket
 
@@ -113,22 +114,46 @@ class SMCSocketProtocol(websocket.WebSocket):
         self.thread = None
         self.event = threading.Event()
         self.sock_timeout = sock_timeout
+        # Request hook event, see smc.api.tracing
+        self.trace = None
+        self.bytes_in = 0
+        self.bytes_out = 0
             
     def __enter__(self):
-        self.connect(
-            url=session.web_socket_url + self.query.location,
-            cookie=session.session_id)
+        url = session.web_socket_url + self.query.location
+        self.trace = tracing.request_started('WEBSOCKET', url, 'websocket')
+        try:
+            self.connect(url=url, cookie=session.session_id)
+        except Exception as e:
+            self.end_trace(error=e)
+            raise
         if self.connected:
             self.settimeout(self.sock_timeout)
             self.on_open()
         return self
       
     def __exit__(self, exctype, value, traceback):
+        self.end_trace(error=value)
         if exctype in (SystemExit, GeneratorExit):
             return False
         elif exctype in (InvalidFetch,):
             raise FetchAborted(value)
         return True
+    
+    def end_trace(self, error=None):
+        """
+        Signal the end of the query to request hooks, with the bytes
+        sent and received. Called once the socket is closed.
+        """
+        trace, self.trace = self.trace, None
+        tracing.request_finished(
+            trace, status=self.getstatus(), bytes_out=self.bytes_out,
+            bytes_in=self.bytes_in, error=error)
+    
+    def send_json(self, data):
+        payload = json.dumps(data)
+        self.bytes_out += len(payload)
+        self.send(payload)
         
     def on_open(self):
         """
@@ -138,7 +163,7 @@ class SMCSocketProtocol(websocket.WebSocket):
         """
         def event_loop():
             logger.debug(pformat(self.query.request))
-            self.send(json.dumps(self.query.request))
+            self.send_json(self.query.request)
             while not self.event.is_set():
                 #print('Waiting around on the socket: %s' % self.gettimeout())
                 self.event.wait(self.gettimeout())
@@ -157,8 +182,7 @@ class SMCSocketProtocol(websocket.WebSocket):
         be serialized and sent.
         """
         if self.connected:
-            self.send(
-                json.dumps(message.request))
+            self.send_json(message.request)
     
     def abort(self):
         """
@@ -174,15 +198,20 @@ class SMCSocketProtocol(websocket.WebSocket):
         has a timeout, the SMC will not reply with a message more
         than every two minutes.
         """
+        error = None
         try:
             itr = 0
             while self.connected:
                 
-                r, w, e = select.select(
-                    (self.sock, ), (), (), 10.0)
+                with profiling.section('websocket', self.query.location):
+                    r, w, e = select.select(
+                        (self.sock, ), (), (), 10.0)
+                    data = self.recv() if r else None
                 
                 if r:
-                    message = json.loads(self.recv())
+                    self.bytes_in += len(data)
+                    with profiling.section('decode'):
+                        message = json.loads(data)
                     
                     if 'fetch' in message:
                         self.fetch_id = message['fetch']
@@ -211,19 +240,21 @@ class SMCSocketProtocol(websocket.WebSocket):
 
         except (Exception, KeyboardInterrupt, SystemExit, FetchAborted) as e:
             logger.info('Caught exception in receive: %s -> %s', type(e), str(e))
+            error = e
             if isinstance(e, (SystemExit, InvalidFetch)):
                 # propagate SystemExit, InvalidFetch
                 raise
         finally:
             if self.connected:
                 if self.fetch_id:
-                    self.send(json.dumps({'abort': self.fetch_id}))
+                    self.send_json({'abort': self.fetch_id})
                 self.close()
             
             if self.thread:
                 self.event.set()
-                while self.thread.isAlive():
+                while self.thread.is_alive():
                     self.event.wait(1)
             
+            self.end_trace(error=error)
             logger.info('Closed web socket connection normally.')
 
@@ -1,7 +1,9 @@
 import atexit
 import logging
 import smc.api.session
-import smc.base.util
+from smc.api.common import session_scope, current_session  # @UnusedImport
+from smc.api.profiling import profile  # @UnusedImport
+from smc.base.registry import lazy_submodules
 
 
 from .__version__ import __description__, __url__, __version__
@@ -86,14 +88,9 @@ def set_file_logger(path, log_level=logging.DEBUG, format_string=None, logger_na
     ch.setFormatter(formatter)
     # add ch to logger
     log.addHandler(ch)
-        
 
-def _import_registry():
-    # Load the modules to register needed classes
-    # This should be extracted and made dynamic
-    for pkg in ('smc.policy', 'smc.elements', 'smc.routing',
-                'smc.vpn', 'smc.administration', 'smc.core'):
-        smc.base.util.import_submodules(pkg)
 
-_import_registry()
-    
\ No newline at end of file
+# Element modules are imported on first use, see smc.base.registry.
+# Subpackages such as smc.elements are imported on first attribute
+# access on python 3.7+
+__getattr__ = lazy_submodules(__name__)
@@ -305,6 +305,17 @@ def all_entry_points():  # get from session cache
     return session.entry_points.all()
 
 
+def entry_point_index():
+    """ Get all SMC API entry points as a dict of href by entry point name.
+    For example::
+
+        entry_point_index()['log_server']
+
+    :return: dict of href by entry point name
+    """
+    return session.entry_points.index
+
+
 def element_entry_point(name):
     """ Get specified element from cache based on the entry point verb from
     SMC api. To get the entry points available, you can call
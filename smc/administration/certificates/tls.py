@@ -99,6 +99,7 @@ from smc.base.model import Element, ElementCreator
 from smc.administration.certificates.tls_common import ImportExportCertificate, \
     ImportPrivateKey, ImportExportIntermediate, load_cert_chain, pem_as_string
 from smc.api.exceptions import CertificateImportError, ActionCommandFailed
+from smc.api.common import load_resource
 from smc.base.util import datetime_from_ms, element_resolver
 from smc.base.structs import NestedDict
     
@@ -205,13 +206,16 @@ class TLSCryptographySuite(Element):
         strings used in a specified TLSCryptographySuite or returns
         the system default NIST profile list of ciphers. This can
         be used as a helper to identify the ciphers to specify/add
-        when creating a new TLSCryptographySuite.
+        when creating a new TLSCryptographySuite. The system default
+        ciphers are stored in the resource cache of the session, if
+        enabled.
         
         :rtype: dict
         """
-        suite = from_suite or TLSCryptographySuite.objects.filter(
-            'NIST').first()
-        return suite.data.get('tls_cryptography_suites')
+        if from_suite is not None:
+            return from_suite.data.get('tls_cryptography_suites')
+        return load_resource('tls_ciphers', lambda: TLSCryptographySuite.objects\
+            .filter('NIST').first().data.get('tls_cryptography_suites'))
     
     @classmethod
     def create(cls, name, comment=None, **ciphers):
@@ -190,19 +190,24 @@ class Report(Element):
         """
         return datetime_from_ms(self.data.get('period_end'))
     
-    def export_pdf(self, filename):
+    def export_pdf(self, filename, progress=None):
         """
         Export the report in PDF format. Specify a path for which
         to save the file, including the trailing filename.
         
         :param str filename: path including filename
-        :return: None
+        :param progress: optional callable called with (bytes_received,
+            total_bytes) during the download
+        :return: SHA-256 hex digest of the saved file
+        :rtype: str
         """
-        self.make_request(
+        result = self.make_request(
             raw_result=True,
             resource='export',
             filename=filename, 
-            headers = {'accept': 'application/pdf'})
+            headers = {'accept': 'application/pdf'},
+            progress=progress)
+        return result.sha256
 
     def export_text(self, filename=None):
         """
@@ -196,12 +196,13 @@ class System(SubElement):
         :raises: ActionCommandFailed
         :return: None
         """
-        self.make_request(
-            method='update',
-            resource='license_install',
-            files={
-                'license_file': open(license_file, 'rb')
-            })
+        with open(license_file, 'rb') as handle:
+            self.make_request(
+                method='update',
+                resource='license_install',
+                files={
+                    'license_file': handle
+                })
 
     def license_details(self):
         """
@@ -301,21 +302,25 @@ class System(SubElement):
             method='delete',
             resource='active_alerts_ack_all')
 
-    def import_elements(self, import_file):
+    def import_elements(self, import_file, progress=None):
         """
         Import elements into SMC. Specify the fully qualified path
-        to the import file.
+        to the import file. The file is streamed to the SMC.
         
         :param str import_file: system level path to file
+        :param progress: optional callable called with (bytes_sent,
+            total_bytes) during the upload
         :raises: ActionCommandFailed
         :return: None
         """
-        self.make_request(
-            method='create',
-            resource='import_elements',
-            files={
-                'import_file': open(import_file, 'rb')
-                })
+        with open(import_file, 'rb') as handle:
+            self.make_request(
+                method='create',
+                resource='import_elements',
+                files={
+                    'import_file': handle
+                    },
+                progress=progress)
     
     def force_unlock(self, element):
         return self.make_request(
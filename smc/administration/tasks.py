@@ -19,6 +19,8 @@ An example of using a task poller when uploading an engine policy
 import re
 import time
 import threading
+from smc.api import tracing
+from smc.api.common import bind_context
 from smc.base.model import ElementCache, Element, SubElement
 from smc.api.exceptions import TaskRunFailed, ActionCommandFailed,\
     ResourceNotFound
@@ -168,20 +170,22 @@ class Task(SubElement):
         """
         params = kw.pop('params', {})
         json = kw.pop('json', None)
-        task = self.make_request(
-            TaskRunFailed,
-            method='create',
-            params=params,
-            json=json,
-            resource=resource)
+        with tracing.span('%s.%s' % (type(self).__name__, resource),
+                          element=self.name):
+            task = self.make_request(
+                TaskRunFailed,
+                method='create',
+                params=params,
+                json=json,
+                resource=resource)
 
-        timeout = kw.pop('timeout', 5)
-        wait_for_finish = kw.pop('wait_for_finish', True)
-        
-        return TaskOperationPoller(
-            task=task, timeout=timeout,
-            wait_for_finish=wait_for_finish,
-            **kw)
+            timeout = kw.pop('timeout', 5)
+            wait_for_finish = kw.pop('wait_for_finish', True)
+
+            return TaskOperationPoller(
+                task=task, timeout=timeout,
+                wait_for_finish=wait_for_finish,
+                **kw)
 
     @staticmethod
     def download(self, resource, filename, **kw):
@@ -191,14 +195,17 @@ class Task(SubElement):
         :rtype: DownloadTask(TaskOperationPoller)
         """
         params = kw.pop('params', {})
-        task = self.make_request(
-            TaskRunFailed,
-            method='create',
-            resource=resource,
-            params=params)
+        with tracing.span('%s.%s' % (type(self).__name__, resource),
+                          element=self.name, filename=filename):
+            task = self.make_request(
+                TaskRunFailed,
+                method='create',
+                resource=resource,
+                params=params)
 
-        return DownloadTask(
-            filename=filename, task=task)
+            return DownloadTask(
+                filename=filename, task=task,
+                progress=kw.pop('progress', None))
 
 
 class TaskOperationPoller(object):
@@ -219,20 +226,22 @@ class TaskOperationPoller(object):
             self._max_tries = max_tries
             self._timeout = timeout
             self._done = threading.Event()
+            # Poll with the session and span of the caller
             self._thread = threading.Thread(
-                target=self._start)
+                target=bind_context(self._start))
             self._thread.daemon = True
             self._thread.start()
 
     def _start(self):
-        while not self.finished():
-            try:
-                time.sleep(self._timeout)
-                self._task = self._task.update_status()
-                self._max_tries -= 1
-            except Exception as e:
-                self._exception = e
-                break
+        with tracing.span('Task poll', follower=self._task.href):
+            while not self.finished():
+                try:
+                    time.sleep(self._timeout)
+                    self._task = self._task.update_status()
+                    self._max_tries -= 1
+                except Exception as e:
+                    self._exception = e
+                    break
 
         self._done.set()
         for call in self.callbacks:
@@ -290,7 +299,7 @@ class TaskOperationPoller(object):
 
         :rtype: bool
         """
-        return self._thread is None or not self._thread.isAlive()
+        return self._thread is None or not self._thread.is_alive()
 
     @property
     def task(self):
@@ -305,19 +314,27 @@ class TaskOperationPoller(object):
         """
         Stop the running task
         """
-        if self._thread is not None and self._thread.isAlive():
+        if self._thread is not None and self._thread.is_alive():
             self._done.set()
 
 
 class DownloadTask(TaskOperationPoller):
     """
     A download task handles tasks that have files associated, for example
-    exporting an element to a specified file.
+    exporting an element to a specified file. Once the task completes, the
+    file is streamed to `filename` and the SHA-256 digest of the file is
+    available as `sha256`.
+    
+    :param str filename: path to save the file to
+    :param progress: optional callable called with (bytes_received,
+        total_bytes) during the download
     """
-    def __init__(self, filename, task, **kw):
+    def __init__(self, filename, task, progress=None, **kw):
         super(DownloadTask, self).__init__(task, wait_for_finish=True, **kw)
         self.type = 'download_task'
         self.filename = filename
+        self.progress = progress
+        self.sha256 = None
 
         self.download(None)
 
@@ -330,9 +347,11 @@ class DownloadTask(TaskOperationPoller):
                 TaskRunFailed,
                 raw_result=True,
                 href=self.task.result_url,
-                filename=self.filename)
+                filename=self.filename,
+                progress=self.progress)
 
             self.filename = result.content
+            self.sha256 = result.sha256
     
         except IOError as io:
             raise TaskRunFailed(
@@ -0,0 +1,968 @@
+"""
+Asyncio transport for the SMC API.
+
+This module provides an asyncio native session and request type that can be
+used to keep a large number of requests in flight from a single event loop
+instead of a thread per request. Results are returned as the same
+:class:`smc.api.web.SMCResult` used by the blocking API and errors are raised
+using the same exception types.
+
+.. note:: Requires python 3.5+ and the `aiohttp` package. Install using
+    ``pip install smc-python[async]``. The module uses `async` syntax and is
+    not installed on python 2.7.
+
+Example of logging in and fetching elements concurrently::
+
+    import asyncio
+    from smc.api import aio
+    from smc.elements.network import Host
+
+    async def main():
+        async with aio.AsyncSession() as session:
+            await session.login(url='http://1.1.1.1:8082', api_key='xxxxxxxxxxx')
+            hosts = [host async for host in aio.AsyncCollection(
+                Host.objects.all(), user_session=session)]
+            elements = await asyncio.gather(
+                *[aio.from_href(host.href, user_session=session) for host in hosts])
+            ...
+
+    asyncio.get_event_loop().run_until_complete(main())
+
+Requests can also be built directly using :class:`AsyncSMCRequest`, which
+has the same signature as :class:`smc.api.common.SMCRequest` but returns an
+awaitable from `read`, `create`, `update` and `delete`::
+
+    result = await aio.AsyncSMCRequest(href=href).read()
+
+If `user_session` is not provided, the module level default session
+:data:`session` is used.
+
+Requests are retried by the same :class:`smc.api.retry.RetryHandler` as the
+blocking session, including Retry-After handling, backoff and the circuit
+breaker. Enable retries with `retry_on_busy=True` at login or
+:meth:`AsyncSession.set_retry_on_busy`.
+"""
+import os
+import ssl
+import json
+import zlib
+import asyncio
+import logging
+import aiohttp
+from timeit import default_timer
+from smc.api.web import SMCResult, GET, PUT, POST, DELETE, \
+    REAUTH_RETRIES, entry_point_rel, json_codec
+from smc.api.retry import RetryHandler, DONE, CONFLICT, with_etag, \
+    etag_request
+from smc.api import tracing
+from smc.api.codec import get_codec
+from smc.api.metrics import MetricsRegistry
+from smc.api.coalesce import RequestCoalescer
+from smc.api import compression
+from smc.api.common import SMCRequest, current_session
+from smc.api.executor import DEFAULT_CONCURRENCY
+from smc.api.entry_point import Resource
+from smc.api.session import Session, Credential, POOL_OPTIONS
+from smc.api.configloader import load_from_file, load_from_environ
+from smc.api.exceptions import ConfigLoadError, SMCConnectionError, \
+    SMCOperationFailure, SessionManagerNotFound, FetchElementFailed, \
+    ElementNotFound
+from smc.base.model import ElementCache, ElementFactory, Element
+
+
+logger = logging.getLogger(__name__)
+
+
+class _Response(object):
+    """
+    Buffered aiohttp response exposing the subset of the `requests`
+    response interface used by SMCResult and SMCOperationFailure.
+    """
+    def __init__(self, status_code, headers, content, reason=None, url=None):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.reason = reason
+        self.url = url
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8') if self.content else ''
+
+    def json(self):
+        return json.loads(self.text)
+
+    def __bool__(self):
+        return self.status_code < 400
+
+    def __repr__(self):
+        return '<Response [%s]>' % self.status_code
+
+
+def _ssl_context(verify):
+    """
+    Map the `verify` login setting to the aiohttp ssl argument
+    """
+    if verify is False:
+        return False
+    if isinstance(verify, str):
+        if os.path.isdir(verify):
+            return ssl.create_default_context(capath=verify)
+        return ssl.create_default_context(cafile=verify)
+    return None # Use default verification
+
+
+def _query_params(params):
+    """
+    aiohttp does not accept None or boolean query values. Drop None
+    values and serialize the rest the same way `requests` would.
+    """
+    if params:
+        return {k: v if isinstance(v, (int, float)) and not isinstance(v, bool)
+                else str(v) for k, v in params.items() if v is not None}
+
+
+class AsyncRequestCoalescer(object):
+    """
+    Asyncio counterpart of :class:`smc.api.coalesce.RequestCoalescer`.
+    The shared request runs as it's own task, so cancelling one of the
+    waiting callers does not cancel the request for the others.
+    """
+    key = staticmethod(RequestCoalescer.key)
+
+    def __init__(self):
+        self._calls = {}
+
+    async def call(self, key, send):
+        """
+        Return the response of the request in flight for the key, or
+        send the request by awaiting `send()` if none is in flight.
+
+        :return: the response and whether it was shared with a request in
+            flight
+        :rtype: tuple(_Response, bool)
+        """
+        task = self._calls.get(key)
+        shared = task is not None
+        if not shared:
+            task = self._calls[key] = asyncio.ensure_future(send())
+            task.add_done_callback(lambda done: self._done(key, done))
+        return await asyncio.shield(task), shared
+
+    def _done(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception() # Retrieved, even if all callers were cancelled
+
+    def forget(self):
+        """
+        Do not share the requests currently in flight with requests sent
+        from now on.
+
+        :return: None
+        """
+        self._calls.clear()
+
+    @property
+    def in_flight(self):
+        return len(self._calls)
+
+    def __repr__(self):
+        return 'AsyncRequestCoalescer(in_flight=%s)' % self.in_flight
+
+
+class AsyncSession(object):
+    """
+    AsyncSession is the asyncio counterpart of :class:`smc.api.session.Session`.
+    Login parameters and credential loading (~/.smcrc or environment) are the
+    same as the blocking session. The connection pool size is set with the
+    `pool_maxsize` keyword argument and determines the number of concurrent
+    connections to the SMC (default: 100).
+
+    AsyncSession can be used as an async context manager, in which case the
+    session will be logged out on exit.
+    """
+    def __init__(self):
+        self._params = {}
+        self._session = None # aiohttp.ClientSession
+        self._resource = None # smc.api.entry_point.Resource
+        self._lock = None # asyncio.Lock, bound when first used
+        self.metrics = MetricsRegistry() # Request metrics for this session
+        self.coalescer = AsyncRequestCoalescer()
+        self.retry_handler = RetryHandler() # smc.api.retry.RetryHandler
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exctype, value, traceback):
+        await self.logout()
+
+    @property
+    def session(self):
+        return self._session
+
+    @property
+    def json_codec(self):
+        """
+        JSON codec used by this session, see :mod:`smc.api.codec`
+
+        :rtype: smc.api.codec.JSONCodec
+        """
+        return get_codec(self._params.get('json_codec'))
+
+    @property
+    def entry_points(self):
+        """
+        Entry points that are bound to this session
+
+        :rtype: Resource
+        """
+        if not self._resource:
+            raise SMCConnectionError('No entry points found, it is likely '
+                'there is no valid login session.')
+        return self._resource
+
+    @property
+    def api_version(self):
+        return self._params.get('api_version')
+
+    @property
+    def url(self):
+        return self._params.get('url', '')
+
+    @property
+    def timeout(self):
+        return self._params.get('timeout', 30)
+
+    @property
+    def domain(self):
+        return 'Shared Domain' if not self._params.get('domain') else \
+            self._params.get('domain')
+
+    @property
+    def credential(self):
+        return Credential(**{k: self._params.get(k)
+            for k in ('api_key', 'login', 'pwd')})
+
+    @property
+    def session_id(self):
+        """
+        The session ID in header type format
+
+        :rtype: str
+        """
+        if self.session:
+            for cookie in self.session.cookie_jar:
+                if cookie.key == 'JSESSIONID':
+                    return 'JSESSIONID={}'.format(cookie.value)
+
+    @property
+    def is_active(self):
+        return self.session is not None and self.session_id is not None
+
+    @property
+    def in_atomic_block(self):
+        # Transactions are not supported on the async session
+        return False
+
+    def __repr__(self):
+        return 'AsyncSession(url=%s,domain=%s)' % (self.url, self.domain)
+
+    async def login(self, url=None, api_key=None, login=None, pwd=None,
+            api_version=None, timeout=None, verify=True, alt_filepath=None,
+            domain=None, **kwargs):
+        """
+        Login to SMC API and retrieve a valid session. Parameters are the same
+        as :meth:`smc.api.session.Session.login`.
+
+        :raises SMCConnectionError: login failed
+        :raises ConfigLoadError: loading cfg from ~.smcrc fails
+        :return: None
+        """
+        if self.is_active:
+            logger.info('An attempt to log in occurred when a session already '
+                'exists, bypassing login for session: %s' % self)
+            return
+
+        params = {}
+        if not url or (not api_key and not (login and pwd)):
+            try:
+                params = load_from_file(alt_filepath) if alt_filepath\
+                    is not None else load_from_file()
+            except ConfigLoadError:
+                params = load_from_environ()
+
+        params = params or dict(
+            url=url,
+            api_key=api_key,
+            login=login,
+            pwd=pwd,
+            api_version=api_version,
+            verify=verify,
+            timeout=timeout,
+            domain=domain,
+            kwargs=kwargs or {})
+
+        self._params = {k: v for k, v in params.items() if v is not None}
+
+        extra_args = self._params.get('kwargs', {})
+        if extra_args.pop('retry_on_busy', False):
+            self.set_retry_on_busy()
+        for option in POOL_OPTIONS + ('json_codec', 'coalesce_requests'):
+            if option in extra_args:
+                self._params[option] = extra_args.pop(option)
+        self.json_codec # Raise if the codec is unknown
+        self.coalescer = AsyncRequestCoalescer() if \
+            self._params.get('coalesce_requests', True) else None
+
+        connector = aiohttp.TCPConnector(
+            limit=self._params.get('pool_maxsize', 100),
+            ssl=_ssl_context(self._params.get('verify', True)))
+
+        # unsafe=True to accept cookies when the SMC is addressed by IP
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            cookie_jar=aiohttp.CookieJar(unsafe=True),
+            headers={'Accept-Encoding': compression.ACCEPT_ENCODING},
+            auto_decompress=False) # Decoded by _request, see smc.api.compression
+
+        try:
+            self._params.update(api_version=await self._get_api_version())
+            await self._authenticate(extra_args)
+            await self._load_entry_points()
+        except Exception:
+            await self._close()
+            raise
+
+        logger.debug('Async login succeeded in domain: %s, session: %s',
+            self.domain, self.session_id)
+
+    async def _get_api_version(self):
+        response = await self._request(
+            GET, '%s/api' % self.url, timeout=self.timeout)
+        if response.status_code != 200:
+            raise SMCConnectionError(
+                'Invalid status received while getting entry points from SMC. '
+                'Status code received %s. Reason: %s' % (
+                    response.status_code, response.reason))
+
+        versions = [version['rel'] for version in response.json()['version']]
+        newest_version = max([float(i) for i in versions])
+        api_version = self.api_version
+        if api_version is None or api_version not in versions:
+            api_version = newest_version
+        return api_version
+
+    async def _authenticate(self, extra_args):
+        credential = self.credential
+        json_data = {'domain': self.domain}
+        params = {}
+        if credential.provider_name.startswith('lms'):
+            params = dict(login=credential._login, pwd=credential._pwd)
+        else:
+            json_data.update(authenticationkey=credential._api_key)
+        json_data.update(**extra_args)
+
+        response = await self._request(
+            POST, credential.get_provider_entry_point(self.url, self.api_version),
+            data=json.dumps(json_data),
+            params=params,
+            headers={'content-type': 'application/json'})
+        logger.info('Using SMC API version: %s', self.api_version)
+
+        if response.status_code != 200:
+            raise SMCConnectionError(
+                'Login failed, HTTP status code: %s and reason: %s' % (
+                    response.status_code, response.reason))
+
+    async def _load_entry_points(self):
+        response = await self._request(
+            GET, '{url}/{api_version}/api'.format(
+                url=self.url, api_version=self.api_version))
+
+        if response.status_code != 200:
+            raise SMCConnectionError(
+                'Invalid status received while getting entry points from SMC. '
+                'Status code received %s. Reason: %s' % (
+                    response.status_code, response.reason))
+
+        self._resource = Resource(response.json()['entry_point'])
+
+    async def _request(self, method, url, **kwargs):
+        """
+        Send the request and buffer the response. The connection is
+        released back to the pool once the body has been read. The
+        request is retried according to the retry handler of the session,
+        the same :class:`smc.api.retry.RetryHandler` used by
+        :class:`~smc.api.session.Session`.
+
+        :raises CircuitBreakerOpen: requests to the SMC are suspended
+        :rtype: _Response
+        """
+        if 'params' in kwargs:
+            kwargs['params'] = _query_params(kwargs['params'])
+        rel = entry_point_rel(self, url)
+        try:
+            handler = self.retry_handler
+            if handler is None:
+                return await self._send(method, url, rel, **kwargs)
+
+            policy = handler.policy(method)
+            attempt = conflicts = 0
+            while True:
+                handler._check_circuit(self, url)
+                response = error = None
+                recorded = False
+                try:
+                    try:
+                        response = await self._send(method, url, rel, **kwargs)
+                    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                        error = e
+                    action, delay = handler.next_action(self, policy, method,
+                        url, rel, response, error, attempt, conflicts)
+                    recorded = True
+                finally:
+                    if not recorded:
+                        handler._cancel_trial()
+
+                if action == CONFLICT:
+                    conflicts += 1
+                    # Responses are read by _send, their connection is
+                    # already back in the pool
+                    current = await self._send(GET, url, rel,
+                        **etag_request(self, kwargs))
+                    kwargs['headers'] = with_etag(kwargs.get('headers'),
+                        current.headers.get('ETag'))
+                    continue
+                if action == DONE:
+                    if error is not None:
+                        raise error
+                    return response
+                attempt += 1
+                await asyncio.sleep(delay)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise SMCConnectionError('Connection problem to SMC, ensure the '
+                'API service is running and host is correct: %s, exiting.' % (
+                    str(e) or 'request timed out'))
+
+    async def _send(self, method, url, rel, **kwargs):
+        """
+        Send a single request, record request metrics and call the
+        request hooks, see :mod:`smc.api.tracing`.
+
+        :rtype: _Response
+        """
+        if kwargs.get('timeout') is not None:
+            kwargs['timeout'] = aiohttp.ClientTimeout(total=kwargs['timeout'])
+        if callable(kwargs.get('data')): # Body built for each attempt
+            kwargs['data'] = kwargs['data']()
+        event = tracing.request_started(method, url, rel)
+        start = default_timer()
+        try:
+            async with self.session.request(method, url, **kwargs) as response:
+                content = await response.read()
+            content = self._decode(response.headers, content, rel)
+        except Exception as e:
+            tracing.request_finished(event, error=e)
+            raise
+        
+        data = kwargs.get('data')
+        bytes_out = len(data) if isinstance(data, (bytes, str)) else 0
+        self.metrics.observe_request(
+            method, rel, response.status, default_timer() - start,
+            bytes_out=bytes_out, bytes_in=len(content))
+        tracing.request_finished(
+            event, response.status, bytes_out, len(content))
+        return _Response(
+            response.status, response.headers, content,
+            response.reason, str(response.url))
+
+    def _decode(self, headers, content, rel):
+        """
+        Decode a compressed response body and record the compression
+        metrics, see :mod:`smc.api.compression`.
+
+        :rtype: bytes
+        """
+        encoding = headers.get('Content-Encoding', '').strip().lower()
+        if not content or encoding not in ('gzip', 'deflate'):
+            return content
+        start = default_timer()
+        try:
+            decoded = compression.decode(content, encoding)
+        except zlib.error as e:
+            raise SMCConnectionError('Failed to decode %s response: %s' % (
+                encoding, e))
+        compression.record(self.metrics, rel, encoding, len(content),
+            len(decoded), default_timer() - start)
+        return decoded
+
+    # Retries are configured as on the blocking session
+    set_retry_on_busy = Session.set_retry_on_busy
+    set_retry_handler = Session.set_retry_handler
+
+    async def logout(self):
+        """
+        Logout session from SMC
+
+        :return: None
+        """
+        if not self.session:
+            return
+        try:
+            if self._resource:
+                response = await self._request(
+                    PUT, self.entry_points.get('logout'))
+                if response.status_code == 204:
+                    logger.info('Logged out of domain: %s successfully', self.domain)
+                else:
+                    logger.error('Logout status was unexpected. Received response '
+                        'with status code: %s', (response.status_code))
+        except SMCConnectionError as e:
+            logger.error('Connection error on logout: %s', e)
+        finally:
+            await self._close()
+
+    async def _close(self):
+        if self._session is not None:
+            await self._session.close()
+        self._session = None
+        self._resource = None
+
+    async def refresh(self, session_id=None):
+        """
+        Refresh session on 401. Concurrent callers wait on the first
+        caller to re-authenticate rather than each performing a login.
+        The login is sent on the existing connection pool, which receives
+        the new session cookie, so requests still in flight are not
+        interrupted. Entry points are kept from the previous login.
+
+        :param str session_id: session ID used by the request that received
+            the 401 (default: current session ID)
+        :raises SMCConnectionError: Problem re-authenticating using existing
+            api credentials
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        session_id = session_id or self.session_id
+        async with self._lock:
+            if self.session_id != session_id and self.is_active:
+                return # Another task already refreshed the session
+            if not self.is_active:
+                raise SMCConnectionError('Session expired and attempted refresh failed.')
+            logger.info('Session timed out, will try obtaining a new session using '
+                'previously saved credential information.')
+            self.metrics.inc('reauthentications_total')
+            await self._authenticate(self._params.get('kwargs', {}))
+
+
+#: Default async session used when a request does not specify a session
+session = AsyncSession()
+
+
+def _scoped_session():
+    # Session bound by smc.session_scope for the current task, if async
+    scoped = current_session()
+    return scoped if isinstance(scoped, AsyncSession) else None
+
+
+async def send_request(user_session, method, request, reauth=0):
+    """
+    Send request to SMC. This is the asyncio counterpart of
+    :func:`smc.api.web.send_request`.
+
+    :param AsyncSession user_session: session object
+    :param str method: method for request
+    :param SMCRequest request: request object
+    :param int reauth: number of times the request was already resent
+        after re-authentication
+    :raises SMCOperationFailure: failure with reason
+    :rtype: SMCResult
+    """
+    lock = user_session._lock
+    if lock is not None and lock.locked():
+        async with lock: # Wait for the session refresh in progress
+            pass
+    if not user_session.session:
+        raise SMCConnectionError('No session found. Please login to continue')
+
+    session_id = user_session.session_id
+    method = method.upper() if method else ''
+    try:
+        if method == GET:
+            if request.filename:  # File download request
+                return await file_download(user_session, request)
+
+            def get():
+                return user_session._request(
+                    GET, request.href,
+                    params=request.params,
+                    headers=request.headers,
+                    timeout=user_session.timeout)
+
+            coalescer = getattr(user_session, 'coalescer', None)
+            if coalescer is None:
+                response = await get()
+            else: # Share the response of an identical GET in flight
+                response, shared = await coalescer.call(coalescer.key(
+                    request.href, request.params, request.headers), get)
+                if shared:
+                    user_session.metrics.inc('coalesced_requests_total',
+                        rel=entry_point_rel(user_session, request.href))
+
+            if response.status_code not in (200, 204, 304):
+                raise SMCOperationFailure(response)
+
+        elif method in (POST, PUT):
+            if request.files:  # File upload request
+                return await file_upload(user_session, method, request)
+
+            if method == PUT: # Etag should be set in request object
+                request.headers.update(Etag=request.etag)
+
+            response = await user_session._request(
+                method, request.href,
+                data=json_codec(user_session).dumps(request.json),
+                params=request.params,
+                headers=request.headers)
+
+            if method == POST and response.status_code not in (200, 201, 202):
+                raise SMCOperationFailure(response)
+            elif method == PUT and response.status_code != 200:
+                raise SMCOperationFailure(response)
+
+        elif method == DELETE:
+            # Conflict (409) if ETag is not current is retried
+            # with the current ETag by the retry handler
+            response = await user_session._request(
+                DELETE, request.href, headers=request.headers)
+
+            if response.status_code not in (200, 204):
+                raise SMCOperationFailure(response)
+
+        else:  # Unsupported method
+            return SMCResult(msg='Unsupported method: %s' % method,
+                user_session=user_session)
+
+    except SMCOperationFailure as error:
+        if error.code in (401,) and reauth < REAUTH_RETRIES:
+            await user_session.refresh(session_id)
+            return await send_request(user_session, method, request, reauth + 1)
+        raise error
+    finally:
+        if method != GET and getattr(user_session, 'coalescer', None):
+            # Later GETs must not receive a response sent before the change
+            user_session.coalescer.forget()
+
+    return SMCResult(response, user_session=user_session)
+
+
+async def file_download(user_session, request):
+    """
+    Called when GET request specifies a filename to retrieve.
+
+    :rtype: SMCResult
+    """
+    try:
+        async with user_session.session.get(
+                request.href,
+                params=_query_params(request.params),
+                headers=dict(request.headers or {},
+                    **{'Accept-Encoding': 'identity'})) as response:
+
+            if response.status != 200:
+                raise SMCOperationFailure(_Response(
+                    response.status, response.headers, await response.read(),
+                    response.reason))
+
+            path = os.path.abspath(request.filename)
+            with open(path, 'wb') as handle:
+                async for chunk in response.content.iter_chunked(65536):
+                    handle.write(chunk)
+
+            result = SMCResult(_Response(
+                response.status, response.headers, b'', response.reason),
+                user_session=user_session)
+            result.content = path
+            return result
+
+    except IOError as e:
+        raise IOError('Error attempting to save to file: {}'.format(e))
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        raise SMCConnectionError(str(e) or 'request timed out')
+
+
+def _position(handle):
+    """
+    Position of a seekable file, or None if the file can not be rewound
+    """
+    try:
+        return handle.tell() if handle.seekable() else None
+    except (AttributeError, IOError, OSError, ValueError):
+        return None
+
+
+async def file_upload(user_session, method, request):
+    """
+    Perform a file upload PUT/POST to SMC.
+
+    :rtype: SMCResult
+    """
+    try:
+        files = [(name, handle, _position(handle))
+            for name, handle in request.files.items()]
+    except AttributeError:
+        raise TypeError('File specified in request was not readable: %s' % request.files)
+
+    def form_data():
+        # A FormData can only be sent once, build it for each attempt with
+        # the files rewound to their starting position
+        data = aiohttp.FormData()
+        for name, handle, start in files:
+            if start is not None:
+                handle.seek(start)
+            data.add_field(name, handle,
+                filename=os.path.basename(getattr(handle, 'name', name)))
+        return data
+
+    response = await user_session._request(
+        method, request.href, params=request.params, data=form_data)
+    if response.status_code in (200, 201, 202, 204):
+        return SMCResult(response, user_session=user_session)
+    raise SMCOperationFailure(response)
+
+
+class AsyncSMCRequest(SMCRequest):
+    """
+    SMCRequest that is sent using an :class:`AsyncSession`. The CRUD methods
+    `read`, `create`, `update` and `delete` return an awaitable that resolves
+    to an :class:`smc.api.web.SMCResult`. As with SMCRequest, if the
+    `exception` attribute is set, it is raised on failure, otherwise the
+    SMCResult is returned with the `msg` attribute set.
+
+    :param AsyncSession user_session: session to use for this request,
+        uses the module default session if not provided
+    """
+    def __init__(self, href=None, json=None, params=None, filename=None,
+                 etag=None, user_session=None, **kwargs):
+        super(AsyncSMCRequest, self).__init__(
+            href=href, json=json, params=params, filename=filename,
+            etag=etag, **kwargs)
+        self.user_session = user_session
+
+    async def _make_request(self, method):
+        err = None
+        result = None
+        try:
+            user_session = self.user_session or _scoped_session() or session
+
+            if method == 'GET':
+                if not self.href:
+                    self.href = user_session.entry_points.get('elements')
+
+            result = await send_request(user_session, method, self)
+
+        except SMCOperationFailure as e:
+            result = e.smcresult
+            try:
+                err = self.exception(result.msg)  # Exception set
+            except AttributeError:
+                pass
+        except (SessionManagerNotFound, SMCConnectionError,
+                IOError, TypeError) as e:
+            err = e
+
+        if err:
+            raise err
+        return result
+
+
+async def load_element(href, only_etag=False, user_session=None):
+    """
+    Asyncio counterpart of :func:`smc.base.model.LoadElement`.
+
+    :raises FetchElementFailed: failed to retrieve the element
+    :rtype: ElementCache
+    """
+    request = AsyncSMCRequest(href=href, user_session=user_session)
+    request.exception = FetchElementFailed
+    result = await request.read()
+    if only_etag:
+        return result.etag
+    return ElementCache(result.json, etag=result.etag)
+
+
+async def from_href(href, user_session=None):
+    """
+    Return an instance of an Element based on the href. The element
+    data is fetched and the element cache will be populated.
+
+    :raises FetchElementFailed: failed to retrieve the element
+    :rtype: Element
+    """
+    if href:
+        request = AsyncSMCRequest(href=href, user_session=user_session)
+        request.exception = FetchElementFailed
+        return ElementFactory(href, await request.read())
+
+
+async def load(element, user_session=None):
+    """
+    Inflate the data cache on an element that only has meta data,
+    for example an element returned from a collection. Once loaded,
+    attributes of the element can be accessed without blocking.
+
+    :param Element element: element to load
+    :rtype: Element
+    """
+    element.data = await load_element(element.href, user_session=user_session)
+    return element
+
+
+async def get(cls, name, raise_exc=True, user_session=None):
+    """
+    Asyncio counterpart of :meth:`smc.base.model.Element.get`.
+    ::
+
+        host = await aio.get(Host, 'kali')
+
+    :param cls: class of the element to retrieve
+    :param str name: name of element
+    :param bool raise_exc: optionally disable exception.
+    :raises ElementNotFound: if element does not exist
+    :rtype: Element
+    """
+    element = None
+    if name is not None:
+        element = await AsyncCollection(
+            cls.objects.filter(name, exact_match=True),
+            user_session=user_session).first()
+    if not element and raise_exc:
+        raise ElementNotFound('Cannot find specified element: %s, type: '
+            '%s' % (name, cls.__name__))
+    return element
+
+
+class _AsyncIterator(object):
+    """
+    Async iterator over the result of an awaitable returning a list.
+    Used instead of an async generator, which requires python 3.6.
+    """
+    def __init__(self, awaitable):
+        self._awaitable = awaitable
+        self._iterator = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._iterator is None:
+            self._iterator = iter(await self._awaitable)
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class AsyncCollection(object):
+    """
+    Asynchronous iterator over an :class:`smc.base.collection.ElementCollection`.
+    The collection query is built using the normal collection interface and
+    then iterated using ``async for``::
+
+        async for host in aio.AsyncCollection(Host.objects.filter('10.10')):
+            ...
+
+    If the collection uses a keyword filter (i.e. `filter(address='1.1.1.1')`)
+    each candidate element is loaded to compare the attribute value. Up to
+    `concurrency` elements are loaded at the same time.
+
+    :param ElementCollection collection: collection to iterate
+    :param AsyncSession user_session: optional session
+    :param int concurrency: max number of elements loaded concurrently
+    """
+    def __init__(self, collection, user_session=None,
+                 concurrency=DEFAULT_CONCURRENCY):
+        self.collection = collection
+        self.user_session = user_session
+        self.concurrency = concurrency
+        self._result_cache = None
+
+    async def _fetch_all(self):
+        if self._result_cache is None:
+            params = dict(self.collection._params)
+            limit = params.pop('limit', None)
+            href = params.pop('href', None)
+            request = AsyncSMCRequest(
+                href=href, params=params, user_session=self.user_session)
+            request.exception = FetchElementFailed
+            try:
+                result = await request.read()
+                items = result.json or []
+            except FetchElementFailed:
+                items = []
+
+            elements = [Element.from_meta(**item) for item in items]
+            if self.collection._iexact:
+                elements = await self._matching(elements, limit)
+            self._result_cache = elements[:limit] if limit else elements
+        return self._result_cache
+
+    async def _matching(self, elements, limit=None):
+        """
+        Load the elements, `concurrency` at a time, and return the elements
+        matching the keyword filter of the collection in order. Elements
+        are not loaded once `limit` elements before them matched.
+        """
+        iexact = self.collection._iexact
+        semaphore = asyncio.Semaphore(self.concurrency)
+        matched = []
+
+        async def matches(element):
+            async with semaphore:
+                if limit and len(matched) >= limit:
+                    return False
+                await load(element, user_session=self.user_session)
+            if all(element.data.get(k) == v for k, v in iexact.items()):
+                matched.append(element)
+                return True
+            return False
+
+        results = await asyncio.gather(*[matches(e) for e in elements])
+        return [element for element, match in zip(elements, results) if match]
+
+    def __aiter__(self):
+        return _AsyncIterator(self._fetch_all())
+
+    async def all(self):
+        """
+        Return all elements in the collection
+
+        :rtype: list(Element)
+        """
+        return list(await self._fetch_all())
+
+    async def first(self):
+        """
+        Returns the first object matched or None
+        """
+        elements = await self._fetch_all()
+        if elements:
+            return elements[0]
+
+    async def exists(self):
+        """
+        Returns True if the query contains any results
+
+        :rtype: bool
+        """
+        return bool(await self._fetch_all())
+
+    async def count(self):
+        """
+        Return number of results
+
+        :rtype: int
+        """
+        return len(await self._fetch_all())
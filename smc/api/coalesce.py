@@ -0,0 +1,120 @@
+"""
+Coalescing of concurrent identical GET requests.
+
+Threads sharing a session often resolve the same href at the same time,
+for example the log server or location of every engine in a fan-out job.
+Each session has a :class:`RequestCoalescer`: while a GET for an href is
+in flight, an identical GET (same href, query parameters and headers) sent
+from another thread waits for the response of the request in flight
+instead of sending a request of it's own. Each caller receives it's own
+:class:`~smc.api.web.SMCResult` decoded from the shared response, so
+results can be modified without affecting the other callers. If the
+request in flight fails, the error is raised in all waiting callers.
+
+A GET never joins a request sent before a PUT, POST or DELETE of the
+session completed, so a thread reading back an element it just modified
+always receives the modified element.
+
+GETs answered by a request in flight are recorded in the session metrics
+as `coalesced_requests_total`. Coalescing can be disabled at login with
+`coalesce_requests=False`, or on an existing session::
+
+    session.coalescer = None
+
+Streamed GETs and file downloads are never coalesced.
+"""
+import threading
+
+
+def _items(mapping):
+    # Hashable, order independent form of params or headers
+    items = mapping.items() if hasattr(mapping, 'items') else mapping or ()
+    return tuple(sorted((str(k), str(v)) for k, v in items))
+
+
+class _Call(object):
+    """
+    A request in flight and the callers waiting for it
+    """
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+        self.waiters = 0
+
+
+class RequestCoalescer(object):
+    """
+    Share the response of a request in flight with identical requests
+    sent while it is in flight.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    @staticmethod
+    def key(href, params=None, headers=None):
+        """
+        Key identifying identical requests
+
+        :rtype: tuple
+        """
+        return (href, _items(params), _items(headers))
+
+    def call(self, key, send):
+        """
+        Return the response of the request in flight for the key, or call
+        `send` to send the request if none is in flight.
+
+        :param tuple key: key returned by :meth:`key`
+        :param send: callable sending the request and returning the response
+        :raises: the error raised by `send`
+        :return: the response and whether it was shared with a request in
+            flight
+        :rtype: tuple(requests.Response, bool)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            shared = call is not None
+            if shared:
+                call.waiters += 1
+            else:
+                call = self._calls[key] = _Call()
+        if shared:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.response, True
+        try:
+            call.response = send()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+        return call.response, False
+
+    def forget(self):
+        """
+        Do not share the requests currently in flight with requests sent
+        from now on. Called after a request modifying the SMC completes.
+
+        :return: None
+        """
+        with self._lock:
+            self._calls.clear()
+
+    @property
+    def in_flight(self):
+        """
+        Number of distinct requests in flight that can be shared
+
+        :rtype: int
+        """
+        return len(self._calls)
+
+    def __repr__(self):
+        return 'RequestCoalescer(in_flight=%s)' % self.in_flight
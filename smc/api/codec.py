@@ -0,0 +1,175 @@
+"""
+JSON codecs used to encode request bodies and decode responses.
+
+Every create and update encodes the element json and every response is
+decoded, so the JSON library in use is a visible share of CPU time when
+modifying many engines or policies. The codec used by a session can be
+selected at login::
+
+    session.login(url='http://1.1.1.1:8082', api_key='xxxxx',
+                  json_codec='orjson')
+
+Available codecs:
+
+* `json`: standard library (default)
+* `orjson`: requires the `orjson` package (``pip install smc-python[orjson]``).
+  The standard library codec is used, with a warning, if it is not installed
+
+Codecs encode :class:`smc.base.model.ElementCache` objects and elements
+directly and decode responses from the response bytes without creating an
+intermediate string. Additional codecs can be registered using
+:func:`register_codec`. A codec can also be provided as an object
+implementing `dumps` and `loads`.
+"""
+import json
+import logging
+from smc.base.structs import NestedDict
+
+
+logger = logging.getLogger(__name__)
+
+
+class CacheEncoder(json.JSONEncoder):
+    def default(self, o):
+        try:
+            return o.data
+        except AttributeError:
+            json.JSONEncoder.default(self, o)
+
+
+def _unwrap(obj):
+    """
+    Return the dict held by an ElementCache or an element so it is
+    serialized without falling back to the encoder default.
+    """
+    if isinstance(obj, NestedDict):
+        return obj.data
+    data = getattr(obj, 'data', None)
+    if isinstance(data, NestedDict):
+        return data.data
+    return obj
+
+
+def _default(obj):
+    data = _unwrap(obj)
+    if data is obj:
+        raise TypeError('Object of type %s is not JSON serializable' %
+            type(obj).__name__)
+    return data
+
+
+class JSONCodec(object):
+    """
+    Base class for JSON codecs.
+    """
+    #: Name of the codec used with `json_codec`
+    name = None
+
+    def dumps(self, obj):
+        """
+        Encode obj to JSON
+
+        :rtype: bytes or str
+        """
+        raise NotImplementedError
+
+    def loads(self, data):
+        """
+        Decode JSON from bytes or str
+
+        :param data: JSON document
+        :type data: bytes or str
+        """
+        raise NotImplementedError
+
+    def __repr__(self):
+        return '%s(name=%s)' % (self.__class__.__name__, self.name)
+
+
+class StdlibJSONCodec(JSONCodec):
+    """
+    Codec using the standard library json module.
+    """
+    name = 'json'
+
+    def __init__(self):
+        self._encoder = CacheEncoder()
+
+    def dumps(self, obj):
+        return self._encoder.encode(_unwrap(obj))
+
+    def loads(self, data):
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        return json.loads(data)
+
+
+class OrjsonCodec(JSONCodec):
+    """
+    Codec using orjson. Encoding returns bytes and decoding is done
+    directly from bytes.
+    """
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+        # Integer keys are allowed by the stdlib json module
+        self._option = orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj):
+        return self._orjson.dumps(
+            _unwrap(obj), default=_default, option=self._option)
+
+    def loads(self, data):
+        return self._orjson.loads(data)
+
+
+_codecs = {
+    StdlibJSONCodec.name: StdlibJSONCodec,
+    OrjsonCodec.name: OrjsonCodec}
+
+_instances = {}
+
+
+def register_codec(codec_cls):
+    """
+    Register a codec class so it can be selected by name.
+
+    :param JSONCodec codec_cls: codec class with a unique `name`
+    """
+    _codecs[codec_cls.name] = codec_cls
+    _instances.pop(codec_cls.name, None)
+
+
+def get_codec(codec=None):
+    """
+    Return the codec by name. If codec is None, the standard library
+    codec is returned. A codec instance is returned as is. If the
+    library used by the codec is not installed, the standard library
+    codec is returned instead.
+
+    :param codec: name of the codec or codec instance
+    :raises ValueError: codec is not registered
+    :rtype: JSONCodec
+    """
+    if codec is None:
+        codec = StdlibJSONCodec.name
+    elif not isinstance(codec, str):
+        return codec
+    try:
+        return _instances[codec]
+    except KeyError:
+        try:
+            codec_cls = _codecs[codec]
+        except KeyError:
+            raise ValueError('Unknown JSON codec: %r. Available codecs: %s' %
+                (codec, ', '.join(sorted(_codecs))))
+        try:
+            instance = codec_cls()
+        except ImportError as e:
+            logger.warning('JSON codec %r is not available (%s), using %r',
+                codec, e, StdlibJSONCodec.name)
+            instance = get_codec(StdlibJSONCodec.name)
+        _instances[codec] = instance
+        return instance
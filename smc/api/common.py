@@ -4,12 +4,92 @@ Middle tier helper module to wrap CRUD operations and catch exceptions
 SMCRequest is the general data structure that is sent to the send_request
 method in smc.api.web.SMCConnection to submit the data to the SMC.
 """
+from contextlib import contextmanager
+from smc.compat import context_var, copy_context, thread_local_values, \
+    set_thread_local_values, reset_thread_local_values
 from smc.api.web import send_request
 from smc.api.exceptions import SMCOperationFailure, SMCConnectionError, \
     SessionManagerNotFound
 
 
+#: Session bound to the current context by session_scope
+_current_session = context_var('smc_session')
+
+
+def current_session():
+    """
+    Session bound to the current thread or asyncio task by
+    :func:`session_scope`, or None
+
+    :rtype: smc.api.session.Session
+    """
+    return _current_session.get()
+
+
+@contextmanager
+def session_scope(session):
+    """
+    Send all requests made in the block using the provided session, rather
+    than the session selected by the session manager. The binding is local
+    to the current thread or asyncio task, so concurrent workers can each
+    use their own session, for example to work in different admin domains
+    at the same time::
+
+        from smc import session_scope
+        from smc.api.session import Session
+        from smc.api.executor import map_calls
+
+        def export_domain(domain):
+            domain_session = Session()
+            domain_session.login(url=url, api_key=api_key, domain=domain)
+            with session_scope(domain_session):
+                return [host.name for host in Host.objects.all()]
+
+        results = map_calls(export_domain, ['Domain A', 'Domain B'])
+
+    Requests submitted to a :class:`smc.api.executor.RequestExecutor` within
+    the block also use the session. Use an
+    :class:`smc.api.aio.AsyncSession` to bind the session of asyncio
+    requests.
+
+    .. note:: On Python versions before 3.7, the binding is local to the
+        current thread only.
+
+    :param session: session to use, or None to use the session manager
+    :type session: smc.api.session.Session
+    """
+    token = _current_session.set(session)
+    try:
+        yield session
+    finally:
+        _current_session.reset(token)
+
+
+def bind_context(fn):
+    """
+    Return a callable running fn in a copy of the current context, used
+    to run fn in another thread with the session bound by session_scope,
+    the throttle lane and the tracing span of the caller.
+
+    :rtype: callable
+    """
+    if copy_context is not None:
+        context = copy_context()
+        return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+    values = thread_local_values()
+    def run(*args, **kwargs):
+        tokens = set_thread_local_values(values)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            reset_thread_local_values(tokens)
+    return run
+
+
 def _get_session(session_manager=None):
+    session = _current_session.get()
+    if session is not None:
+        return session
     if not session_manager:
         session_manager = getattr(SMCRequest, '_session_manager')
     try:
@@ -115,6 +195,23 @@ def entry_point():
     return _get_session().entry_points
 
 
+def load_resource(name, loader):
+    """
+    Load a resource that does not change for the SMC version from the
+    resource cache of the current session, calling `loader` to retrieve
+    it if it is not cached or the cache is not enabled. See
+    :class:`smc.api.diskcache.ResourceCache`.
+
+    :param str name: name of the resource
+    :param loader: callable returning the resource
+    :return: resource
+    """
+    cache = getattr(_get_session(), 'resource_cache', None)
+    if cache is None:
+        return loader()
+    return cache.load(name, loader)
+
+
 def fetch_entry_point(name):
     """
     Get the entry point href based on the input name. Entry points are
@@ -0,0 +1,134 @@
+"""
+Compression of responses received from the SMC.
+
+Every request sent by a session, including version discovery, login and
+the entry point catalog, asks the SMC for a gzip or deflate encoded
+response with the `Accept-Encoding` header. JSON documents such as
+engines, routing trees or rule lists typically compress to a fraction of
+their size, which saves bandwidth and time on slow links. Responses are
+decoded transparently.
+
+The encoded size, decoded size and decode time of compressed responses
+are recorded in the session metrics, by entry point:
+
+* `compressed_responses_total`: responses received compressed, by encoding
+* `response_wire_bytes_total`: encoded size of compressed responses
+* `response_decoded_bytes_total`: decoded size of compressed responses
+* `response_compression_ratio`: decoded size to encoded size, over all
+  compressed responses of the entry point
+* `response_decode_seconds`: time spent decoding compressed responses
+
+For example::
+
+    >>> session.metrics.compression_ratio()
+    7.8
+    >>> session.metrics.get('response_wire_bytes_total', rel='single_fw')
+    52311
+
+Streamed responses are decoded while they are read and are not recorded.
+File downloads are requested without compression, so interrupted
+downloads can be resumed.
+"""
+import zlib
+from timeit import default_timer
+import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.exceptions import ProtocolError, ReadTimeoutError
+
+
+#: Content codings accepted from the SMC
+ACCEPT_ENCODING = 'gzip, deflate'
+
+#: Histogram buckets in seconds for the decode time of a response
+DECODE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5)
+
+
+def decode(content, encoding):
+    """
+    Decode a gzip or deflate encoded response body
+
+    :param bytes content: encoded body
+    :param str encoding: value of the Content-Encoding header
+    :raises zlib.error: the body is not valid for the encoding
+    :rtype: bytes
+    """
+    if encoding == 'gzip':
+        decoded = []
+        while content: # A gzip body may have several members
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            decoded.append(decompressor.decompress(content))
+            decoded.append(decompressor.flush())
+            content = decompressor.unused_data
+        return b''.join(decoded)
+    try:
+        return zlib.decompress(content)
+    except zlib.error: # Raw deflate stream without zlib header
+        return zlib.decompress(content, -zlib.MAX_WBITS)
+
+
+def record(metrics, rel, encoding, wire_bytes, decoded_bytes, duration):
+    """
+    Record a compressed response in the session metrics
+
+    :param MetricsRegistry metrics: metrics of the session
+    :param str rel: entry point of the request
+    :param str encoding: content encoding of the response
+    :param int wire_bytes: encoded size of the body
+    :param int decoded_bytes: decoded size of the body
+    :param float duration: decode time in seconds
+    :return: None
+    """
+    metrics.inc('compressed_responses_total', rel=rel, encoding=encoding)
+    metrics.inc('response_wire_bytes_total', wire_bytes, rel=rel)
+    metrics.inc('response_decoded_bytes_total', decoded_bytes, rel=rel)
+    metrics.observe('response_decode_seconds', duration, DECODE_BUCKETS, rel=rel)
+    metrics.set_gauge('response_compression_ratio',
+        metrics.compression_ratio(rel=rel), rel=rel)
+
+
+class CompressionAdapter(HTTPAdapter):
+    """
+    Transport adapter decoding compressed responses and recording the
+    compression metrics of the session. Other keyword arguments are
+    passed to :class:`requests.adapters.HTTPAdapter`.
+
+    :param MetricsRegistry metrics: metrics of the session, if None
+        nothing is recorded
+    :param rel_of: callable returning the entry point rel of an url
+    """
+    def __init__(self, metrics=None, rel_of=None, **kwargs):
+        self.metrics = metrics
+        self.rel_of = rel_of
+        super(CompressionAdapter, self).__init__(**kwargs)
+
+    def send(self, request, stream=False, **kwargs):
+        # Read the body undecoded to measure the encoded size and decode time
+        response = super(CompressionAdapter, self).send(
+            request, stream=True, **kwargs)
+        encoding = response.headers.get('content-encoding', '').strip().lower()
+        if stream or encoding not in ('gzip', 'deflate'):
+            return response
+
+        try:
+            content = response.raw.read(decode_content=False) or b''
+        except ProtocolError as e:
+            raise requests.exceptions.ChunkedEncodingError(e)
+        except ReadTimeoutError as e:
+            raise requests.exceptions.ConnectionError(e)
+        finally:
+            response.raw.release_conn()
+        start = default_timer()
+        try:
+            decoded = decode(content, encoding) if content else b''
+        except zlib.error as e:
+            raise requests.exceptions.ContentDecodingError(
+                'Failed to decode %s response: %s' % (encoding, e))
+        duration = default_timer() - start
+
+        response._content = decoded
+        response._content_consumed = True
+        if self.metrics is not None and content:
+            rel = self.rel_of(request.url) if self.rel_of else 'other'
+            record(self.metrics, rel, encoding, len(content), len(decoded),
+                duration)
+        return response
@@ -109,6 +109,7 @@ def load_from_file(alt_filepath=None):
         smc_ssl=True
         verify_ssl=True
         retry_on_busy=True
+        pool_maxsize=32
         ssl_cert_file='/Users/davidlepage/home/mycacert.pem'
 
     :param str smc_address: IP of the SMC Server
@@ -118,6 +119,13 @@ def load_from_file(alt_filepath=None):
     :param bool smc_ssl: Whether to use SSL (default: False)
     :param bool verify_ssl: Verify client cert (default: False)
     :param bool retry_on_busy: Retry CRUD operation if service is unavailable (default: False)
+    :param int pool_connections: Number of connection pools to cache (default: 10)
+    :param int pool_maxsize: Max number of connections to keep open to the SMC (default: 10)
+    :param bool pool_block: Block when no free connections are available (default: False)
+    :param str json_codec: JSON codec, json or orjson (default: json)
+    :param bool session_cache: Save the session and resume it on the next login (default: False)
+    :param bool resource_cache: Save resources that do not change for an SMC version, such
+        as the API entry points, and load them on the next login (default: False)
     :param str ssl_cert_file: Full path to client pem (default: None)
 
     The only settings that are required are smc_address and smc_apikey.
@@ -130,7 +138,9 @@ def load_from_file(alt_filepath=None):
 
     """
     required = ['smc_address', 'smc_apikey']
-    bool_type = ['smc_ssl', 'verify_ssl', 'retry_on_busy']  # boolean option flag
+    bool_type = ['smc_ssl', 'verify_ssl', 'retry_on_busy', 'pool_block', 'session_cache',
+                 'resource_cache']  # boolean option flag
+    int_type = ['pool_connections', 'pool_maxsize']
     option_names = ['smc_port',
                     'api_version',
                     'smc_ssl',
@@ -138,7 +148,13 @@ def load_from_file(alt_filepath=None):
                     'ssl_cert_file',
                     'retry_on_busy',
                     'timeout',
-                    'domain']
+                    'domain',
+                    'pool_connections',
+                    'pool_maxsize',
+                    'pool_block',
+                    'json_codec',
+                    'session_cache',
+                    'resource_cache']
 
     parser = configparser.SafeConfigParser(defaults={
         'smc_port': '8082',
@@ -172,6 +188,8 @@ def load_from_file(alt_filepath=None):
             if parser.has_option(section, name):
                 if name in bool_type:
                     config_dict[name] = parser.getboolean(section, name)
+                elif name in int_type:
+                    config_dict[name] = parser.getint(section, name)
                 else:  # str
                     config_dict[name] = parser.get(section, name)
 
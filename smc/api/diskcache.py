@@ -0,0 +1,243 @@
+"""
+Small file based cache used to persist state between runs of scripts
+that use smc-python, for example the session resume cache and the
+:class:`ResourceCache` of data that does not change for an SMC version.
+
+Entries are JSON documents stored one per file and identified by a key,
+usually built with :func:`cache_key` from the SMC URL, API version and
+other inputs the cached value depends on. Files are written atomically and
+are only readable by the owner (0600), in a directory only accessible by
+the owner (0700), as entries may hold session identifiers. A cache
+directory that other users can access, or owned by another user, is not
+used: a warning is logged and entries are neither read nor written.
+
+The default location is ``$SMC_CACHE_DIR`` if set, otherwise
+``$XDG_CACHE_HOME/smc-python`` or ``~/.cache/smc-python``.
+"""
+import os
+import stat
+import json
+import errno
+import hashlib
+import logging
+import tempfile
+
+
+logger = logging.getLogger(__name__)
+
+
+#: Environment variable overriding the default cache directory
+CACHE_DIR_ENV = 'SMC_CACHE_DIR'
+
+
+def default_cache_dir():
+    """
+    Default directory for cache files
+
+    :rtype: str
+    """
+    directory = os.environ.get(CACHE_DIR_ENV)
+    if not directory:
+        base = os.environ.get('XDG_CACHE_HOME') or \
+            os.path.join(os.path.expanduser('~'), '.cache')
+        directory = os.path.join(base, 'smc-python')
+    return directory
+
+
+def cache_key(*parts):
+    """
+    Build a cache key from the provided values. Values must be JSON
+    serializable. The key is a hash so it does not reveal the values.
+
+    :rtype: str
+    """
+    data = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class DiskCache(object):
+    """
+    Store JSON serializable values in files under a directory.
+
+    :param str directory: cache directory (default: :func:`default_cache_dir`)
+    :param str namespace: prefix for the files of this cache
+    """
+    def __init__(self, directory=None, namespace='cache'):
+        self.directory = os.path.expanduser(directory or default_cache_dir())
+        self.namespace = namespace
+        self._warned = False
+
+    def _directory_ok(self, create=False):
+        """
+        Check the cache directory is only accessible by it's owner, the
+        current user. The directory is created with mode 0700 if it does
+        not exist and `create` is True.
+
+        :rtype: bool
+        """
+        try:
+            if create and not os.path.isdir(self.directory):
+                try:
+                    os.makedirs(self.directory, 0o700)
+                except OSError as e:
+                    if e.errno != errno.EEXIST:
+                        raise
+                else:
+                    # The mode of makedirs is subject to the umask
+                    os.chmod(self.directory, 0o700)
+            st = os.stat(self.directory)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                logger.warning('Cache directory %s can not be used: %s',
+                    self.directory, e)
+            return False
+        if os.name == 'nt':
+            return True
+        if st.st_uid != os.getuid() or stat.S_IMODE(st.st_mode) & 0o077:
+            if not self._warned:
+                logger.warning('Not using cache directory %s, it must be owned '
+                    'by the current user with mode 0700 (mode is %04o). Run: '
+                    'chmod 700 %s', self.directory, stat.S_IMODE(st.st_mode),
+                    self.directory)
+                self._warned = True
+            return False
+        return True
+
+    def path(self, key):
+        """
+        Path of the file for the key
+
+        :rtype: str
+        """
+        return os.path.join(self.directory, '%s-%s.json' % (self.namespace, key))
+
+    def get(self, key):
+        """
+        Get the value for the key
+
+        :return: value or None if the entry does not exist or can not be read
+        """
+        if not self._directory_ok():
+            return None
+        try:
+            with open(self.path(key), 'rb') as f:
+                return json.loads(f.read().decode('utf-8'))
+        except (IOError, OSError, ValueError) as e:
+            if getattr(e, 'errno', None) != errno.ENOENT:
+                logger.debug('Ignoring unreadable cache entry %s: %s',
+                    self.path(key), e)
+            return None
+
+    def set(self, key, value):
+        """
+        Store the value for the key. Errors writing the cache are logged
+        and ignored.
+
+        :return: None
+        """
+        if not self._directory_ok(create=True):
+            return
+        try:
+            # mkstemp creates the file readable by the owner only
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(json.dumps(value).encode('utf-8'))
+                getattr(os, 'replace', os.rename)(tmp, self.path(key))
+            except Exception:
+                os.unlink(tmp)
+                raise
+        except (IOError, OSError, TypeError, ValueError) as e:
+            logger.warning('Failed to write cache entry %s: %s', self.path(key), e)
+
+    def delete(self, key):
+        """
+        Remove the entry for the key if it exists
+
+        :return: None
+        """
+        try:
+            os.unlink(self.path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        """
+        Remove all entries of this cache
+
+        :return: None
+        """
+        prefix = '%s-' % self.namespace
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            if name.startswith(prefix) and name.endswith('.json'):
+                try:
+                    os.unlink(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def __repr__(self):
+        return '%s(directory=%s, namespace=%s)' % (
+            self.__class__.__name__, self.directory, self.namespace)
+
+
+class ResourceCache(DiskCache):
+    """
+    Cache of SMC resources that do not change for a given SMC and API
+    version, such as the entry point catalog or the log field schema.
+    Entries are named and scoped to the SMC URL and API version, so an
+    SMC upgrade to a new API version uses new entries. Entries are kept
+    until they are invalidated explicitly, for example after an SMC
+    upgrade that did not change the API version::
+
+        session.resource_cache.invalidate()
+
+    :param str url: url of the SMC
+    :param str api_version: API version, None for resources that do not
+        depend on the version (such as the list of API versions)
+    :param str directory: cache directory (default: :func:`default_cache_dir`)
+    """
+    def __init__(self, url, api_version=None, directory=None):
+        self.url = url
+        self.api_version = api_version
+        super(ResourceCache, self).__init__(directory, namespace='resource-%s' % (
+            cache_key(url, None if api_version is None else str(api_version))[:16]))
+
+    def load(self, name, loader):
+        """
+        Get the named resource, calling `loader` to retrieve it from the
+        SMC and store it if it is not cached. Values of None are not
+        stored.
+
+        :param str name: name of the resource
+        :param loader: callable returning the resource
+        :return: resource
+        """
+        value = self.get(name)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self.set(name, value)
+        else:
+            logger.debug('Loaded %s from cache: %s', name, self.path(name))
+        return value
+
+    def invalidate(self, name=None):
+        """
+        Remove the named resource, or all resources of the SMC and API
+        version if no name is provided.
+
+        :param str name: name of the resource
+        :return: None
+        """
+        if name is None:
+            self.clear()
+        else:
+            self.delete(name)
+
+    def __repr__(self):
+        return 'ResourceCache(url=%s, api_version=%s, directory=%s)' % (
+            self.url, self.api_version, self.directory)
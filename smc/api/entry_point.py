@@ -11,8 +11,26 @@ EntryPoint.__new__.__defaults__ = (None,) * len(EntryPoint._fields) # Version 5.
 
 
 class Resource(object):
-    def __init__(self, entry_point_list):
+    """
+    Entry points of the SMC API, indexed by rel name.
+
+    :param list entry_point_list: entry points as returned by the SMC API
+    :param callable reload: optional function returning a fresh entry point
+        list, called once when a rel is not found. Used when the entry
+        points were loaded from a cache that may be out of date
+    """
+    def __init__(self, entry_point_list, reload=None):
         self._entry_points = entry_point_list
+        self._reload = reload
+        self._rel_by_href = None
+        self._index()
+    
+    def _index(self):
+        self._href_by_rel = {}
+        for link in self._entry_points:
+            # Keep the first entry if a rel is duplicated
+            self._href_by_rel.setdefault(link.get('rel'), link.get('href'))
+        self._rel_by_href = None
         
     def __iter__(self):
         for entry in self._entry_points:
@@ -21,8 +39,22 @@ class Resource(object):
     def __len__(self):
         return len(self._entry_points)
     
+    def __contains__(self, rel):
+        return rel in self._href_by_rel
+    
     def clear(self):
         self._entry_points[:] = []
+        self._href_by_rel = {}
+        self._rel_by_href = None
+    
+    @property
+    def index(self):
+        """
+        Entry point href by rel name
+        
+        :rtype: dict
+        """
+        return dict(self._href_by_rel)
     
     def all(self):
         """
@@ -50,11 +82,39 @@ class Resource(object):
         :raises UnsupportedEntryPoint: entry point not found in this version
             of the API
         """
-        for link in self._entry_points:
-            if link.get('rel') == rel:
-                return link.get('href')
+        href = self._href_by_rel.get(rel)
+        if href is not None:
+            return href
+        if self._reload is not None and self._entry_points:
+            reload, self._reload = self._reload, None
+            self._entry_points = reload()
+            self._index()
+            return self.get(rel)
         raise UnsupportedEntryPoint(
             "The specified entry point '{}' was not found in this "
             "version of the SMC API. Check the element documentation "
             "to determine the correct version and specify the api_version "
             "parameter during session.login() if necessary.".format(rel))
+    
+    def rel_of(self, href):
+        """
+        Get the rel name of the entry point an href belongs to. This is
+        the entry point with the longest href that is a prefix of the
+        provided href, for example the href of a host element returns
+        'host'.
+        
+        :param str href: href of an element or resource
+        :return: rel name or None if the href is not under an entry point
+        :rtype: str
+        """
+        if self._rel_by_href is None:
+            self._rel_by_href = {link.get('href'): link.get('rel')
+                for link in self._entry_points}
+        url = href.split('?', 1)[0].rstrip('/') if href else ''
+        while url:
+            rel = self._rel_by_href.get(url)
+            if rel is not None:
+                return rel
+            url, sep, _ = url.rpartition('/')
+            if not sep:
+                break
@@ -40,6 +40,14 @@ class SMCConnectionError(SMCException):
     """
 
 
+class CircuitBreakerOpen(SMCConnectionError):
+    """
+    Requests to the SMC are suspended by the circuit breaker of the
+    session after repeated failures. Requests are sent again once the
+    recovery timeout has passed.
+    """
+
+
 class SMCOperationFailure(SMCException):
     """ Exception class for storing results from calls to the SMC
     This is thrown for HTTP methods that do not return the expected HTTP
@@ -0,0 +1,235 @@
+"""
+Executor for sending SMCRequests concurrently.
+
+Bulk operations such as creating thousands of hosts or deleting stale
+elements are bound by the round trip time of each request when run in a
+serial loop. The executor runs requests on a bounded pool of worker threads
+that share the session and it's connection pool. Results are returned in
+the same order as the requests were provided.
+
+Submit a single request and obtain a :class:`concurrent.futures.Future`::
+
+    from smc.api.executor import submit
+    future = submit(SMCRequest(href=href), 'read')
+    result = future.result()   # SMCResult
+
+Create a large number of hosts using 16 concurrent requests::
+
+    from smc.api.common import SMCRequest
+    from smc.api.executor import map_requests
+    from smc.elements.network import Host
+    from smc.api.exceptions import CreateElementFailed
+
+    requests = []
+    for i in range(5000):
+        request = SMCRequest(href=Host.href,
+            json={'name': 'host-%s' % i, 'address': '10.0.%s.%s' % (i // 250, i % 250)})
+        request.exception = CreateElementFailed
+        requests.append(request)
+
+    results = map_requests(requests, 'create', concurrency=16,
+        return_exceptions=True)
+    failed = [r for r in results if isinstance(r, Exception)]
+
+Delete stale elements::
+
+    map_requests([SMCRequest(href=host.href) for host in stale], 'delete')
+
+.. note:: Set the session connection pool size to at least the concurrency
+    level by providing `pool_maxsize` to :meth:`smc.api.session.Session.login`,
+    otherwise connections beyond the pool size are opened and discarded for
+    each request.
+
+.. note:: Python 2.7 requires the `futures` backport package.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from smc.api.common import _get_session, bind_context
+
+
+logger = logging.getLogger(__name__)
+
+
+#: Default number of concurrent requests
+DEFAULT_CONCURRENCY = 8
+
+
+def _check_pool_size(concurrency):
+    """
+    Log a warning if the concurrency exceeds the connection pool of the
+    session handling the requests.
+    """
+    try:
+        pool = _get_session().connection_pool
+    except Exception: # No session or session without a pool (async)
+        return
+    if concurrency > pool['pool_maxsize'] and not pool['pool_block']:
+        logger.warning('Concurrency of %s exceeds the session connection pool '
+            'size of %s. Set pool_maxsize on login to re-use connections.',
+            concurrency, pool['pool_maxsize'])
+
+
+def _gather(futures, return_exceptions=False):
+    """
+    Wait for all futures and return the results in order. If
+    return_exceptions is False, the first exception in order is
+    raised once all futures have completed.
+    """
+    results = []
+    error = None
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            if error is None:
+                error = e
+            results.append(e)
+    if error is not None and not return_exceptions:
+        raise error
+    return results
+
+
+class RequestExecutor(object):
+    """
+    A bounded pool of workers used to send requests concurrently.
+    The executor can be used as a context manager, in which case it
+    is shut down on exit::
+
+        with RequestExecutor(max_workers=16) as executor:
+            futures = [executor.submit(request, 'delete') for request in requests]
+
+    :param int max_workers: max number of concurrent requests
+    """
+    def __init__(self, max_workers=DEFAULT_CONCURRENCY):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        _check_pool_size(max_workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exctype, value, traceback):
+        self.shutdown()
+
+    def submit(self, request, method='read'):
+        """
+        Submit a request to the executor.
+
+        :param SMCRequest request: request to send
+        :param str method: request method, 'read', 'create', 'update'
+            or 'delete' (default: 'read')
+        :return: future resolving to an SMCResult, or raising the exception
+            set on the request
+        :rtype: concurrent.futures.Future
+        """
+        return self.call(getattr(request, method))
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Submit a callable to the executor. Use this to run higher level
+        operations that send requests, for example ``element.delete``.
+        The callable runs with the session bound by
+        :func:`smc.api.common.session_scope` when it was submitted.
+
+        :rtype: concurrent.futures.Future
+        """
+        return self._executor.submit(bind_context(fn), *args, **kwargs)
+
+    def map(self, requests, method='read', return_exceptions=False):
+        """
+        Send all requests and return the results in the same order.
+
+        :param list requests: requests to send
+        :type requests: list(SMCRequest)
+        :param str method: request method for all requests
+        :param bool return_exceptions: if True, a failed request has the
+            exception in it's position of the result list. Otherwise the first
+            exception is raised after all requests complete.
+        :rtype: list(SMCResult)
+        """
+        return _gather([self.submit(request, method) for request in requests],
+            return_exceptions)
+
+    def map_calls(self, fn, iterable, return_exceptions=False):
+        """
+        Call fn with each item of the iterable and return the results in
+        the same order.
+
+        :rtype: list
+        """
+        return _gather([self.call(fn, item) for item in iterable],
+            return_exceptions)
+
+    def shutdown(self, wait=True):
+        """
+        Shutdown the executor
+
+        :param bool wait: wait for pending requests to complete
+        """
+        self._executor.shutdown(wait=wait)
+
+
+_default_executor = None
+_lock = threading.Lock()
+
+
+def default_executor():
+    """
+    Return the shared executor used by :func:`submit`. The executor is
+    created on first use with :data:`DEFAULT_CONCURRENCY` workers.
+
+    :rtype: RequestExecutor
+    """
+    global _default_executor
+    with _lock:
+        if _default_executor is None:
+            _default_executor = RequestExecutor()
+        return _default_executor
+
+
+def submit(request, method='read'):
+    """
+    Submit a request to the shared executor.
+
+    :param SMCRequest request: request to send
+    :param str method: request method, 'read', 'create', 'update'
+        or 'delete' (default: 'read')
+    :rtype: concurrent.futures.Future
+    """
+    return default_executor().submit(request, method)
+
+
+def map_requests(requests, method='read', concurrency=DEFAULT_CONCURRENCY,
+        return_exceptions=False):
+    """
+    Send the requests using a pool of `concurrency` workers and return
+    the results in the same order as the requests.
+
+    :param list requests: requests to send
+    :type requests: list(SMCRequest)
+    :param str method: request method for all requests, 'read', 'create',
+        'update' or 'delete' (default: 'read')
+    :param int concurrency: max number of requests in flight
+    :param bool return_exceptions: if True, a failed request has the
+        exception in it's position of the result list. Otherwise the first
+        exception is raised after all requests complete.
+    :rtype: list(SMCResult)
+    """
+    with RequestExecutor(max_workers=concurrency) as executor:
+        return executor.map(requests, method, return_exceptions)
+
+
+def map_calls(fn, iterable, concurrency=DEFAULT_CONCURRENCY,
+        return_exceptions=False):
+    """
+    Call fn with each item of the iterable using a pool of `concurrency`
+    workers and return the results in order. For example, delete
+    elements concurrently::
+
+        map_calls(lambda host: host.delete(), hosts, concurrency=16)
+
+    :rtype: list
+    """
+    with RequestExecutor(max_workers=concurrency) as executor:
+        return executor.map_calls(fn, iterable, return_exceptions)
@@ -0,0 +1,161 @@
+"""
+Incremental decoding of JSON list responses.
+
+Search results from the SMC are returned as a single JSON document of the
+form ``{"result": [{...}, {...}, ...]}``. Decoding the document with
+``json.loads`` requires the full response body to be buffered and the
+complete list of results to be built before the first result can be used.
+For entry points with a large number of elements (hosts, task_progress,
+etc) this creates a large memory spike.
+
+The decoder in this module parses the response body as it is received
+and yields each item of the result list once it has been decoded. Memory
+use is bounded by the size of a single item and the read chunk size rather
+than the size of the result::
+
+    >>> from smc.api.jsonstream import iter_items
+    >>> list(iter_items([b'{"result": [{"na', b'me": "a"}, {"name": "b"}]}']))
+    [{'name': 'a'}, {'name': 'b'}]
+"""
+import json
+import codecs
+
+
+#: Default size of chunks read from the response body
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = ' \t\n\r'
+_NUMBER = '0123456789.eE+-'
+
+
+class _Buffer(object):
+    """
+    Text buffer fed from an iterable of byte chunks. Values are decoded
+    from the current position using `json.JSONDecoder.raw_decode`, reading
+    more chunks as needed when a value spans chunk boundaries.
+    """
+    def __init__(self, chunks, encoding='utf-8'):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self._json = json.JSONDecoder()
+        self.text = ''
+        self.pos = 0
+        self.eof = False
+
+    def read(self):
+        """
+        Read the next chunk into the buffer. Consumed text is discarded
+        so the buffer only holds data that is not yet decoded.
+
+        :return: False if the end of the stream is reached
+        """
+        if self.eof:
+            return False
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self.eof = True
+            chunk = b''
+        if isinstance(chunk, bytes):
+            chunk = self._decoder.decode(chunk, final=self.eof)
+        self.text = self.text[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """
+        Return the next non whitespace character, or None at the end
+        of the stream.
+        """
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.read():
+                return None
+
+    def expect(self, *chars):
+        """
+        Consume and return the next non whitespace character which
+        must be one of chars.
+        """
+        char = self.peek()
+        if char not in chars:
+            raise ValueError('Expecting one of %r at position %s, found %r' %
+                (chars, self.pos, char))
+        self.pos += 1
+        return char
+
+    def value(self):
+        """
+        Decode the next JSON value. A number may continue in the next
+        chunk (12 followed by 34 or .5), so a number is only accepted once
+        the character following it is available and can not be part of it.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self.text, self.pos)
+                if self.eof or (end < len(self.text) and
+                        self.text[end] not in _NUMBER):
+                    self.pos = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise
+            self.read()
+
+
+def iter_items(chunks, key='result', encoding='utf-8'):
+    """
+    Incrementally decode a JSON document from an iterable of byte (or
+    text) chunks and yield each item of the list it contains. The list
+    can be the top level value or the value of `key` in a top level
+    object. Other members of a top level object are decoded and skipped.
+    If the document is an object without `key`, the object is yielded.
+
+    :param chunks: iterable of bytes, such as `Response.iter_content()`
+    :param str key: key of the list in the top level object
+    :param str encoding: encoding of the byte chunks
+    :raises ValueError: the document is not valid JSON
+    :return: generator yielding list items
+    """
+    buf = _Buffer(chunks, encoding)
+    first = buf.peek()
+    if first is None: # Empty body
+        return
+    if first == '[':
+        for item in _iter_array(buf):
+            yield item
+        return
+    if first != '{':
+        buf.value() # Scalar document
+        return
+
+    buf.expect('{')
+    skipped = {}
+    if buf.peek() == '}':
+        return
+    while True:
+        name = buf.value()
+        buf.expect(':')
+        if name == key and buf.peek() == '[':
+            for item in _iter_array(buf):
+                yield item
+            return
+        skipped[name] = buf.value()
+        if buf.expect(',', '}') == '}':
+            break
+    yield skipped
+
+
+def _iter_array(buf):
+    buf.expect('[')
+    if buf.peek() == ']':
+        buf.pos += 1
+        return
+    while True:
+        yield buf.value()
+        if buf.expect(',', ']') == ']':
+            return
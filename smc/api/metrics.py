@@ -0,0 +1,316 @@
+"""
+Metrics collected for requests sent to the SMC.
+
+Each session has it's own :class:`MetricsRegistry` available from the
+`metrics` attribute of the session. Metrics are recorded for every request
+sent through the session, including latency by HTTP method and entry point,
+bytes sent and received, retries, session re-authentication, ETag conflicts,
+conditional GET cache hits, coalesced GETs, response compression (see
+:mod:`smc.api.compression`) and throttling (see :mod:`smc.api.throttle`).
+
+Obtain an in-process snapshot of the metrics::
+
+    >>> from smc import session
+    >>> session.metrics.snapshot()['requests_total']
+    [{'labels': {'method': 'GET', 'rel': 'host', 'status': '200'}, 'value': 12}, ...]
+
+Print a summary of where time is spent, slowest entry points first::
+
+    >>> for sample in sorted(session.metrics.snapshot()['request_duration_seconds'],
+    ...         key=lambda s: s['sum'], reverse=True):
+    ...     print(sample['labels'], sample['count'], sample['sum'])
+
+Dump the metrics in the Prometheus text exposition format, for example to
+write to a node exporter textfile collector::
+
+    with open('/var/lib/node_exporter/smc.prom', 'w') as f:
+        f.write(session.metrics.to_prometheus())
+
+Entry point labels (`rel`) are resolved from the request href by matching
+the longest entry point href that prefixes it. Requests that do not map to
+an entry point (login, API discovery) are labeled `other`.
+"""
+import threading
+import collections
+
+
+#: Default histogram buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+#: Metric name to (type, description)
+METRICS = {
+    'request_duration_seconds': ('histogram', 'Latency of SMC API requests'),
+    'requests_total': ('counter', 'SMC API requests by method, entry point and status'),
+    'requests_in_flight': ('gauge', 'SMC API requests waiting for a response'),
+    'request_bytes_total': ('counter', 'Bytes sent in SMC API request bodies'),
+    'response_bytes_total': ('counter', 'Bytes received in SMC API response bodies'),
+    'retries_total': ('counter', 'Requests retried by method, entry point and reason'),
+    'retry_wait_seconds_total': ('counter', 'Seconds waited before retrying requests'),
+    'circuit_breaker_state': ('gauge', 'Circuit breaker state: 0 closed, 1 open, 2 half open'),
+    'circuit_breaker_rejections_total': ('counter', 'Requests rejected by an open circuit breaker'),
+    'reauthentications_total': ('counter', 'Session refreshes after HTTP 401'),
+    'conflicts_total': ('counter', 'Requests that received HTTP 409 (ETag conflict)'),
+    'cache_hits_total': ('counter', 'Conditional GETs answered with HTTP 304'),
+    'cache_misses_total': ('counter', 'Conditional GETs that returned a new payload'),
+    'coalesced_requests_total': ('counter', 'GETs answered by an identical GET in flight'),
+    'compressed_responses_total': ('counter', 'Responses received gzip or deflate encoded'),
+    'response_wire_bytes_total': ('counter', 'Encoded size of compressed responses'),
+    'response_decoded_bytes_total': ('counter', 'Decoded size of compressed responses'),
+    'response_compression_ratio': ('gauge', 'Decoded to encoded size of compressed responses'),
+    'response_decode_seconds': ('histogram', 'Time spent decoding compressed responses'),
+    'throttle_queue_depth': ('gauge', 'Requests waiting for the throttle by method class and lane'),
+    'throttle_wait_seconds': ('histogram', 'Time requests waited for the throttle'),
+}
+
+
+class Histogram(object):
+    """
+    Cumulative histogram with fixed buckets.
+
+    :param tuple buckets: upper bounds of the buckets, sorted
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """
+        Return bucket upper bound to cumulative count, including +Inf
+
+        :rtype: list(tuple)
+        """
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            result.append((bound, total))
+        result.append((float('inf'), self.count))
+        return result
+
+
+def _labels_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join(
+        '%s="%s"' % (k, v.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+        for k, v in labels)
+
+
+class MetricsRegistry(object):
+    """
+    Thread safe registry of counters, gauges and histograms. Metric
+    values are keyed by name and a set of labels.
+
+    :param str prefix: prefix used for metric names in the Prometheus
+        exposition format
+    """
+    def __init__(self, prefix='smc_'):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters = collections.defaultdict(dict)
+        self._gauges = collections.defaultdict(dict)
+        self._histograms = collections.defaultdict(dict)
+
+    def inc(self, name, value=1, **labels):
+        """
+        Increment a counter
+
+        :param str name: name of counter
+        :param int value: amount to increment by
+        :param labels: labels for this counter value
+        """
+        key = _labels_key(labels)
+        with self._lock:
+            counter = self._counters[name]
+            counter[key] = counter.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        """
+        Set a gauge to a value
+
+        :param str name: name of gauge
+        :param value: value to set
+        :param labels: labels for this gauge value
+        """
+        with self._lock:
+            self._gauges[name][_labels_key(labels)] = value
+
+    def add_gauge(self, name, value, **labels):
+        """
+        Add a value, possibly negative, to a gauge
+
+        :param str name: name of gauge
+        :param value: value to add
+        :param labels: labels for this gauge value
+        """
+        key = _labels_key(labels)
+        with self._lock:
+            gauge = self._gauges[name]
+            gauge[key] = gauge.get(key, 0) + value
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS, **labels):
+        """
+        Record an observation in a histogram
+
+        :param str name: name of histogram
+        :param float value: value to observe
+        :param tuple buckets: buckets to use if the histogram is new
+        :param labels: labels for this histogram
+        """
+        key = _labels_key(labels)
+        with self._lock:
+            histogram = self._histograms[name].get(key)
+            if histogram is None:
+                histogram = self._histograms[name][key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def observe_request(self, method, rel, status, duration, bytes_out=0,
+                        bytes_in=0):
+        """
+        Record the metrics for a completed HTTP request
+
+        :param str method: HTTP method
+        :param str rel: entry point of the request
+        :param int status: HTTP status code
+        :param float duration: request duration in seconds
+        :param int bytes_out: size of the request body
+        :param int bytes_in: size of the response body
+        """
+        self.observe('request_duration_seconds', duration, method=method, rel=rel)
+        self.inc('requests_total', method=method, rel=rel, status=status)
+        if bytes_out:
+            self.inc('request_bytes_total', bytes_out, method=method, rel=rel)
+        if bytes_in:
+            self.inc('response_bytes_total', bytes_in, method=method, rel=rel)
+        if status == 409:
+            self.inc('conflicts_total', method=method, rel=rel)
+
+    def compression_ratio(self, **labels):
+        """
+        Return the decoded size to encoded size of compressed responses for
+        the labels provided, or over all entry points if no labels are
+        provided.
+
+        :return: ratio or None if no compressed response was received
+        :rtype: float
+        """
+        wire_bytes = self.get('response_wire_bytes_total', **labels)
+        if not wire_bytes:
+            return None
+        return self.get('response_decoded_bytes_total', **labels) / float(wire_bytes)
+
+    def get(self, name, **labels):
+        """
+        Get the value of a counter or gauge for the exact labels provided.
+        Returns the sum over all label values if no labels are provided.
+
+        :rtype: int or float
+        """
+        with self._lock:
+            values = self._counters.get(name) or self._gauges.get(name) or {}
+            if labels:
+                return values.get(_labels_key(labels), 0)
+            return sum(values.values())
+
+    def totals(self):
+        """
+        Return the total of each counter over all labels
+
+        :rtype: dict
+        """
+        with self._lock:
+            return {name: sum(values.values())
+                    for name, values in self._counters.items()}
+
+    def snapshot(self):
+        """
+        Return a point in time copy of all metrics. Each metric name maps
+        to a list of samples. Counter and gauge samples have `labels` and
+        `value` keys, histogram samples have `labels`, `count`, `sum` and
+        `buckets` (upper bound to cumulative count).
+
+        :rtype: dict
+        """
+        snapshot = {}
+        with self._lock:
+            for metrics in (self._counters, self._gauges):
+                for name, values in metrics.items():
+                    snapshot[name] = [
+                        {'labels': dict(key), 'value': value}
+                        for key, value in values.items()]
+            for name, values in self._histograms.items():
+                snapshot[name] = [
+                    {'labels': dict(key),
+                     'count': histogram.count,
+                     'sum': histogram.sum,
+                     'buckets': collections.OrderedDict(histogram.cumulative())}
+                    for key, histogram in values.items()]
+        return snapshot
+
+    def to_prometheus(self):
+        """
+        Return all metrics in the Prometheus text exposition format
+
+        :rtype: str
+        """
+        lines = []
+        with self._lock:
+            for kind, metrics in (('counter', self._counters),
+                                  ('gauge', self._gauges),
+                                  ('histogram', self._histograms)):
+                for name in sorted(metrics):
+                    full_name = self.prefix + name
+                    description = METRICS.get(name, (kind, name))[1]
+                    lines.append('# HELP %s %s' % (full_name, description))
+                    lines.append('# TYPE %s %s' % (full_name, kind))
+                    for key in sorted(metrics[name]):
+                        value = metrics[name][key]
+                        if kind != 'histogram':
+                            lines.append('%s%s %s' % (
+                                full_name, _format_labels(key), _format_value(value)))
+                            continue
+                        for bound, count in value.cumulative():
+                            lines.append('%s_bucket%s %s' % (
+                                full_name,
+                                _format_labels(key + (('le', _format_value(bound)),)),
+                                count))
+                        lines.append('%s_sum%s %s' % (
+                            full_name, _format_labels(key), repr(value.sum)))
+                        lines.append('%s_count%s %s' % (
+                            full_name, _format_labels(key), value.count))
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        """
+        Clear all metrics
+        """
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def __repr__(self):
+        return 'MetricsRegistry(%s)' % self.totals()
@@ -0,0 +1,211 @@
+"""
+Streaming multipart/form-data encoder used for file uploads.
+
+`requests` builds the complete multipart body in memory before sending
+it. The encoder in this module produces the body incrementally while it
+is being sent, reading each file in chunks, so memory use does not depend
+on the size of the files being uploaded.
+
+Fields are provided as a dict in the same format as the `files` argument
+of `requests`. A value can be an open file, bytes or str, or a tuple of
+(filename, value) or (filename, value, content_type)::
+
+    encoder = MultipartEncoder({'import_file': open('export.zip', 'rb')})
+    requests.post(url, data=encoder, headers={'Content-Type': encoder.content_type})
+
+When the size of every field is known, the body is sent with a
+Content-Length. Otherwise iterate the encoder to send the body with
+chunked transfer encoding.
+"""
+import os
+import binascii
+
+
+#: Default size of chunks read from files
+CHUNK_SIZE = 1024 * 1024
+
+
+def _to_bytes(value):
+    if isinstance(value, bytes):
+        return value
+    return value.encode('utf-8')
+
+
+def _remaining_size(fileobj):
+    """
+    Bytes remaining from the current position of the file, or None if
+    it can not be determined.
+    """
+    try:
+        return os.fstat(fileobj.fileno()).st_size - fileobj.tell()
+    except (AttributeError, IOError, OSError, ValueError):
+        pass
+    try:
+        position = fileobj.tell()
+        fileobj.seek(0, os.SEEK_END)
+        size = fileobj.tell() - position
+        fileobj.seek(position)
+        return size
+    except (AttributeError, IOError, OSError, ValueError):
+        return None
+
+
+class _Part(object):
+    """
+    A single field of the multipart body. The header is held in memory,
+    the value is read from file in chunks when it is a file object.
+    """
+    def __init__(self, boundary, name, value):
+        filename = None
+        content_type = None
+        if isinstance(value, (tuple, list)):
+            if len(value) > 2:
+                content_type = value[2]
+            filename, value = value[0], value[1]
+        else: # Same as requests, use the file name or the field name
+            filename = getattr(value, 'name', None)
+            if not isinstance(filename, str):
+                filename = None
+            filename = os.path.basename(filename or '') or name
+
+        disposition = 'form-data; name="%s"' % name
+        if filename:
+            disposition += '; filename="%s"' % filename
+        header = '--%s\r\nContent-Disposition: %s\r\n' % (boundary, disposition)
+        if content_type:
+            header += 'Content-Type: %s\r\n' % content_type
+        self.header = _to_bytes(header + '\r\n')
+
+        if hasattr(value, 'read'):
+            self.fileobj = value
+            self.data = None
+            try:
+                self.start = value.tell()
+            except (AttributeError, IOError, OSError):
+                self.start = None # Not seekable, can not be resent
+            self.size = _remaining_size(value)
+        else:
+            self.fileobj = None
+            self.data = _to_bytes(value)
+            self.size = len(self.data)
+
+    def __len__(self):
+        return len(self.header) + self.size + 2
+
+    def rewind(self):
+        if self.fileobj is not None and self.start is not None:
+            self.fileobj.seek(self.start)
+
+    def iter_chunks(self, chunk_size):
+        yield self.header
+        if self.fileobj is not None:
+            while True:
+                chunk = self.fileobj.read(chunk_size)
+                if not chunk:
+                    break
+                yield _to_bytes(chunk)
+        else:
+            yield self.data
+        yield b'\r\n'
+
+
+class MultipartEncoder(object):
+    """
+    Encode fields as a streamed multipart/form-data body. The encoder
+    can be used as a file like object (read) or as an iterator of chunks.
+
+    :param dict fields: field name to value
+    :param int chunk_size: size of chunks read from files
+    :param progress: optional callable called as progress(bytes_sent,
+        total_bytes) as the body is read. total_bytes is None if the length
+        of the body is not known
+    """
+    def __init__(self, fields, chunk_size=CHUNK_SIZE, progress=None):
+        self.boundary = binascii.hexlify(os.urandom(16)).decode('ascii')
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.parts = [_Part(self.boundary, name, value)
+                      for name, value in fields.items() if value is not None]
+        self._trailer = _to_bytes('--%s--\r\n' % self.boundary)
+        self.reset()
+
+    @property
+    def content_type(self):
+        """
+        Content-Type header for the body, including the boundary
+
+        :rtype: str
+        """
+        return 'multipart/form-data; boundary=%s' % self.boundary
+
+    @property
+    def len(self):
+        """
+        Total length of the encoded body, or None if the size of a
+        file field can not be determined.
+
+        :rtype: int
+        """
+        if any(part.size is None for part in self.parts):
+            return None
+        return sum(len(part) for part in self.parts) + len(self._trailer)
+
+    def __len__(self):
+        return self.len or 0
+
+    def __bool__(self):
+        return True # Body may be non empty even if the length is unknown
+    __nonzero__ = __bool__
+
+    def reset(self):
+        """
+        Rewind the encoder and file fields to the start so the body can
+        be sent again, for example after re-authentication.
+        """
+        for part in self.parts:
+            part.rewind()
+        self.sent = 0
+        self._buffer = b''
+        self._pos = 0
+        self._chunks = self._iter_chunks()
+
+    def _iter_chunks(self):
+        for part in self.parts:
+            for chunk in part.iter_chunks(self.chunk_size):
+                yield chunk
+        yield self._trailer
+
+    def _sent(self, chunk):
+        self.sent += len(chunk)
+        if self.progress and chunk:
+            self.progress(self.sent, self.len)
+        return chunk
+
+    def __iter__(self):
+        if self._pos < len(self._buffer):
+            yield self._sent(self._buffer[self._pos:])
+        self._buffer, self._pos = b'', 0
+        for chunk in self._chunks:
+            if chunk:
+                yield self._sent(chunk)
+
+    def read(self, size=-1):
+        """
+        Read up to size bytes of the encoded body. The full body is
+        read if size is not specified.
+
+        :rtype: bytes
+        """
+        if size is None or size < 0:
+            data = self._buffer[self._pos:] + b''.join(self._chunks)
+            self._buffer, self._pos = b'', 0
+            return self._sent(data)
+        while len(self._buffer) - self._pos < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer = self._buffer[self._pos:] + chunk
+            self._pos = 0
+        data = self._buffer[self._pos:self._pos + size]
+        self._pos += len(data)
+        return self._sent(data)
@@ -0,0 +1,242 @@
+"""
+Pool of sessions logged in with the same credentials.
+
+The SMC serializes part of the work done for a single HTTP session, so
+the throughput of one :class:`~smc.api.session.Session` is limited even
+when it is shared by many threads. A :class:`SessionPool` logs in several
+sessions and registers a hook on the session manager so that each request
+is sent using one of the sessions of the pool, without changes to the
+code making the requests::
+
+    from smc.api.pool import SessionPool
+    from smc.api.executor import map_requests
+
+    pool = SessionPool(size=4)
+    pool.login(url='https://1.1.1.1:8082', api_key='xxxxxxxxxxxxxxxxx',
+               pool_maxsize=8)
+    results = map_requests(requests, 'create', concurrency=32)
+    pool.logout()
+
+Requests are routed to the session with the least requests waiting for a
+response (`least_outstanding`, default) or to each session in turn
+(`round_robin`). Each session refreshes itself when it expires; the pool
+can also be refreshed or logged out as a whole.
+
+Sessions of a pool all log in with the same credentials, so they are
+tracked by the pool rather than registered by user name with the session
+manager. A session already logged in with the same credentials remains
+the default session of the manager. Pools that are still logged in are
+logged out when the interpreter exits. The session cache (`session_cache`)
+is not supported, as each session of the pool must be a separate session
+on the SMC.
+
+.. note:: Operations that depend on state held by a session, such as an
+    atomic block of transactions, must use a single session rather than
+    the pool.
+"""
+import atexit
+import weakref
+import logging
+import threading
+import itertools
+from smc.api.common import SMCRequest
+from smc.api.session import Session, SessionManager
+from smc.api.exceptions import SessionManagerNotFound, SMCConnectionError
+
+
+logger = logging.getLogger(__name__)
+
+
+#: Routing strategies of a pool
+ROUTING = ('least_outstanding', 'round_robin')
+
+#: Pools logged in, logged out at exit
+_pools = weakref.WeakSet()
+
+
+@atexit.register
+def _logout_pools():
+    for pool in list(_pools):
+        pool.logout()
+
+
+class _PoolMembers(SessionManager):
+    """
+    Manager of the sessions of a pool. The session manager registers
+    sessions by user name, which all sessions of a pool share, so pool
+    sessions are only tracked by the pool.
+    """
+    def _register(self, session):
+        pass
+
+    def _deregister(self, session):
+        pass
+
+
+class _PoolSession(Session):
+    """
+    Session of a pool. The session cache is disabled, otherwise every
+    session of the pool would resume the same SMC session.
+    """
+    @property
+    def session_cache(self):
+        return None
+
+
+class SessionPool(object):
+    """
+    Pool of sessions with the same credentials.
+
+    :param int size: number of sessions to log in
+    :param str routing: `least_outstanding` or `round_robin`
+    :param SessionManager manager: manager used to route requests, the
+        global session manager by default
+    :raises ValueError: invalid size or routing
+    """
+    def __init__(self, size=4, routing='least_outstanding', manager=None):
+        if size < 1:
+            raise ValueError('Session pool size must be at least 1')
+        if routing not in ROUTING:
+            raise ValueError('Invalid routing %r, valid values are: %s' % (
+                routing, ', '.join(ROUTING)))
+        self.size = size
+        self.routing = routing
+        self._manager = manager
+        self._sessions = []
+        self._counter = itertools.count()
+        self._previous_hook = None
+        self._members = _PoolMembers()
+        self._lock = threading.Lock()
+
+    @property
+    def manager(self):
+        """
+        Session manager the pool routes requests for
+
+        :rtype: SessionManager
+        """
+        manager = self._manager or SMCRequest._session_manager
+        if manager is None:
+            raise SessionManagerNotFound('A session manager was not found. '
+                'This is an initialization error binding the SessionManager. ')
+        return manager
+
+    @property
+    def sessions(self):
+        """
+        Sessions of the pool
+
+        :rtype: list(Session)
+        """
+        return list(self._sessions)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __iter__(self):
+        return iter(self.sessions)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exctype, value, traceback):
+        self.logout()
+
+    def login(self, **kwargs):
+        """
+        Log in all sessions of the pool using the same arguments and
+        route requests of the session manager to the pool. Sessions are
+        logged in concurrently. If any login fails, the sessions already
+        logged in are logged out.
+
+        :param kwargs: arguments of :meth:`smc.api.session.Session.login`
+        :raises SMCConnectionError: login failed
+        :raises ValueError: `session_cache` is provided
+        :return: None
+        """
+        from smc.api.executor import RequestExecutor
+        if kwargs.get('session_cache'):
+            raise ValueError('The session cache is not supported by a session '
+                'pool, each session of the pool must log in')
+        with self._lock:
+            if self._sessions:
+                raise SMCConnectionError('Session pool is already logged in')
+            sessions = [_PoolSession(self._members) for _ in range(self.size)]
+            executor = RequestExecutor(max_workers=self.size)
+            futures = [executor.call(session.login, **kwargs) for session in sessions]
+            executor.shutdown()
+            errors = [future.exception() for future in futures if future.exception()]
+            if errors:
+                for session in sessions:
+                    if session.session:
+                        session.logout()
+                raise errors[0]
+            self._sessions = sessions
+            manager = self.manager
+            self._previous_hook = manager._session_hook
+            manager.register_hook(self._route)
+            _pools.add(self)
+        logger.info('Logged in %s sessions, routing requests by %s',
+            self.size, self.routing)
+
+    def logout(self):
+        """
+        Log out all sessions of the pool and restore the previous session
+        manager hook.
+
+        :return: None
+        """
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+            if not sessions:
+                return
+            _pools.discard(self)
+            manager = self.manager
+            if getattr(manager._session_hook, '__self__', None) is self:
+                manager._session_hook = self._previous_hook
+            self._previous_hook = None
+        for session in sessions:
+            session.logout()
+
+    def refresh(self):
+        """
+        Refresh all sessions of the pool, for example after the SMC was
+        restarted.
+
+        :raises SMCConnectionError: refresh failed
+        :return: None
+        """
+        for session in self.sessions:
+            session.refresh()
+
+    def outstanding(self, session):
+        """
+        Number of requests of the session waiting for a response
+
+        :rtype: int
+        """
+        return session.metrics.get('requests_in_flight')
+
+    def get_session(self):
+        """
+        Select the session for the next request
+
+        :raises SMCConnectionError: the pool is not logged in
+        :rtype: Session
+        """
+        sessions = [session for session in self._sessions if session.session]
+        if not sessions:
+            raise SMCConnectionError('No session found in the session pool. '
+                'Please login to continue')
+        start = next(self._counter) % len(sessions)
+        sessions = sessions[start:] + sessions[:start] # Spread ties
+        if self.routing == 'round_robin':
+            return sessions[0]
+        return min(sessions, key=self.outstanding)
+
+    def _route(self, manager):
+        return self.get_session()
+
+    def __repr__(self):
+        return 'SessionPool(size=%s, routing=%s, sessions=%s)' % (
+            self.size, self.routing, len(self._sessions))
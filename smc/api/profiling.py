@@ -0,0 +1,362 @@
+"""
+Profiling of scripts using smc-python, to tell whether time is spent
+waiting on the SMC or in local work.
+
+Use :func:`smc.profile` around the code to profile::
+
+    import smc
+
+    with smc.profile() as p:
+        for engine in Engine.objects.all():
+            engine.routing.as_tree
+    print(p.report())
+    p.dump_collapsed('engines.folded')
+
+The report breaks the wall time of the block down into:
+
+* `http`: time waiting on HTTP responses from the SMC, including reading
+  and decompressing the body
+* `websocket`: time waiting on monitoring web socket messages
+* `decode`: time decoding JSON responses and web socket messages
+* `model`: time building elements from the json returned by the SMC, in
+  :meth:`~smc.base.model.ElementBase.from_meta`,
+  :meth:`~smc.base.model.ElementBase.from_href` and when loading the data
+  of an element
+* `local`: the rest of the wall time, spent in the script and in
+  smc-python outside of the categories above
+
+followed by the entry points and hrefs where most of the HTTP time was
+spent. Time is counted once, in the innermost category: a request sent
+while loading an element counts as `http`, not `model`. When requests are sent from several threads, the times of all
+threads are added together and can exceed the wall time.
+
+While profiling, the stacks of all threads are sampled every
+`sample_interval` seconds. :meth:`Profiler.dump_collapsed` writes them
+in the collapsed stack format read by flame graph tools such as
+``flamegraph.pl`` or speedscope. Samples taken while waiting on the SMC
+or decoding end with a frame naming the category, for example
+``[http GET single_fw]``, so SMC time stands out in the graph.
+
+Only one profiler can be active at a time. When no profiler is active,
+the instrumented code paths only check a module variable.
+"""
+import os
+import sys
+import threading
+import collections
+from timeit import default_timer
+from smc.api import tracing
+
+
+#: Breakdown categories, in report order
+CATEGORIES = ('http', 'websocket', 'decode', 'model', 'local')
+
+#: Active profiler
+_profiler = None
+_lock = threading.Lock()
+
+
+class _NullSection(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exctype, value, traceback):
+        return False
+
+_null_section = _NullSection()
+
+
+class _Section(object):
+    """
+    Timed block of a category in the active profiler
+    """
+    def __init__(self, profiler, category, label):
+        self.profiler = profiler
+        self.category = category
+        self.label = '[%s %s]' % (category, label) if label else '[%s]' % category
+
+    def __enter__(self):
+        self.frame = self.profiler._push(self.label)
+        self.start = default_timer()
+        return self
+
+    def __exit__(self, exctype, value, traceback):
+        duration = default_timer() - self.start
+        self.profiler._add(self.category,
+            duration - self.profiler._pop(self.frame, duration))
+        return False
+
+
+def section(category, label=None):
+    """
+    Time the block in a category of the active profiler. Does nothing if
+    no profiler is active.
+
+    :param str category: `websocket`, `decode` or `model`
+    :param str label: optional detail shown in stack samples
+    """
+    profiler = _profiler
+    if profiler is None:
+        return _null_section
+    return _Section(profiler, category, label)
+
+
+class Stats(object):
+    """
+    Requests to an href or entry point
+
+    :ivar int count: number of requests
+    :ivar float total: seconds waiting on the requests
+    :ivar float max: seconds waiting on the slowest request
+    """
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, duration):
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+
+    def __repr__(self):
+        return 'Stats(count=%s, total=%.3f, max=%.3f)' % (
+            self.count, self.total, self.max)
+
+
+class Profiler(object):
+    """
+    Profile the block of a ``with`` statement, see :func:`smc.profile`.
+
+    :param int top: number of entry points and hrefs in the report
+    :param float sample_interval: seconds between stack samples, None to
+        not sample stacks
+    :ivar float wall: wall time of the block in seconds
+    :ivar dict totals: seconds by category
+    :ivar dict entry_points: entry point rel to :class:`Stats`
+    :ivar dict hrefs: href to :class:`Stats`
+    :ivar collections.Counter stacks: collapsed stack to number of samples
+    """
+    def __init__(self, top=10, sample_interval=0.005):
+        self.top = top
+        self.sample_interval = sample_interval
+        self.wall = 0.0
+        self.totals = dict.fromkeys(CATEGORIES, 0.0)
+        self.requests = 0
+        self.entry_points = collections.defaultdict(Stats)
+        self.hrefs = collections.defaultdict(Stats)
+        self.stacks = collections.Counter()
+        self._lock = threading.Lock()
+        self._active = {} # Thread id -> frames of the sections in progress
+        self._hook = None
+        self._sampler = None
+        self._stopped = threading.Event()
+        self._start = None
+
+    def start(self):
+        """
+        Start profiling.
+
+        :raises ValueError: another profiler is active
+        :return: None
+        """
+        global _profiler
+        with _lock:
+            if _profiler is not None:
+                raise ValueError('A profiler is already active')
+            _profiler = self
+        self._hook = tracing.add_request_hook(
+            self._on_request_start, self._on_request_end)
+        self._start = default_timer()
+        if self.sample_interval:
+            self._stopped.clear()
+            self._sampler = threading.Thread(
+                target=self._sample, name='smc-profiler')
+            self._sampler.daemon = True
+            self._sampler.start()
+
+    def stop(self):
+        """
+        Stop profiling and compute the local time.
+
+        :return: None
+        """
+        global _profiler
+        if self._start is None:
+            return
+        self.wall += default_timer() - self._start
+        self._start = None
+        if self._sampler is not None:
+            self._stopped.set()
+            self._sampler.join()
+            self._sampler = None
+        tracing.remove_request_hook(self._hook)
+        with _lock:
+            if _profiler is self:
+                _profiler = None
+        self.totals['local'] = max(0.0, self.wall - sum(
+            self.totals[category] for category in CATEGORIES
+            if category != 'local'))
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exctype, value, traceback):
+        self.stop()
+
+    def _push(self, label):
+        """
+        Start a section or request in the current thread
+
+        :return: frame to provide to :meth:`_pop`
+        """
+        with self._lock:
+            frames = self._active.setdefault(_thread_id(), [])
+            frame = [label, 0.0, frames] # label, seconds in nested frames
+            frames.append(frame)
+        return frame
+
+    def _pop(self, frame, duration):
+        """
+        End a section or request, adding it's duration to the nested time
+        of the enclosing frame.
+
+        :return: seconds spent in frames nested in this frame
+        """
+        with self._lock:
+            frames = frame[2]
+            if frame in frames:
+                index = frames.index(frame)
+                if index:
+                    frames[index - 1][1] += duration
+                del frames[index]
+            return frame[1]
+
+    def _add(self, category, duration):
+        with self._lock:
+            self.totals[category] += duration
+
+    def _on_request_start(self, event):
+        if event.method != 'WEBSOCKET': # Timed by the receive loop
+            event.context['profile_frame'] = self._push('[http %s %s]' % (
+                event.method, event.rel))
+
+    def _on_request_end(self, event):
+        frame = event.context.pop('profile_frame', None)
+        if frame is None:
+            return
+        nested = self._pop(frame, event.duration)
+        with self._lock:
+            self.totals['http'] += event.duration - nested
+            self.requests += 1
+            self.entry_points[event.rel].add(event.duration)
+            self.hrefs[event.href].add(event.duration)
+
+    def _sample(self):
+        own = _thread_id()
+        names = {}
+        while not self._stopped.wait(self.sample_interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append('%s:%s' % (
+                        os.path.basename(code.co_filename), code.co_name))
+                    frame = frame.f_back
+                stack.append(names.get(ident, 'thread-%s' % ident))
+                stack.reverse()
+                with self._lock:
+                    stack.extend(frame[0] for frame in self._active.get(ident, ()))
+                    self.stacks[';'.join(stack)] += 1
+
+    def breakdown(self):
+        """
+        Seconds and share of the wall time by category
+
+        :return: category to (seconds, percent of wall time)
+        :rtype: collections.OrderedDict
+        """
+        return collections.OrderedDict(
+            (category, (self.totals[category],
+                100.0 * self.totals[category] / self.wall if self.wall else 0.0))
+            for category in CATEGORIES)
+
+    def slowest(self, by='entry_points', top=None):
+        """
+        Entry points or hrefs where most of the HTTP time was spent
+
+        :param str by: `entry_points` or `hrefs`
+        :param int top: number of results (default: `top` of the profiler)
+        :rtype: list(tuple(str, Stats))
+        """
+        stats = self.entry_points if by == 'entry_points' else self.hrefs
+        return sorted(stats.items(), key=lambda item: item[1].total,
+            reverse=True)[:top or self.top]
+
+    def report(self):
+        """
+        Format the time breakdown and the slowest entry points and hrefs
+
+        :rtype: str
+        """
+        lines = ['%-28s %10.3f s' % ('wall', self.wall)]
+        for category, (seconds, percent) in self.breakdown().items():
+            lines.append('%-28s %10.3f s %6.1f%%%s' % (
+                category, seconds, percent,
+                '  (%s requests)' % self.requests if category == 'http' else ''))
+        for by in ('entry_points', 'hrefs'):
+            slowest = self.slowest(by)
+            if not slowest:
+                continue
+            lines.append('')
+            lines.append('%-40s %6s %10s %10s' % (
+                'slowest %s' % by.replace('_', ' '), 'count', 'total s', 'max s'))
+            for name, stats in slowest:
+                if len(name) > 40:
+                    name = '...' + name[-37:]
+                lines.append('%-40s %6s %10.3f %10.3f' % (
+                    name, stats.count, stats.total, stats.max))
+        return '\n'.join(lines)
+
+    def dump_collapsed(self, path):
+        """
+        Write the stack samples in the collapsed stack format, one stack
+        per line with frames separated by `;` followed by the number of
+        samples.
+
+        :param str path: path of the file
+        :return: number of stacks written
+        :rtype: int
+        """
+        with self._lock:
+            stacks = sorted(self.stacks.items())
+        with open(path, 'w') as f:
+            for stack, count in stacks:
+                f.write('%s %s\n' % (stack, count))
+        return len(stacks)
+
+    def __repr__(self):
+        return 'Profiler(wall=%.3f, requests=%s)' % (self.wall, self.requests)
+
+
+def _thread_id():
+    return threading.current_thread().ident
+
+
+def profile(top=10, sample_interval=0.005):
+    """
+    Profile the block of a ``with`` statement and report where the time
+    was spent: waiting on the SMC, decoding responses, building element
+    caches or in local work. See :mod:`smc.api.profiling`.
+
+    :param int top: number of entry points and hrefs in the report
+    :param float sample_interval: seconds between stack samples, None to
+        not sample stacks
+    :rtype: Profiler
+    """
+    return Profiler(top=top, sample_interval=sample_interval)
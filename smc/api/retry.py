@@ -0,0 +1,431 @@
+"""
+Retry policies for requests sent to the SMC.
+
+Each session has a :class:`RetryHandler` that decides whether a request
+is retried based on the HTTP method, the response status or the
+connection error, and how long to wait before the next attempt.
+
+* Policies are per HTTP method. Idempotent methods (GET, PUT, DELETE) are
+  retried on connection errors and read timeouts. POST is only retried when
+  the request was not received by the SMC: a Service Unavailable (503)
+  response or a failure to establish the connection.
+* The wait before a retry honors the `Retry-After` header of the response.
+  Otherwise the wait grows exponentially with the number of attempts and a
+  random jitter is applied so that clients do not retry in synchronized
+  waves.
+* A :class:`CircuitBreaker` stops sending requests for a period of time
+  after consecutive failures so an overloaded SMC can recover. While the
+  circuit is open, requests fail immediately with
+  :class:`~smc.api.exceptions.CircuitBreakerOpen`.
+* A DELETE that fails with a Conflict (409) because the ETag is not
+  current is retried once with the current ETag.
+
+By default, only conflicting DELETE requests are retried. Enable retries
+on a busy SMC at login with `retry_on_busy=True`, or on an existing
+session::
+
+    session.set_retry_on_busy(total=5, backoff_factor=0.5, max_backoff=30)
+
+For complete control, provide a handler::
+
+    from smc.api.retry import RetryHandler, RetryPolicy, CircuitBreaker
+
+    handler = RetryHandler(
+        policies={'GET': RetryPolicy(total=10, backoff_factor=0.2),
+                  'POST': RetryPolicy(total=3, idempotent=False)},
+        circuit_breaker=CircuitBreaker(failure_threshold=10, recovery_timeout=60))
+    session.set_retry_handler(handler)
+
+Retries are recorded in the session metrics as `retries_total` and
+`retry_wait_seconds_total`, circuit breaker rejections as
+`circuit_breaker_rejections_total` and the breaker state as the
+`circuit_breaker_state` gauge (0: closed, 1: open, 2: half open).
+"""
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_tz, mktime_tz
+import requests
+from smc.api.exceptions import CircuitBreakerOpen
+
+
+logger = logging.getLogger(__name__)
+
+
+#: Methods that can safely be sent more than once
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+#: Actions returned by :meth:`RetryHandler.next_action`
+DONE, RETRY, CONFLICT = 'done', 'retry', 'conflict'
+
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header given in seconds or as an HTTP date.
+
+    :return: seconds to wait or None if the header is invalid
+    :rtype: float
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    parsed = parsedate_tz(value)
+    if parsed is None:
+        return None
+    return max(0.0, mktime_tz(parsed) - time.time())
+
+
+def is_connect_error(error):
+    """
+    Whether the request failed before it was sent to the SMC
+
+    :rtype: bool
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError):
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+        return type(reason).__name__ == 'NewConnectionError'
+    # aiohttp, see smc.api.aio
+    return any(cls.__name__ == 'ClientConnectorError'
+               for cls in type(error).__mro__)
+
+
+def with_etag(headers, etag):
+    """
+    Request headers to resend a request with the current ETag after
+    a Conflict (409)
+
+    :rtype: dict
+    """
+    return dict(headers or {}, **{'if-match': etag})
+
+
+#: Headers of a request not sent with the GET of the current ETag
+_CONDITIONAL_HEADERS = ('etag', 'if-match', 'if-none-match', 'content-type',
+    'content-length')
+
+
+def etag_request(user_session, kwargs):
+    """
+    Keyword arguments of the GET retrieving the current ETag of a
+    resource after a Conflict (409). The GET is sent with the headers of
+    the request, such as Accept and authentication headers, without the
+    conditional and body headers, and with the timeout of the request or
+    of the session.
+
+    :param dict kwargs: keyword arguments of the request
+    :rtype: dict
+    """
+    headers = dict((name, value) for name, value in
+        (kwargs.get('headers') or {}).items()
+        if name.lower() not in _CONDITIONAL_HEADERS)
+    timeout = kwargs.get('timeout')
+    if timeout is None:
+        timeout = getattr(user_session, 'timeout', None)
+    return {'headers': headers, 'timeout': timeout}
+
+
+class RetryPolicy(object):
+    """
+    Retry policy for a HTTP method.
+
+    :param int total: max number of retries
+    :param float backoff_factor: base wait in seconds. The wait before retry
+        n is a random value between 0 and backoff_factor * 2 ** n
+    :param float max_backoff: max wait in seconds before a retry, also caps
+        the value of a Retry-After header
+    :param status_forcelist: HTTP status codes to retry (default: 503)
+    :param bool idempotent: whether the method can be retried when the SMC
+        may have received the request (read errors)
+    :param bool respect_retry_after: wait for the time given in the Retry-After
+        header of the response
+    :param int conflict_retries: number of retries with the current ETag when
+        the SMC returns a Conflict (409)
+    """
+    def __init__(self, total=5, backoff_factor=0.1, max_backoff=30,
+                 status_forcelist=None, idempotent=True,
+                 respect_retry_after=True, conflict_retries=0):
+        self.total = total
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.status_forcelist = frozenset(status_forcelist or [503])
+        self.idempotent = idempotent
+        self.respect_retry_after = respect_retry_after
+        self.conflict_retries = conflict_retries
+
+    def is_retryable(self, response=None, error=None):
+        """
+        Whether the response or the connection error is retryable
+        under this policy.
+
+        :param response: response received
+        :param Exception error: error raised by the transport when no
+            response was received. Errors of transports other than
+            `requests` are connection errors or timeouts.
+        :rtype: bool
+        """
+        if error is not None:
+            if is_connect_error(error):
+                return True
+            return self.idempotent and (
+                not isinstance(error, requests.exceptions.RequestException) or
+                isinstance(error, (requests.exceptions.ConnectionError,
+                                   requests.exceptions.Timeout)))
+        return response.status_code in self.status_forcelist
+
+    def backoff(self, attempt, response=None):
+        """
+        Seconds to wait before the given retry attempt (starting at 1).
+
+        :rtype: float
+        """
+        if response is not None and self.respect_retry_after:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                # Spread clients that were given the same Retry-After
+                return min(self.max_backoff,
+                    retry_after + random.uniform(0, self.backoff_factor))
+        cap = min(self.max_backoff, self.backoff_factor * (2 ** attempt))
+        return random.uniform(0, cap) # Full jitter
+
+    def __repr__(self):
+        return ('RetryPolicy(total=%s, backoff_factor=%s, max_backoff=%s, '
+            'status_forcelist=%s, idempotent=%s)' % (
+                self.total, self.backoff_factor, self.max_backoff,
+                sorted(self.status_forcelist), self.idempotent))
+
+
+class CircuitBreaker(object):
+    """
+    Circuit breaker shared by all requests of a session. After
+    `failure_threshold` consecutive failures (retryable status codes or
+    connection errors) the circuit opens and requests are rejected for
+    `recovery_timeout` seconds. A single trial request is then allowed;
+    if it succeeds the circuit closes, otherwise it opens again.
+
+    :param int failure_threshold: consecutive failures before opening
+    :param float recovery_timeout: seconds to wait before a trial request
+    """
+    CLOSED, OPEN, HALF_OPEN = 0, 1, 2
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+
+    def allow(self):
+        """
+        Whether a request can be sent. Moves an open circuit to half
+        open once the recovery timeout has passed.
+
+        :rtype: bool
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and \
+                time.time() - self.opened_at >= self.recovery_timeout:
+                self.state = self.HALF_OPEN
+                return True # Trial request
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def cancel_trial(self):
+        """
+        Reopen a half open circuit when the outcome of the trial request
+        is unknown, for example when it was interrupted or failed outside
+        of the transport. The next request is sent as the trial request.
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or \
+                self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning('Circuit breaker opened after %s failures, '
+                        'requests are suspended for %ss', self.failures,
+                        self.recovery_timeout)
+                self.state = self.OPEN
+                self.opened_at = time.time()
+
+    def __repr__(self):
+        return 'CircuitBreaker(state=%s, failures=%s)' % (
+            ('closed', 'open', 'half_open')[self.state], self.failures)
+
+
+def default_policies(total=0, backoff_factor=0.1, max_backoff=30,
+                     status_forcelist=None, methods=None, **kwargs):
+    """
+    Policies per method. Methods in `methods` are retried `total` times,
+    all other methods are not retried. DELETE is always retried once on
+    a Conflict (409).
+
+    :rtype: dict
+    """
+    methods = methods or ['GET', 'POST', 'PUT', 'DELETE']
+    policies = {}
+    for method in ('GET', 'HEAD', 'POST', 'PUT', 'DELETE'):
+        policies[method] = RetryPolicy(
+            total=total if method in methods else 0,
+            backoff_factor=backoff_factor,
+            max_backoff=max_backoff,
+            status_forcelist=status_forcelist,
+            idempotent=method in IDEMPOTENT_METHODS,
+            conflict_retries=1 if method == 'DELETE' else 0,
+            **kwargs)
+    return policies
+
+
+class RetryHandler(object):
+    """
+    Sends requests through a session and retries them according to the
+    policy for the request method.
+
+    :param dict policies: HTTP method to :class:`RetryPolicy`. Methods
+        without a policy are not retried
+    :param CircuitBreaker circuit_breaker: optional circuit breaker
+    """
+    def __init__(self, policies=None, circuit_breaker=None):
+        self.policies = default_policies() if policies is None else policies
+        self.circuit_breaker = circuit_breaker
+
+    def policy(self, method):
+        return self.policies.get(method.upper())
+
+    def _check_circuit(self, user_session, url):
+        breaker = self.circuit_breaker
+        if breaker is not None and not breaker.allow():
+            user_session.metrics.inc('circuit_breaker_rejections_total')
+            raise CircuitBreakerOpen('Circuit breaker is open after repeated '
+                'failures from the SMC, request not sent: %s' % url)
+
+    def _cancel_trial(self):
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.cancel_trial()
+
+    def _record(self, user_session, failed):
+        breaker = self.circuit_breaker
+        if breaker is not None:
+            if failed:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            user_session.metrics.set_gauge('circuit_breaker_state', breaker.state)
+
+    def send(self, user_session, send, method, url, rel='other', **kwargs):
+        """
+        Send the request using send(method, url, **kwargs) and retry it
+        according to the policy for method.
+
+        :param user_session: session used for metrics
+        :param callable send: function sending the request and returning
+            a `requests.Response`
+        :param str method: HTTP method
+        :param str url: url for the request
+        :param str rel: entry point of the request, used to label metrics
+        :raises CircuitBreakerOpen: the circuit breaker is open
+        :raises requests.exceptions.RequestException: connection error and
+            retries are exhausted or the error is not retryable
+        :rtype: requests.Response
+        """
+        policy = self.policy(method)
+        attempt = conflicts = 0
+        while True:
+            self._check_circuit(user_session, url)
+            response = error = None
+            recorded = False
+            try:
+                try:
+                    response = send(method, url, **kwargs)
+                except requests.exceptions.RequestException as e:
+                    error = e
+                action, delay = self.next_action(user_session, policy, method,
+                    url, rel, response, error, attempt, conflicts)
+                recorded = True
+            finally:
+                if not recorded:
+                    self._cancel_trial()
+
+            if action == CONFLICT:
+                conflicts += 1
+                response.close()
+                current = send('GET', url, **etag_request(user_session, kwargs))
+                current.close()
+                kwargs['headers'] = with_etag(kwargs.get('headers'),
+                    current.headers.get('ETag'))
+                continue
+            if action == DONE:
+                if error is not None:
+                    raise error
+                return response
+
+            attempt += 1
+            if response is not None:
+                response.close()
+            body = kwargs.get('data')
+            if hasattr(body, 'reset'): # Streamed upload
+                body.reset()
+            time.sleep(delay)
+
+    def next_action(self, user_session, policy, method, url, rel, response,
+                    error, attempt, conflicts):
+        """
+        Record the outcome of an attempt with the circuit breaker and decide
+        what to do next. This is the part of :meth:`send` shared with
+        transports that cannot call `send`, such as :mod:`smc.api.aio`.
+
+        :param RetryPolicy policy: policy for the method, or None
+        :param response: response of the attempt, None on error
+        :param Exception error: connection error raised by the transport
+        :param int attempt: retries already made
+        :param int conflicts: conflict retries already made
+        :return: one of :data:`DONE`, :data:`RETRY` (wait the given seconds
+            and resend) or :data:`CONFLICT` (resend with the current ETag),
+            and the seconds to wait
+        :rtype: tuple(str, float)
+        """
+        retryable = policy is not None and \
+            policy.is_retryable(response, error)
+        self._record(user_session, error is not None or \
+            response.status_code in (policy.status_forcelist if policy \
+                else (503,)))
+
+        if response is not None and response.status_code == 409 and \
+            policy is not None and conflicts < policy.conflict_retries:
+            # ETag is not current, retry with the current ETag
+            user_session.metrics.inc('retries_total', method=method,
+                rel=rel, reason='conflict')
+            return CONFLICT, 0
+
+        if not retryable or attempt >= policy.total:
+            return DONE, 0
+
+        delay = policy.backoff(attempt + 1, response)
+        reason = response.status_code if response is not None else \
+            type(error).__name__
+        logger.info('Retrying %s %s in %.2fs (attempt %s of %s): %s',
+            method, url, delay, attempt + 1, policy.total, reason)
+        user_session.metrics.inc('retries_total', method=method, rel=rel,
+            reason=reason)
+        user_session.metrics.inc('retry_wait_seconds_total', delay,
+            method=method, rel=rel)
+        return RETRY, delay
+
+    def __repr__(self):
+        return 'RetryHandler(policies=%s, circuit_breaker=%s)' % (
+            self.policies, self.circuit_breaker)
@@ -5,18 +5,19 @@ import copy
 import json
 import logging
 import requests
+import threading
 import collections
 
 #import smc.api.web
-from smc.api.web import send_request, counters
-from smc.api.entry_point import Resource
-from smc.api.configloader import load_from_file, load_from_environ
+from smc.api.web import send_request, entry_point_rel
 from smc.api.common import SMCRequest
 from smc.base.decorators import cached_property
 from smc.api.exceptions import ConfigLoadError, SMCConnectionError,\
     UnsupportedEntryPoint, SessionManagerNotFound, SessionNotFound
-from smc.base.model import ElementFactory
 # requests.packages.urllib3.disable_warnings()
+# Modules only needed once a session is used (metrics, retries, codecs,
+# caches, compression, entry points and element classes) are imported
+# where they are used, to keep the time of `import smc` low.
 
 logger = logging.getLogger(__name__)
 
@@ -44,6 +45,10 @@ class SSLAdapter(HTTPAdapter):
 
 #from threading import local
 
+#: Login keyword arguments that configure the HTTP connection pool of a session
+POOL_OPTIONS = ('pool_connections', 'pool_maxsize', 'pool_block')
+
+
 class SessionManager(object):
     """
     The SessionManager keeps track of sessions created within smc-python.
@@ -207,6 +212,26 @@ class SessionManager(object):
             self._sessions.pop(self._get_session_key(session), None)    
         
 
+class _session_default(object):
+    """
+    Attribute of a session created on first use by the decorated function,
+    so it's module is not imported until a session is used. Creation is
+    serialized by the lock of the session. The attribute can be replaced
+    like any other attribute.
+    """
+    def __init__(self, func):
+        self.func = func
+
+    def __get__(self, obj, cls):
+        if obj is None:
+            return self
+        name = self.func.__name__
+        with obj._lock:
+            if name not in obj.__dict__:
+                obj.__dict__[name] = self.func(obj)
+            return obj.__dict__[name]
+
+
 class Session(object):
     """
     Session represents the clients session to the SMC. A session is obtained
@@ -217,12 +242,49 @@ class Session(object):
     python interpreter closes.
     
     Each session will also have a single connection pool associated with
-    it. This results in a single persistent connection to the SMC that will
-    be re-used as needed.
+    it. Connections to the SMC are persistent and re-used as needed. The
+    size of the pool can be set at login using `pool_connections`,
+    `pool_maxsize` and `pool_block` (see :meth:`.login`).
+    
+    A single session can safely be shared by multiple worker threads. The
+    underlying connection pool and cookie jar are thread safe and changes
+    to the session state (login, logout and refresh) are serialized by a
+    session level lock. All threads share the same authenticated session
+    on the SMC (JSESSIONID). If threads need to operate as different
+    administrators or in different domains, use a separate session for each.
+    When running more worker threads than `pool_maxsize`, set `pool_block=True`
+    so threads wait for a free connection instead of opening connections that
+    are discarded after use.
+    
+    Request metrics (latency, bytes, retries, re-authentications, conflicts
+    and cache hits) for this session are recorded in `metrics`, see
+    :mod:`smc.api.metrics`. Requests are retried according to the
+    `retry_handler` of the session, see :mod:`smc.api.retry`. Identical
+    GETs sent by several threads at the same time share a single request,
+    see :mod:`smc.api.coalesce`. The rate and concurrency of requests can
+    be limited with a `throttle`, see :mod:`smc.api.throttle`.
     """
+    @_session_default
+    def metrics(self):
+        # Request metrics for this session
+        from smc.api.metrics import MetricsRegistry
+        return MetricsRegistry()
+    
+    @_session_default
+    def retry_handler(self):
+        from smc.api.retry import RetryHandler
+        return RetryHandler()
+    
+    @_session_default
+    def coalescer(self):
+        from smc.api.coalesce import RequestCoalescer
+        return RequestCoalescer()
+    
     def __init__(self, manager=None):
         self._params = {} # Retrieved from login
         self._session = None # requests.Session
+        self._lock = threading.RLock() # Serialize changes to session state
+        self.throttle = None # smc.api.throttle.Throttle
         
         self._resource = None # smc.api.entry_point.Resource
         
@@ -295,7 +357,33 @@ class Session(object):
     @property
     def session(self):
         return self._session
+    
+    @property
+    def connection_pool(self):
+        """
+        Connection pool settings for this session. These are provided as
+        keyword arguments to :meth:`.login`.
+        
+        :rtype: dict
+        """
+        from requests.adapters import DEFAULT_POOLSIZE, DEFAULT_POOLBLOCK
+        return dict(
+            pool_connections=self._params.get('pool_connections', DEFAULT_POOLSIZE),
+            pool_maxsize=self._params.get('pool_maxsize', DEFAULT_POOLSIZE),
+            pool_block=self._params.get('pool_block', DEFAULT_POOLBLOCK))
 
+    @property
+    def json_codec(self):
+        """
+        JSON codec used to encode requests and decode responses for
+        this session. Set with the `json_codec` keyword argument of
+        :meth:`.login`.
+        
+        :rtype: smc.api.codec.JSONCodec
+        """
+        from smc.api.codec import get_codec
+        return get_codec(self._params.get('json_codec'))
+    
     @property
     def session_id(self):
         """
@@ -392,15 +480,23 @@ class Session(object):
         """
         if self.session:
             try:
-                response = self.session.get(self.entry_points.get('current_user'))
-                if response.status_code in (200, 201):
-                    admin_href=response.json().get('value')
-                    request = SMCRequest(href=admin_href)
-                    smcresult = send_request(self, 'get', request)
-                    return ElementFactory(admin_href, smcresult)
+                return self._current_user(
+                    self.session.get(self.entry_points.get('current_user')))
             except UnsupportedEntryPoint:
                 pass
     
+    def _current_user(self, response):
+        """
+        Load the API Client element from the response of the current_user
+        entry point
+        """
+        if response.status_code in (200, 201):
+            admin_href=response.json().get('value')
+            request = SMCRequest(href=admin_href)
+            smcresult = send_request(self, 'get', request)
+            from smc.base.model import ElementFactory
+            return ElementFactory(admin_href, smcresult)
+    
     def login(self, url=None, api_key=None, login=None, pwd=None,
             api_version=None, timeout=None, verify=True, alt_filepath=None,
             domain=None, **kwargs):
@@ -433,6 +529,30 @@ class Session(object):
         :param bool retry_on_busy: pass as kwarg with boolean if you want to add retries
             if the SMC returns HTTP 503 error during operation. You can also optionally customize
             this behavior and call :meth:`.set_retry_on_busy`
+        :param int pool_connections: pass as kwarg to set the number of connection pools
+            to cache (default: 10)
+        :param int pool_maxsize: pass as kwarg to set the maximum number of connections kept
+            open to the SMC. Set this to at least the number of threads sharing the session
+            (default: 10)
+        :param bool pool_block: pass as kwarg to block when all connections in the pool are
+            in use rather than opening a new, non-pooled connection (default: False)
+        :param str json_codec: pass as kwarg to select the JSON codec used to encode and
+            decode request and response bodies, 'json' or 'orjson' (default: 'json').
+            See :mod:`smc.api.codec`
+        :param session_cache: pass as kwarg with True, or the path of a directory, to save
+            the session on disk and resume it on the next login with the same credentials
+            instead of logging in again. See :mod:`smc.api.diskcache` for the default
+            location (default: disabled)
+        :param resource_cache: pass as kwarg with True, or the path of a directory, to
+            save resources that do not change for an SMC version on disk and load them
+            from disk on later logins: the API versions, the entry points, the log field
+            schema and the default TLS ciphers. See :attr:`.resource_cache`
+            (default: disabled)
+        :param bool coalesce_requests: pass as kwarg with False to send every GET, rather
+            than share the response of an identical GET in flight from another thread.
+            See :mod:`smc.api.coalesce` (default: True)
+        :param throttle: pass as kwarg with a :class:`smc.api.throttle.Throttle` to limit
+            the rate and concurrency of requests sent by the session (default: None)
         :raises ConfigLoadError: loading cfg from ~.smcrc fails
 
         For SSL connections, you can disable validation of the SMC SSL certificate by setting
@@ -448,10 +568,35 @@ class Session(object):
         Logout should be called to remove the session immediately from the
         SMC server.
         
+        Example of a session used by a pool of 32 worker threads::
+        
+            session.login(url='http://1.1.1.1:8082', api_key='xxxxxxxxxxxxxxxxx',
+                          pool_maxsize=32, pool_block=True)
+
+        Short lived scripts can save the session and resume it on the next run,
+        which replaces the API version discovery, login and entry point requests
+        with a single request validating the saved session::
+
+            session.login(url='http://1.1.1.1:8082', api_key='xxxxxxxxxxxxxxxxx',
+                          session_cache=True)
+
+        A resumed session remains valid until it is idle for longer than the
+        session timeout of the SMC. Calling :meth:`.logout` ends the session
+        and removes it from the cache, so scripts that resume sessions should
+        not log out when done.
+
         .. note:: As of SMC 6.4 it is possible to give a standard Administrative user
             access to the SMC API. It is still possible to use an API Client by
             providing the api_key in the login call.
         """
+        with self._lock:
+            self._login(url, api_key, login, pwd, api_version, timeout, verify,
+                alt_filepath, domain, **kwargs)
+    
+    def _login(self, url=None, api_key=None, login=None, pwd=None,
+            api_version=None, timeout=None, verify=True, alt_filepath=None,
+            domain=None, **kwargs):
+        from smc.api.configloader import load_from_file, load_from_environ
         params = {}
         if not url or (not api_key and not (login and pwd)):
             try: # First try load from file
@@ -487,28 +632,50 @@ class Session(object):
         
         verify_ssl = self._params.get('verify', True)
         
-        # Determine and set the API version we will use.
-        self._params.update(
-            api_version=get_api_version(
-                self.url, self.api_version, self.timeout, verify_ssl))
-        
         extra_args = self._params.get('kwargs', {})
         
-        # Retries configured
+        # Retries configured, kept so a copy of the session retries
         retry_on_busy = extra_args.pop('retry_on_busy', False)
+        if retry_on_busy:
+            self._params['retry_on_busy'] = retry_on_busy
         
-        request = self._build_auth_request(verify_ssl, **extra_args)
+        # Connection pool, codec and cache settings are not part of the auth request
+        for option in POOL_OPTIONS + ('json_codec', 'session_cache', 'resource_cache',
+                'coalesce_requests', 'throttle'):
+            if option in extra_args:
+                self._params[option] = extra_args.pop(option)
+        
+        if self._params.get('throttle') is not None:
+            self.set_throttle(self._params['throttle'])
+        
+        if not self._params.get('coalesce_requests', True):
+            self.coalescer = None
+        elif self.coalescer is None:
+            from smc.api.coalesce import RequestCoalescer
+            self.coalescer = RequestCoalescer()
+        
+        self.json_codec # Raise if the codec is unknown
+        
+        if not self._resume_session(verify_ssl):
+            # Determine and set the API version we will use.
+            self._params.update(
+                api_version=get_api_version(
+                    self.url, self.api_version, self.timeout, verify_ssl,
+                    cache=self._resource_cache(api_version=None)))
             
-        # This will raise if session login fails...
-        self._session = self._get_session(request)
-        self.session.verify = verify_ssl
+            request = self._build_auth_request(verify_ssl, **extra_args)
+                
+            # This will raise if session login fails...
+            self._session = self._get_session(request)
+            self.session.verify = verify_ssl
+            
+            # Load entry points
+            load_entry_points(self)
+            self._save_session()
 
         if retry_on_busy:
             self.set_retry_on_busy()
         
-        # Load entry points
-        load_entry_points(self)
-        
         # Put session in manager
         self.manager._register(self)
         
@@ -518,6 +685,127 @@ class Session(object):
     def __repr__(self):
         return 'Session(name=%s,domain=%s)' % (self.name, self.domain)
         
+    @property
+    def session_cache(self):
+        """
+        Cache used to resume the session in a later run, if enabled with
+        the `session_cache` keyword argument of :meth:`.login`.
+        
+        :rtype: smc.api.diskcache.DiskCache
+        """
+        location = self._params.get('session_cache')
+        if not location:
+            return None
+        from smc.api.diskcache import DiskCache
+        return DiskCache(None if location is True else location, namespace='session')
+    
+    def _resource_cache(self, api_version):
+        location = self._params.get('resource_cache')
+        if not location:
+            return None
+        from smc.api.diskcache import ResourceCache
+        return ResourceCache(self.url, api_version,
+            None if location is True else location)
+    
+    @property
+    def resource_cache(self):
+        """
+        Cache of the resources that do not change for the SMC URL and API
+        version of this session, if enabled with the `resource_cache`
+        keyword argument of :meth:`.login`. Cached resources are kept until
+        they are invalidated, for example after an SMC upgrade::
+        
+            session.clear_resource_cache()
+        
+        :rtype: smc.api.diskcache.ResourceCache
+        """
+        return self._resource_cache(self.api_version)
+    
+    def clear_resource_cache(self, name=None):
+        """
+        Remove the cached resources for the SMC URL and API version of
+        this session, and the cached list of API versions of the SMC.
+        
+        :param str name: only remove this resource, for example
+            'entry_points' or 'log_schema'
+        :return: None
+        """
+        for cache in (self.resource_cache, self._resource_cache(None)):
+            if cache is not None:
+                cache.invalidate(name)
+    
+    @property
+    def _session_cache_key(self):
+        # Sessions are only resumed by the same credentials
+        from smc.api.diskcache import cache_key
+        credential = self.credential
+        return cache_key(self.url, self.domain, credential.provider_name,
+            credential._login, cache_key(credential._api_key, credential._pwd))
+    
+    def _resume_session(self, verify=True):
+        """
+        Resume the session saved by a previous login if the session cache
+        is enabled. The saved session is validated with a single request
+        to the SMC. Invalid sessions are removed from the cache. The API
+        version of the saved session is used unless a different version is
+        requested.
+        
+        :return: True if the session was resumed
+        :rtype: bool
+        """
+        cache = self.session_cache
+        if cache is None:
+            return False
+        key = self._session_cache_key
+        saved = cache.get(key)
+        if not saved:
+            return False
+        api_version = self._params.get('api_version')
+        if api_version and str(api_version) != str(saved.get('api_version')):
+            return False # Different API version requested
+        from smc.api.entry_point import Resource
+        try:
+            _session = requests.session()
+            self._mount_adapter(_session)
+            _session.verify = verify
+            for cookie in saved['cookies']:
+                _session.cookies.set_cookie(requests.cookies.create_cookie(**cookie))
+            resource = Resource(saved['entry_points'])
+            response = _session.get(resource.get('current_user'),
+                headers={'content-type': 'application/json'}, timeout=self.timeout)
+        except (KeyError, TypeError, UnsupportedEntryPoint,
+                requests.exceptions.RequestException) as e:
+            logger.debug('Saved session could not be resumed: %s', e)
+            response = None
+        if response is None or response.status_code != 200:
+            logger.debug('Saved session is no longer valid, logging in')
+            cache.delete(key)
+            return False
+        
+        self._params.update(api_version=saved['api_version'])
+        self._session = _session
+        self._resource = resource
+        # The validation response is the current user, do not request it again
+        self.current_user = self._current_user(response)
+        logger.info('Resumed saved session using SMC API version: %s',
+            self.api_version)
+        return True
+    
+    def _save_session(self):
+        """
+        Save the session to the session cache, if enabled
+        """
+        cache = self.session_cache
+        if cache is not None and self._resource is not None:
+            cache.set(self._session_cache_key, {
+                'api_version': self.api_version,
+                'cookies': [
+                    {'name': cookie.name, 'value': cookie.value,
+                     'domain': cookie.domain, 'path': cookie.path,
+                     'secure': cookie.secure}
+                    for cookie in self.session.cookies],
+                'entry_points': [dict(entry._asdict()) for entry in self._resource]})
+    
     def _build_auth_request(self, verify=False, **kwargs):
         """
         Build the authentication request to SMC
@@ -559,6 +847,7 @@ class Session(object):
         :rtype: requests.Session
         """
         _session = requests.session()  # empty session
+        self._mount_adapter(_session)
         
         response = _session.post(**request)
         logger.info('Using SMC API version: %s', self.api_version)
@@ -575,6 +864,10 @@ class Session(object):
         
         :return: None
         """
+        with self._lock:
+            self._logout()
+    
+    def _logout(self):
         if not self.session:
             self.manager._deregister(self)
             return
@@ -592,6 +885,9 @@ class Session(object):
         except requests.exceptions.ConnectionError as e:
             logger.error('Connection error on logout: %s', e)
         finally:
+            cache = self.session_cache
+            if cache is not None: # Session is no longer valid
+                cache.delete(self._session_cache_key)
             self.entry_points.clear()
             self.manager._deregister(self)
             self._session = None
@@ -600,22 +896,44 @@ class Session(object):
             except AttributeError:
                 pass
         
-        logger.debug('Call counters: %s' % counters)    
+        logger.debug('Request metrics: %s', self.metrics.totals())
         
-    def refresh(self):
+    def refresh(self, session_id=None):
         """
         Refresh session on 401. This is called automatically if your existing
         session times out and resends the operation/s which returned the
         error.
-
+        
+        Re-authentication is single flight: when several threads receive a
+        401 for the same expired session, the first thread logs in again
+        while the others wait and then resend their requests using the new
+        session. The new session replaces the expired one only once login
+        succeeds, so requests sent by other threads in the meantime never
+        find the session missing. Entry points are kept from the previous
+        login.
+        
+        :param str session_id: session ID used by the request that received
+            the 401. If the session has already been refreshed since, the
+            call returns without logging in again
         :raises SMCConnectionError: Problem re-authenticating using existing
             api credentials
         """
-        if self.session and self.session_id: # Did session timeout?
-            logger.info('Session timed out, will try obtaining a new session using '
-                'previously saved credential information.')
-            self.logout() # Force log out session just in case
-            return self.login(**self.copy())
+        with self._lock:
+            if session_id and self.session_id and self.session_id != session_id:
+                logger.debug('Session was already refreshed by another thread')
+                return
+            if self.session and self.session_id: # Did session timeout?
+                logger.info('Session timed out, will try obtaining a new session using '
+                    'previously saved credential information.')
+                self.metrics.inc('reauthentications_total')
+                expired = self._session
+                request = self._build_auth_request(
+                    self._params.get('verify', True), **self._extra_args)
+                self._session = self._get_session(request)
+                self._session.verify = expired.verify
+                expired.close()
+                self._save_session()
+                return
         raise SMCConnectionError('Session expired and attempted refresh failed.')        
     
     def switch_domain(self, domain):
@@ -645,36 +963,90 @@ class Session(object):
             params.update(domain=domain)
             self.login(**params)
     
-    def set_retry_on_busy(self, total=5, backoff_factor=0.1, status_forcelist=None, **kwargs):
+    def set_retry_on_busy(self, total=5, backoff_factor=0.1, status_forcelist=None,
+                          max_backoff=30, failure_threshold=None, recovery_timeout=30,
+                          **kwargs):
         """
-        Mount a custom retry object on the current session that allows service level
-        retries when the SMC might reply with a Service Unavailable (503) message.
-        This can be possible in larger environments with higher database activity.
-        You can all this on the existing session, or provide as a dict to the login
-        constructor.
+        Retry requests when the SMC replies with a Service Unavailable (503)
+        message. This can be possible in larger environments with higher
+        database activity. You can call this on the existing session, or
+        provide `retry_on_busy=True` to the login constructor.
+        
+        The wait between retries honors the Retry-After header sent by the
+        SMC, otherwise it grows exponentially with a random jitter. GET, PUT
+        and DELETE requests are also retried on connection errors. POST
+        requests are only retried if the connection could not be established.
+        See :mod:`smc.api.retry` for more control.
         
         :param int total: total retries
-        :param float backoff_factor: when to retry
+        :param float backoff_factor: base wait in seconds, the wait before
+            retry n is random between 0 and backoff_factor * 2 ** n seconds
         :param list status_forcelist: list of HTTP error codes to retry on
+        :param float max_backoff: maximum wait in seconds between retries
+        :param int failure_threshold: open a circuit breaker after this many
+            consecutive failures, suspending requests for `recovery_timeout`
+            seconds (default: twice total)
+        :param float recovery_timeout: seconds before requests are sent again
+            after the circuit breaker opened
         :param list method_whitelist: list of methods to apply retries for, GET, POST and
             PUT by default
         :return: None
         """
-        if self.session:
-            from requests.adapters import HTTPAdapter
-            from requests.packages.urllib3.util.retry import Retry
-    
-            method_whitelist = kwargs.pop('method_whitelist', []) or ['GET', 'POST', 'PUT']
-            status_forcelist = frozenset(status_forcelist) if status_forcelist else frozenset([503])
-            retry = Retry(
+        from smc.api.retry import RetryHandler, CircuitBreaker, default_policies
+        methods = kwargs.pop('method_whitelist', []) or ['GET', 'POST', 'PUT']
+        handler = RetryHandler(
+            policies=default_policies(
                 total=total,
                 backoff_factor=backoff_factor,
+                max_backoff=max_backoff,
                 status_forcelist=status_forcelist,
-                method_whitelist=method_whitelist)
-            
-            for proto_str in ('http://', 'https://'):
-                self.session.mount(proto_str, HTTPAdapter(max_retries=retry))
-            logger.debug('Mounting retry object to HTTP session: %s' % retry) 
+                methods=[method.upper() for method in methods]),
+            circuit_breaker=CircuitBreaker(
+                failure_threshold=failure_threshold or max(total * 2, 1),
+                recovery_timeout=recovery_timeout))
+        self.set_retry_handler(handler)
+    
+    def set_retry_handler(self, handler):
+        """
+        Set the retry handler used for requests sent by this session.
+        
+        :param smc.api.retry.RetryHandler handler: retry handler, or None
+            to disable all retries
+        :return: None
+        """
+        self.retry_handler = handler
+        logger.debug('Retry handler for session: %s', handler)
+    
+    def set_throttle(self, throttle):
+        """
+        Set the throttle limiting the rate and concurrency of requests sent
+        by this session. See :mod:`smc.api.throttle`.
+        
+        :param smc.api.throttle.Throttle throttle: throttle, or None to
+            send requests without limits
+        :return: None
+        """
+        self.throttle = throttle
+        logger.debug('Throttle for session: %s', throttle)
+    
+    def _mount_adapter(self, session):
+        """
+        Mount a transport adapter on the requests session using the connection
+        pool settings provided at login. Replaces any previously mounted adapter.
+        Retries are handled by the retry handler of the session rather than
+        the adapter. Compressed responses are requested and decoded by the
+        adapter, see :mod:`smc.api.compression`.
+        
+        :param requests.Session session: session to mount adapter on
+        :return: None
+        """
+        from smc.api.compression import CompressionAdapter, ACCEPT_ENCODING
+        session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+        for proto_str in ('http://', 'https://'):
+            session.mount(proto_str, CompressionAdapter(
+                metrics=self.metrics,
+                rel_of=lambda url: entry_point_rel(self, url),
+                **self.connection_pool))
     
     def copy(self):
         # Copy the relevant parameters to make another session login
@@ -693,13 +1065,18 @@ class Session(object):
         if self.session and self.session_id:
             schema = '{}/{}/monitoring/log/schemas'.format(self.url, self.api_version)
             
-            response = self.session.get(
-                url=schema,
-                headers={'cookie': self.session_id,
-                         'content-type': 'application/json'})
-
-            if response.status_code in (200, 201):
-                return response.json()
+            def get_schema():
+                response = self.session.get(
+                    url=schema,
+                    headers={'cookie': self.session_id,
+                             'content-type': 'application/json'})
+    
+                if response.status_code in (200, 201):
+                    return response.json()
+            
+            cache = self.resource_cache
+            return cache.load('log_schema', get_schema) if cache is not None \
+                else get_schema()
                 
 
 class Credential(object):
@@ -743,35 +1120,69 @@ class Credential(object):
 
 
 def load_entry_points(self):
+    """
+    Load the entry points for the session API version. If the entry point
+    cache is enabled, entry points are read from the cache when available
+    and saved to the cache after they are retrieved from the SMC.
+    """
+    from smc.api.entry_point import Resource
+    cache = self.resource_cache
+    if cache is not None:
+        entry_points = cache.get('entry_points')
+        if entry_points:
+            # An entry point missing from a cached catalog triggers a reload
+            self._resource = Resource(entry_points,
+                reload=lambda: _get_entry_points(self))
+            logger.debug('Loaded entry points from cache: %s',
+                cache.path('entry_points'))
+            return
+    self._resource = Resource(_get_entry_points(self))
+    logger.debug("Loaded entry points with obtained session.")
+
+
+def _get_entry_points(self):
+    """
+    Get the entry points from the SMC and save them to the entry point
+    cache if enabled.
+    
+    :rtype: list(dict)
+    """
     try:
         r = self.session.get('{url}/{api_version}/api'.format(
                 url=self.url, api_version=self.api_version))
         
         if r.status_code == 200:
-            result_list = json.loads(r.text)
-
-            self._resource = Resource(result_list['entry_point'])
-            logger.debug("Loaded entry points with obtained session.")
+            entry_points = json.loads(r.text)['entry_point']
+            cache = self.resource_cache
+            if cache is not None:
+                cache.set('entry_points', entry_points)
+            return entry_points
         
-        else:
-            raise SMCConnectionError(
-                'Invalid status received while getting entry points from SMC. '
-                'Status code received %s. Reason: %s' % (r.status_code, r.reason))
+        raise SMCConnectionError(
+            'Invalid status received while getting entry points from SMC. '
+            'Status code received %s. Reason: %s' % (r.status_code, r.reason))
     
     except requests.exceptions.RequestException as e:
         raise SMCConnectionError(e)
 
 
-def available_api_versions(base_url, timeout=10, verify=True):
+def available_api_versions(base_url, timeout=10, verify=True, cache=None):
     """
     Get all available API versions for this SMC
 
+    :param ResourceCache cache: cache to load the versions from, and store
+        them in after they are retrieved from the SMC
     :return version numbers
     :rtype: list
     """
+    if cache is not None:
+        return cache.load('api_versions',
+            lambda: available_api_versions(base_url, timeout, verify))
+    from smc.api.compression import ACCEPT_ENCODING
     try:
         r = requests.get('%s/api' % base_url, timeout=timeout,
-                         verify=verify)  # no session required
+                         verify=verify,  # no session required
+                         headers={'Accept-Encoding': ACCEPT_ENCODING})
         
         if r.status_code == 200:
             j = json.loads(r.text)
@@ -788,14 +1199,17 @@ def available_api_versions(base_url, timeout=10, verify=True):
         raise SMCConnectionError(e)
 
 
-def get_api_version(base_url, api_version=None, timeout=10, verify=True):
+def get_api_version(base_url, api_version=None, timeout=10, verify=True,
+                    cache=None):
     """
     Get the API version specified or resolve the latest version
 
+    :param ResourceCache cache: cache of the API versions, see
+        :func:`available_api_versions`
     :return api version
     :rtype: float
     """
-    versions = available_api_versions(base_url, timeout, verify)
+    versions = available_api_versions(base_url, timeout, verify, cache)
     
     newest_version = max([float(i) for i in versions])
     if api_version is None:  # Use latest
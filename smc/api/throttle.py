@@ -0,0 +1,282 @@
+"""
+Client side rate limiting and prioritization of requests sent to the SMC.
+
+A :class:`Throttle` limits the requests a session sends to the SMC, per
+class of method: `read` (GET) and `write` (POST, PUT and DELETE). Each
+class has a :class:`Limit` with:
+
+* a token bucket rate: requests per second, with bursts of up to `burst`
+  requests after a quiet period
+* a concurrency limit: requests waiting for a response at the same time
+
+Requests that exceed a limit wait in one of two priority lanes,
+`interactive` or `batch`. Waiting interactive requests are always sent
+before waiting batch requests, so a bulk job does not delay the
+lookups of interactive scripts sharing the session. Requests are in the
+interactive lane unless sent in a :func:`lane` block::
+
+    from smc.api.throttle import Throttle, Limit, lane
+
+    session.set_throttle(Throttle(
+        read=Limit(rate=50, concurrency=16),
+        write=Limit(rate=5, burst=10, concurrency=4)))
+
+    with lane('batch'):
+        for name, address in hosts:
+            Host.update_or_create(name=name, address=address)
+
+The lane of a block also applies to requests submitted in the block to a
+:class:`~smc.api.executor.RequestExecutor`, including the page prefetch of
+collections. On Python 3.7+ the lane is a context variable, like the
+session bound by :func:`~smc.api.common.session_scope`. On older versions
+it is a thread local value, copied to the executor threads by
+:func:`~smc.api.common.bind_context`.
+
+Every HTTP request is counted, including retries and file transfers.
+Requests answered by an identical GET in flight (see
+:mod:`smc.api.coalesce`) are not. A throttle can be set on several
+sessions, for example the sessions of a
+:class:`~smc.api.pool.SessionPool`, to limit the load of all of them on
+the SMC. Set it at login with the `throttle` keyword argument, or on an
+existing session with :meth:`~smc.api.session.Session.set_throttle`.
+
+Waiting requests are recorded in the session metrics as the
+`throttle_queue_depth` gauge and the `throttle_wait_seconds` histogram,
+by method class and lane.
+"""
+import threading
+import collections
+from contextlib import contextmanager
+from timeit import default_timer
+from smc.compat import context_var
+
+
+#: Priority lanes, highest priority first
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+LANES = (INTERACTIVE, BATCH)
+
+#: HTTP method to method class
+METHOD_CLASSES = {
+    'GET': 'read', 'HEAD': 'read', 'OPTIONS': 'read',
+    'POST': 'write', 'PUT': 'write', 'DELETE': 'write'}
+
+#: Histogram buckets in seconds for the time spent waiting
+WAIT_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+#: Lane of the current thread or asyncio task
+_current_lane = context_var('smc_lane')
+
+
+@contextmanager
+def lane(name):
+    """
+    Send the requests of the block in a priority lane.
+
+    :param str name: `interactive` or `batch`
+    :raises ValueError: unknown lane
+    """
+    if name not in LANES:
+        raise ValueError('Unknown lane %r, valid lanes are: %s' % (
+            name, ', '.join(LANES)))
+    token = _current_lane.set(name)
+    try:
+        yield
+    finally:
+        _current_lane.reset(token)
+
+
+def current_lane():
+    """
+    Lane of requests sent from the current thread or asyncio task
+
+    :rtype: str
+    """
+    return _current_lane.get() or INTERACTIVE
+
+
+class TokenBucket(object):
+    """
+    Token bucket refilled at `rate` tokens per second, holding up to
+    `burst` tokens. The bucket starts full.
+
+    :param float rate: tokens added per second
+    :param int burst: capacity of the bucket (default: rate, at least 1)
+    """
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1, rate))
+        self.tokens = self.capacity
+        self._updated = default_timer()
+        self._lock = threading.Lock()
+
+    def take(self):
+        """
+        Take a token if one is available.
+
+        :return: 0 if a token was taken, otherwise the seconds until a
+            token is available
+        :rtype: float
+        """
+        with self._lock:
+            now = default_timer()
+            self.tokens = min(self.capacity,
+                self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def __repr__(self):
+        return 'TokenBucket(rate=%s, capacity=%s)' % (self.rate, self.capacity)
+
+
+class Limit(object):
+    """
+    Limits for a class of methods. None disables a limit.
+
+    :param float rate: requests per second
+    :param int burst: requests that can be sent at once after a quiet
+        period (default: rate)
+    :param int concurrency: requests waiting for a response at the same
+        time
+    """
+    def __init__(self, rate=None, burst=None, concurrency=None):
+        if rate is not None and rate <= 0:
+            raise ValueError('Rate must be greater than 0, got %s' % rate)
+        if concurrency is not None and concurrency < 1:
+            raise ValueError('Concurrency must be at least 1, got %s' % concurrency)
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+
+    def __repr__(self):
+        return 'Limit(rate=%s, burst=%s, concurrency=%s)' % (
+            self.rate, self.burst, self.concurrency)
+
+
+class _Gate(object):
+    """
+    State of a method class: token bucket, requests in flight and the
+    requests waiting in each lane
+    """
+    def __init__(self, method_class, limit):
+        self.method_class = method_class
+        self.limit = limit
+        self.bucket = TokenBucket(limit.rate, limit.burst) if limit.rate else None
+        self.in_flight = 0
+        self.waiting = dict((name, collections.deque()) for name in LANES)
+
+    def head(self):
+        # Next request to send, from the highest priority lane
+        for name in LANES:
+            if self.waiting[name]:
+                return self.waiting[name][0]
+
+    def has_slot(self):
+        return self.limit.concurrency is None or \
+            self.in_flight < self.limit.concurrency
+
+
+class Throttle(object):
+    """
+    Rate and concurrency limits for the requests of one or more sessions.
+    Method classes without a limit are not throttled.
+
+    :param Limit read: limit for GET requests
+    :param Limit write: limit for POST, PUT and DELETE requests
+    """
+    def __init__(self, read=None, write=None):
+        self._cond = threading.Condition()
+        self._gates = {}
+        for method_class, limit in (('read', read), ('write', write)):
+            if limit is not None:
+                self._gates[method_class] = _Gate(method_class, limit)
+
+    def acquire(self, method, metrics=None):
+        """
+        Wait until the request can be sent according to the limits of it's
+        method class. Every call returning a gate must be followed by a
+        call to :meth:`release` once the response is received.
+
+        :param str method: HTTP method
+        :param MetricsRegistry metrics: metrics to record waits in
+        :return: gate to provide to :meth:`release`, None if the method
+            is not throttled
+        """
+        gate = self._gates.get(METHOD_CLASSES.get(method.upper(), 'write'))
+        if gate is None:
+            return None
+        name = current_lane()
+        ticket = object()
+        start = default_timer()
+        waited = False
+        with self._cond:
+            queue = gate.waiting[name]
+            queue.append(ticket)
+            try:
+                while True:
+                    delay = None # Wait to be notified
+                    if gate.head() is ticket and gate.has_slot():
+                        delay = gate.bucket.take() if gate.bucket else 0
+                        if not delay:
+                            break
+                    if not waited:
+                        waited = True
+                        self._depth(gate, name, metrics)
+                    self._cond.wait(delay)
+            finally:
+                queue.remove(ticket)
+                if waited:
+                    self._depth(gate, name, metrics)
+                self._cond.notify_all()
+            gate.in_flight += 1
+        if metrics is not None:
+            metrics.observe('throttle_wait_seconds', default_timer() - start,
+                WAIT_BUCKETS, method_class=gate.method_class, lane=name)
+        return gate
+
+    def release(self, gate):
+        """
+        Release the concurrency slot of a request sent after :meth:`acquire`
+
+        :return: None
+        """
+        if gate is None:
+            return
+        with self._cond:
+            gate.in_flight -= 1
+            self._cond.notify_all()
+
+    def _depth(self, gate, name, metrics):
+        if metrics is not None:
+            metrics.set_gauge('throttle_queue_depth', len(gate.waiting[name]),
+                method_class=gate.method_class, lane=name)
+
+    def queue_depth(self, method_class=None, lane=None):
+        """
+        Number of requests waiting, optionally for a method class and lane
+
+        :rtype: int
+        """
+        with self._cond:
+            return sum(len(queue)
+                for gate in self._gates.values()
+                if method_class in (None, gate.method_class)
+                for name, queue in gate.waiting.items()
+                if lane in (None, name))
+
+    def in_flight(self, method_class=None):
+        """
+        Number of requests sent and waiting for a response
+
+        :rtype: int
+        """
+        with self._cond:
+            return sum(gate.in_flight for gate in self._gates.values()
+                if method_class in (None, gate.method_class))
+
+    def __repr__(self):
+        return 'Throttle(%s)' % ', '.join('%s=%s' % (method_class, gate.limit)
+            for method_class, gate in sorted(self._gates.items()))
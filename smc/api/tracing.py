@@ -0,0 +1,381 @@
+"""
+Tracing of requests sent to the SMC.
+
+Hooks registered with :func:`add_request_hook` are called when a request
+starts and when it ends, for every HTTP request sent through a session
+(including retries, re-authentication and file transfers) and for
+monitoring web socket queries. Both callbacks receive the same
+:class:`RequestEvent`, which has the method, href, entry point rel and,
+once ended, the status, bytes sent and received, duration and error::
+
+    from smc.api import tracing
+
+    def on_request_end(event):
+        if event.duration > 1:
+            print('slow request', event.method, event.rel, event.status,
+                event.bytes_in, event.duration)
+
+    hook = tracing.add_request_hook(on_request_end=on_request_end)
+    ...
+    tracing.remove_request_hook(hook)
+
+Hooks are called in the thread (or asyncio task) sending the request and
+must not block. Exceptions raised by a hook are logged and ignored.
+
+:class:`SpanTracer` is a hook adapter recording each request as a span,
+nested under the span of the operation that sent it. Operations such as
+policy upload open their own spans with :func:`span`, so the requests of
+a task and the requests polling it are grouped in a single timeline::
+
+    with tracing.SpanTracer() as tracer:
+        engine.upload('Standard Policy', wait_for_finish=True).wait()
+    print(tracer.timeline())
+
+    Layer3Firewall.upload  0.0 ms  5012.3 ms  element=fw
+      POST other  0.1 ms  25.1 ms  status=202
+      Task poll  25.3 ms  4987.0 ms
+        GET other  1026.2 ms  11.4 ms  status=200
+        ...
+
+A span tree is complete, and passed to the `exporter` of the tracer, once
+all of it's spans have ended. Spans can also be opened by scripts to group
+their own operations. When no tracer is installed, :func:`span` does not
+record anything.
+"""
+import time
+import logging
+import threading
+import collections
+from contextlib import contextmanager
+from timeit import default_timer
+from smc.compat import context_var
+
+
+logger = logging.getLogger(__name__)
+
+
+#: Registered (on_request_start, on_request_end) hooks
+_hooks = ()
+_lock = threading.Lock()
+
+#: Span of the current thread or asyncio task
+_current_span = context_var('smc_span')
+
+#: Installed span tracer
+_tracer = None
+
+
+class RequestEvent(object):
+    """
+    A request to the SMC, passed to request hooks.
+
+    :ivar str method: HTTP method, or `WEBSOCKET` for monitoring queries
+    :ivar str href: url of the request
+    :ivar str rel: entry point of the request, `other` if the href is not
+        under an entry point
+    :ivar float start: time the request started, in seconds since the epoch
+    :ivar int status: HTTP status code, None until the request ends or if
+        no response was received
+    :ivar int bytes_out: size of the request body
+    :ivar int bytes_in: size of the response body
+    :ivar float duration: duration of the request in seconds
+    :ivar Exception error: exception raised sending the request, if any
+    :ivar dict context: storage for hooks, for example to keep state
+        between the start and end callbacks
+    """
+    def __init__(self, method, href, rel):
+        self.method = method
+        self.href = href
+        self.rel = rel
+        self.start = time.time()
+        self.status = None
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.duration = None
+        self.error = None
+        self.context = {}
+        self._timer = default_timer()
+
+    def __repr__(self):
+        return 'RequestEvent(method=%s, rel=%s, status=%s, duration=%s)' % (
+            self.method, self.rel, self.status, self.duration)
+
+
+def add_request_hook(on_request_start=None, on_request_end=None):
+    """
+    Register callbacks called with a :class:`RequestEvent` when a request
+    starts and ends.
+
+    :param on_request_start: callable called before the request is sent
+    :param on_request_end: callable called after the response is received
+        or the request failed
+    :return: hook to provide to :func:`remove_request_hook`
+    """
+    global _hooks
+    hook = (on_request_start, on_request_end)
+    with _lock:
+        _hooks = _hooks + (hook,)
+    return hook
+
+
+def remove_request_hook(hook):
+    """
+    Remove a hook registered by :func:`add_request_hook`
+
+    :return: None
+    """
+    global _hooks
+    with _lock:
+        _hooks = tuple(h for h in _hooks if h is not hook)
+
+
+def _call(callback, event):
+    try:
+        callback(event)
+    except Exception:
+        logger.exception('Request hook %r failed', callback)
+
+
+def request_started(method, href, rel):
+    """
+    Signal the start of a request to the registered hooks.
+
+    :return: event to provide to :func:`request_finished`, or None if no
+        hooks are registered
+    :rtype: RequestEvent
+    """
+    hooks = _hooks
+    if not hooks:
+        return None
+    event = RequestEvent(method, href, rel)
+    event.context['hooks'] = hooks
+    for on_start, _ in hooks:
+        if on_start is not None:
+            _call(on_start, event)
+    return event
+
+
+def request_finished(event, status=None, bytes_out=0, bytes_in=0, error=None):
+    """
+    Signal the end of a request to the hooks that received it's start.
+
+    :param RequestEvent event: event returned by :func:`request_started`
+    :return: None
+    """
+    if event is None:
+        return
+    event.duration = default_timer() - event._timer
+    event.status = status
+    event.bytes_out = bytes_out
+    event.bytes_in = bytes_in
+    event.error = error
+    for _, on_end in event.context.pop('hooks', ()):
+        if on_end is not None:
+            _call(on_end, event)
+
+
+class Span(object):
+    """
+    A timed operation, with nested spans for the operations and requests
+    made while it was current.
+
+    :ivar str name: name of the span
+    :ivar dict attributes: attributes of the span
+    :ivar Span parent: enclosing span, or None for a root span
+    :ivar list children: nested spans, in start order
+    :ivar float start: start time, in seconds since the epoch
+    :ivar float duration: duration in seconds, None while in progress
+    """
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.parent = parent
+        self.attributes = attributes or {}
+        self.children = []
+        self.start = time.time()
+        self.duration = None
+        self._timer = default_timer()
+        self.root = parent.root if parent is not None else self
+        self._pending = 0 # Spans of the tree in progress, on the root
+        with _lock:
+            self.root._pending += 1
+            if parent is not None:
+                parent.children.append(self)
+
+    def finish(self, **attributes):
+        """
+        End the span. Returns True if this completes the span tree.
+
+        :rtype: bool
+        """
+        self.duration = default_timer() - self._timer
+        self.attributes.update(attributes)
+        with _lock:
+            self.root._pending -= 1
+            return self.root._pending == 0
+
+    def walk(self, depth=0):
+        """
+        Iterate over this span and all nested spans, depth first
+
+        :return: generator of (depth, Span)
+        """
+        yield depth, self
+        for child in list(self.children):
+            for nested in child.walk(depth + 1):
+                yield nested
+
+    def to_dict(self):
+        """
+        Return the span tree as a dict, for example to serialize as JSON
+
+        :rtype: dict
+        """
+        return {
+            'name': self.name,
+            'start': self.start,
+            'duration': self.duration,
+            'attributes': dict(self.attributes),
+            'children': [child.to_dict() for child in list(self.children)]}
+
+    def __repr__(self):
+        return 'Span(name=%s, duration=%s)' % (self.name, self.duration)
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Record the block as a span nested in the current span, if a
+    :class:`SpanTracer` is installed. Spans and requests started in the
+    block, including in threads of a
+    :class:`~smc.api.executor.RequestExecutor`, are nested in this span.
+
+    :param str name: name of the span
+    :param attributes: attributes of the span
+    :return: the Span, or None if no tracer is installed
+    """
+    tracer = _tracer
+    if tracer is None:
+        yield None
+        return
+    current = Span(name, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.attributes['error'] = repr(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        tracer._finish(current)
+
+
+class SpanTracer(object):
+    """
+    Request hook adapter recording requests as nested spans. Completed
+    span trees are kept in `spans`, up to `max_spans`, and passed to the
+    exporter. Only one tracer can be installed at a time.
+
+    :param exporter: optional callable called with each completed root
+        :class:`Span`
+    :param int max_spans: number of completed span trees to keep
+    """
+    def __init__(self, exporter=None, max_spans=100):
+        self.exporter = exporter
+        self.spans = collections.deque(maxlen=max_spans)
+        self._hook = None
+
+    def install(self):
+        """
+        Register the request hooks of this tracer and record spans.
+
+        :raises ValueError: another tracer is installed
+        :return: None
+        """
+        global _tracer
+        with _lock:
+            if _tracer is not None and _tracer is not self:
+                raise ValueError('A span tracer is already installed')
+            _tracer = self
+        if self._hook is None:
+            self._hook = add_request_hook(
+                self.on_request_start, self.on_request_end)
+
+    def uninstall(self):
+        """
+        Remove the request hooks of this tracer.
+
+        :return: None
+        """
+        global _tracer
+        with _lock:
+            if _tracer is self:
+                _tracer = None
+        if self._hook is not None:
+            remove_request_hook(self._hook)
+            self._hook = None
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, exctype, value, traceback):
+        self.uninstall()
+
+    def on_request_start(self, event):
+        event.context['span'] = Span(
+            '%s %s' % (event.method, event.rel), _current_span.get(),
+            {'href': event.href})
+
+    def on_request_end(self, event):
+        current = event.context.pop('span', None)
+        if current is None:
+            return
+        attributes = {'status': event.status}
+        if event.bytes_out:
+            attributes.update(bytes_out=event.bytes_out)
+        if event.bytes_in:
+            attributes.update(bytes_in=event.bytes_in)
+        if event.error is not None:
+            attributes.update(error=repr(event.error))
+        if current.finish(**attributes):
+            self._export(current.root)
+
+    def _finish(self, current):
+        if current.finish():
+            self._export(current.root)
+
+    def _export(self, root):
+        self.spans.append(root)
+        if self.exporter is not None:
+            try:
+                self.exporter(root)
+            except Exception:
+                logger.exception('Span exporter %r failed', self.exporter)
+
+    def timeline(self, root=None):
+        """
+        Format a span tree as an indented timeline. Each line has the
+        span name, the start offset from the root span, the duration and
+        the attributes (the href of requests is omitted).
+
+        :param Span root: span tree to format, the last completed tree by
+            default
+        :rtype: str
+        """
+        if root is None:
+            if not self.spans:
+                return ''
+            root = self.spans[-1]
+        lines = []
+        for depth, current in root.walk():
+            attributes = ' '.join('%s=%s' % (key, value)
+                for key, value in sorted(current.attributes.items())
+                if key != 'href')
+            lines.append('%s%s  %.1f ms  %.1f ms  %s' % (
+                '  ' * depth, current.name,
+                (current.start - root.start) * 1000,
+                (current.duration or 0) * 1000, attributes))
+        return '\n'.join(line.rstrip() for line in lines)
+
+    def __repr__(self):
+        return 'SpanTracer(spans=%s)' % len(self.spans)
@@ -5,43 +5,142 @@ SSL certificates are not verified to the CA authority, need to implement for
 urllib3:
 https://urllib3.readthedocs.io/en/latest/user-guide.html#ssl
 """
-import json
 import os.path
-import collections
+import hashlib
 import logging
 import requests
+from timeit import default_timer
+from smc.api import tracing, profiling
 from smc.api.exceptions import SMCOperationFailure, SMCConnectionError
+from smc.api.jsonstream import iter_items, CHUNK_SIZE
+from smc.api.multipart import MultipartEncoder
+from smc.api.codec import CacheEncoder, get_codec  # @UnusedImport
 
 
 logger = logging.getLogger(__name__)
 
 
-class CacheEncoder(json.JSONEncoder):
-    def default(self, o):
-        try:
-            return o.data
-        except AttributeError:
-            json.JSONEncoder.default(self, o)
-
-
 GET = 'GET'
 PUT = 'PUT'
 POST = 'POST'
 DELETE = 'DELETE'
 
+#: Default chunk size in bytes for file transfers
+TRANSFER_CHUNK_SIZE = 1024 * 1024
+
+#: Number of times an interrupted download is resumed
+DOWNLOAD_RETRIES = 3
+
+#: Number of times a request is resent after the session expired (401)
+#: and was re-authenticated
+REAUTH_RETRIES = 2
+
+
+def json_codec(user_session):
+    """
+    Return the JSON codec configured for the session
+    
+    :rtype: smc.api.codec.JSONCodec
+    """
+    return getattr(user_session, 'json_codec', None) or get_codec()
+
+
+def entry_point_rel(user_session, href):
+    """
+    Resolve the entry point rel name for the href, used to label
+    request metrics. Requests outside of an entry point (login, API
+    discovery) are labeled 'other'.
+    
+    :rtype: str
+    """
+    resource = getattr(user_session, '_resource', None)
+    rel = resource.rel_of(href) if resource else None
+    return rel or 'other'
+
+
+def _request(user_session, method, url, **kwargs):
+    """
+    Send the HTTP request using the requests session of the user
+    session. All HTTP requests made by send_request and file transfers
+    are sent through this function. The request is retried according to
+    the retry handler of the session, see :mod:`smc.api.retry`.
+    
+    :param Session user_session: session object
+    :param str method: HTTP method
+    :param str url: url for the request
+    :param kwargs: keyword arguments for requests.Session.request
+    :raises CircuitBreakerOpen: requests to the SMC are suspended
+    :rtype: requests.Response
+    """
+    rel = entry_point_rel(user_session, url)
+    
+    def send(method, url, **kwargs):
+        return _send(user_session, method, url, rel, **kwargs)
+    
+    handler = getattr(user_session, 'retry_handler', None)
+    if handler is None:
+        return send(method, url, **kwargs)
+    return handler.send(user_session, send, method, url, rel=rel, **kwargs)
+
+
+def _send(user_session, method, url, rel, **kwargs):
+    """
+    Send a single HTTP request, record request metrics and call the
+    request hooks, see :mod:`smc.api.tracing`. The request waits for the
+    throttle of the session, if any, see :mod:`smc.api.throttle`.
+    
+    :rtype: requests.Response
+    """
+    metrics = user_session.metrics
+    throttle = getattr(user_session, 'throttle', None)
+    gate = throttle.acquire(method, metrics) if throttle is not None else None
+    event = tracing.request_started(method, url, rel)
+    metrics.add_gauge('requests_in_flight', 1)
+    start = default_timer()
+    try:
+        response = user_session.session.request(method, url, **kwargs)
+    except Exception as e:
+        tracing.request_finished(event, error=e)
+        raise
+    finally:
+        metrics.add_gauge('requests_in_flight', -1)
+        if throttle is not None:
+            throttle.release(gate)
+    duration = default_timer() - start
+    
+    body = response.request.body
+    bytes_out = len(body) if isinstance(body, (bytes, str)) else \
+        getattr(body, 'sent', 0) # Streamed upload
+    # Content is not consumed yet for streaming responses
+    bytes_in = int(response.headers.get('content-length', 0)) if \
+        kwargs.get('stream') else len(response.content)
+    
+    metrics.observe_request(
+        method, rel, response.status_code, duration,
+        bytes_out=bytes_out, bytes_in=bytes_in)
+    tracing.request_finished(event, response.status_code, bytes_out, bytes_in)
+    return response
+
         
-def send_request(user_session, method, request):
+def send_request(user_session, method, request, reauth=0):
     """
-    Send request to SMC
+    Send request to SMC. If the session has expired (401), the session
+    is refreshed and the request resent, up to :data:`REAUTH_RETRIES`
+    times. A GET identical to a GET in flight on the session shares it's
+    response, see :mod:`smc.api.coalesce`.
     
     :param Session user_session: session object
     :param str method: method for request
     :param SMCRequest request: request object
+    :param int reauth: number of times the request was already resent
+        after re-authentication
     :raises SMCOperationFailure: failure with reason
     :rtype: SMCResult
     """
     if user_session.session:
-        session = user_session.session # requests session
+        # Session used for this request, to detect whether another thread
+        # has already refreshed it if the request fails with 401
+        session_id = user_session.session_id
         try:
             method = method.upper() if method else ''
             
@@ -49,15 +148,36 @@ def send_request(user_session, method, request):
                 if request.filename:  # File download request
                     return file_download(user_session, request)
                 
-                response = session.get(
-                    request.href,
-                    params=request.params,
-                    headers=request.headers,
-                    timeout=user_session.timeout)
+                stream = getattr(request, 'stream', False)
+                
+                def get():
+                    return _request(
+                        user_session, GET,
+                        request.href,
+                        params=request.params,
+                        headers=request.headers,
+                        timeout=user_session.timeout,
+                        stream=stream)
+                
+                coalescer = getattr(user_session, 'coalescer', None)
+                if coalescer is None or stream:
+                    response = get()
+                else: # Share the response of an identical GET in flight
+                    response, shared = coalescer.call(coalescer.key(
+                        request.href, request.params, request.headers), get)
+                    if shared:
+                        user_session.metrics.inc('coalesced_requests_total',
+                            rel=entry_point_rel(user_session, request.href))
                 
                 response.encoding = 'utf-8'
                 
-                counters.update(read=1)
+                if stream and response.status_code == 200:
+                    return SMCResult(response, user_session=user_session,
+                        stream=True)
+                
+                if 'If-None-Match' in request.headers: # Conditional GET
+                    user_session.metrics.inc('cache_hits_total' if \
+                        response.status_code == 304 else 'cache_misses_total')
 
                 if logger.isEnabledFor(logging.DEBUG):
                     debug(response)
@@ -69,15 +189,15 @@ def send_request(user_session, method, request):
                 if request.files:  # File upload request
                     return file_upload(user_session, method, request)
                 
-                response = session.post(
+                response = _request(
+                    user_session, POST,
                     request.href,
-                    data=json.dumps(request.json, cls=CacheEncoder),
+                    data=json_codec(user_session).dumps(request.json),
                     headers=request.headers,
                     params=request.params)
                 
                 response.encoding = 'utf-8'
 
-                counters.update(create=1)
                 if logger.isEnabledFor(logging.DEBUG):
                     debug(response)
                 
@@ -92,14 +212,13 @@ def send_request(user_session, method, request):
                 # Etag should be set in request object
                 request.headers.update(Etag=request.etag)
                 
-                response = session.put(
+                response = _request(
+                    user_session, PUT,
                     request.href,
-                    data=json.dumps(request.json, cls=CacheEncoder),
+                    data=json_codec(user_session).dumps(request.json),
                     params=request.params,
                     headers=request.headers)
 
-                counters.update(update=1)
-                
                 if logger.isEnabledFor(logging.DEBUG):
                     debug(response)
 
@@ -107,20 +226,13 @@ def send_request(user_session, method, request):
                     raise SMCOperationFailure(response)
 
             elif method == DELETE:
-                response = session.delete(
+                # Conflict (409) if ETag is not current is retried
+                # with the current ETag by the retry handler
+                response = _request(
+                    user_session, DELETE,
                     request.href,
                     headers=request.headers)
 
-                counters.update(delete=1)
-
-                # Conflict (409) if ETag is not current
-                if response.status_code in (409,):
-                    req = session.get(request.href)
-                    etag = req.headers.get('ETag')
-                    response = session.delete(
-                        request.href,
-                        headers={'if-match': etag})
-
                 response.encoding = 'utf-8'
 
                 if logger.isEnabledFor(logging.DEBUG):
@@ -134,54 +246,224 @@ def send_request(user_session, method, request):
                     user_session=user_session)
 
         except SMCOperationFailure as error:
-            if error.code in (401,):
-                user_session.refresh()
-                return send_request(user_session, method, request)
+            if error.code in (401,) and reauth < REAUTH_RETRIES:
+                user_session.refresh(session_id)
+                return send_request(user_session, method, request, reauth + 1)
             raise error
         except requests.exceptions.RequestException as e:
             raise SMCConnectionError('Connection problem to SMC, ensure the API '
                 'service is running and host is correct: %s, exiting.' % e)
         else:
             return SMCResult(response, user_session=user_session)
+        finally:
+            if method != GET and getattr(user_session, 'coalescer', None):
+                # Later GETs must not receive a response sent before the change
+                user_session.coalescer.forget()
     else:
         raise SMCConnectionError('No session found. Please login to continue')
             
 
 def file_download(user_session, request):
     """
-    Called when GET request specifies a filename to retrieve.
+    Called when GET request specifies a filename to retrieve. The response
+    body is streamed to a partial file (<filename>.part) in chunks of
+    `chunk_size` bytes and renamed to the filename once complete, so the
+    download is never held in memory. A SHA-256 digest is calculated while
+    the file is written.
+    
+    If the connection is interrupted, the download is resumed from the
+    last byte received using an HTTP Range request, up to `retries` times.
+    If the SMC does not honor the range, the download restarts.
+    
+    Optional attributes of the request:
+    
+    * chunk_size (int): size of chunks to read and write
+      (default: :data:`TRANSFER_CHUNK_SIZE`)
+    * progress (callable): called as progress(bytes_received, total_bytes)
+      after each chunk. total_bytes is None if the size is not known
+    * retries (int): number of times to resume an interrupted download
+      (default: :data:`DOWNLOAD_RETRIES`)
+    * resume (bool): resume from an existing partial file left by a
+      previous failed download (default: False). The ETag or Last-Modified
+      of the download is saved next to the partial file
+      (<filename>.part.validator) and sent as `If-Range` so the SMC
+      returns the full resource if it changed. A partial file without a
+      saved validator is not resumed and the download restarts.
     
     :param Session user_session: session object
     :param SMCRequest request: request object
     :raises SMCOperationFailure: failure with reason
+    :raises SMCConnectionError: download interrupted and retries exhausted
+    :return: result with `content` set to the path of the file and
+        `sha256` set to the hex digest of the file contents
     :rtype: SMCResult
     """
     logger.debug('Download file: %s', vars(request))
-    response = user_session.session.get(
-        request.href,
-        params=request.params,
-        headers=request.headers,
-        stream=True)
+    chunk_size = getattr(request, 'chunk_size', None) or TRANSFER_CHUNK_SIZE
+    progress = getattr(request, 'progress', None)
+    retries = getattr(request, 'retries', DOWNLOAD_RETRIES)
+    
+    path = os.path.abspath(request.filename)
+    partial = path + '.part'
+    validator_file = partial + '.validator'
+    logger.debug('Operation: %s, saving to file: %s', request.href, path)
+    
+    digest = hashlib.sha256()
+    received = 0
+    validator = None # ETag or Last-Modified of the first response
+    try:
+        if getattr(request, 'resume', False) and os.path.isfile(partial):
+            validator = _read_validator(validator_file)
+            if validator:
+                with open(partial, 'rb') as handle:
+                    for chunk in iter(lambda: handle.read(chunk_size), b''):
+                        digest.update(chunk)
+                        received += len(chunk)
+                logger.debug('Resuming download from partial file at %s bytes',
+                    received)
+            else:
+                logger.debug('Partial file has no ETag or Last-Modified, '
+                    'restarting download')
+        
+        attempt = 0
+        with open(partial, 'ab' if received else 'wb') as handle:
+            while True:
+                # Ranges refer to the encoded content, request it unencoded
+                headers = dict(request.headers or {}, **{'Accept-Encoding': 'identity'})
+                if received:
+                    headers.update(Range='bytes=%s-' % received)
+                    if validator:
+                        headers.update({'If-Range': validator})
+                
+                response = None
+                try:
+                    response = _request(
+                        user_session, GET,
+                        request.href,
+                        params=request.params,
+                        headers=headers,
+                        stream=True)
+                    
+                    status = response.status_code
+                    if status == 416 and received and \
+                        _content_total(response) == received:
+                        status = 206 # Partial file is already complete
+                        break
+                    if status == 206 and _validator(response) not in \
+                        (None, validator):
+                        # The SMC ignored If-Range and the resource changed
+                        error = 'resource changed during download'
+                        raise _ResourceChanged()
+                    if status == 200 and received:
+                        logger.debug('Range not satisfied, restarting download')
+                        handle.seek(0)
+                        handle.truncate()
+                        digest = hashlib.sha256()
+                        received = 0
+                    elif status not in (200, 206):
+                        raise SMCOperationFailure(response)
+                    
+                    if status == 200:
+                        validator = _validator(response)
+                        _write_validator(validator_file, validator)
+                    total = _content_total(response)
+                    
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        handle.write(chunk)
+                        digest.update(chunk)
+                        received += len(chunk)
+                        if progress:
+                            progress(received, total)
+                    
+                    if total is None or received >= total:
+                        break
+                    error = 'received %s of %s bytes' % (received, total)
+                
+                except requests.exceptions.RequestException as e:
+                    if not received and response is None:
+                        raise # Failed to connect
+                    error = e
+                except _ResourceChanged:
+                    # Restart without a range on the next attempt
+                    handle.seek(0)
+                    handle.truncate()
+                    digest = hashlib.sha256()
+                    received = 0
+                    validator = None
+                finally:
+                    if response is not None:
+                        response.close()
+                
+                attempt += 1
+                if attempt > retries:
+                    raise SMCConnectionError('Download of %s was interrupted: %s' %
+                        (request.href, error))
+                logger.warning('Download interrupted (%s), resuming at %s bytes',
+                    error, received)
+        
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(partial, path)
+        if os.path.exists(validator_file):
+            os.remove(validator_file)
+    except (OSError, IOError) as e:
+        raise IOError('Error attempting to save to file: {}'.format(e))
+    
+    logger.debug('Downloaded %s bytes to %s, sha256: %s', received, path,
+        digest.hexdigest())
+    result = SMCResult(user_session=user_session)
+    result.code = status
+    result.etag = response.headers.get('ETag')
+    result.content = path
+    result.sha256 = digest.hexdigest()
+    return result
 
-    if response.status_code == 200:
-        logger.debug('Streaming to file... Content length: %s', len(response.content))
-        try:
-            path = os.path.abspath(request.filename)
-            logger.debug('Operation: %s, saving to file: %s', request.href, path)
 
-            with open(path, "wb") as handle:
-                for chunk in response.iter_content(chunk_size=1024):
-                    if chunk:
-                        handle.write(chunk)
-                        handle.flush()
-        except IOError as e:
-            raise IOError('Error attempting to save to file: {}'.format(e))
+class _ResourceChanged(Exception):
+    pass
 
-        result = SMCResult(response, user_session=user_session)
-        result.content = path
-        return result
-    else:
-        raise SMCOperationFailure(response)
+
+def _validator(response):
+    """
+    Validator of the downloaded resource, sent as `If-Range` when the
+    download is resumed
+    
+    :rtype: str
+    """
+    return response.headers.get('ETag') or response.headers.get('Last-Modified')
+
+
+def _read_validator(filename):
+    try:
+        with open(filename, 'r') as handle:
+            return handle.read().strip() or None
+    except (OSError, IOError):
+        return None
+
+
+def _write_validator(filename, validator):
+    if validator:
+        with open(filename, 'w') as handle:
+            handle.write(validator)
+    elif os.path.exists(filename):
+        os.remove(filename)
+
+
+def _content_total(response):
+    """
+    Total size of the resource being downloaded, obtained from the
+    Content-Range header of a partial response or the Content-Length
+    of a full response. None if the size is unknown.
+    
+    :rtype: int
+    """
+    content_range = response.headers.get('Content-Range')
+    if content_range:
+        total = content_range.rpartition('/')[-1]
+        return int(total) if total.isdigit() else None
+    length = response.headers.get('Content-Length')
+    if length and response.status_code == 200:
+        return int(length)
 
 
 def file_upload(user_session, method, request):
@@ -190,6 +472,19 @@ def file_upload(user_session, method, request):
     files attribute set which will be an open handle to the
     file that will be binary transfer.
     
+    The multipart body is streamed by a
+    :class:`~smc.api.multipart.MultipartEncoder` reading files in chunks,
+    so uploads are not held in memory. The body is sent with a
+    Content-Length when the size of all files is known, otherwise with
+    chunked transfer encoding.
+    
+    Optional attributes of the request:
+    
+    * chunk_size (int): size of chunks read from files
+      (default: :data:`TRANSFER_CHUNK_SIZE`)
+    * progress (callable): called as progress(bytes_sent, total_bytes)
+      while the body is sent
+    
     :param Session user_session: session object
     :param str method: method to use, could be put or post
     :param SMCRequest request: request object
@@ -197,21 +492,56 @@ def file_upload(user_session, method, request):
     :rtype: SMCResult
     """
     logger.debug('Upload: %s', vars(request))
-    http_command = getattr(user_session.session, method.lower())
-    
     try:
-        response = http_command(
-            request.href,
-            params=request.params,
-            files=request.files)
-    except AttributeError:
+        # Encoder is kept on the request to rewind files if resent
+        if not isinstance(request.files, MultipartEncoder):
+            request.files = MultipartEncoder(
+                request.files,
+                chunk_size=getattr(request, 'chunk_size', None) or TRANSFER_CHUNK_SIZE,
+                progress=getattr(request, 'progress', None))
+        encoder = request.files
+        encoder.reset()
+    except (AttributeError, TypeError):
         raise TypeError('File specified in request was not readable: %s' % request.files)
-    else:
-        if response.status_code in (200, 201, 202, 204):
-            logger.debug('Success sending file in elapsed time: %s', response.elapsed)
-            return SMCResult(response, user_session=user_session)
-        
-        raise SMCOperationFailure(response)                
+    
+    headers = {k: v for k, v in request.headers.items()
+               if k.lower() != 'content-type'}
+    headers.update({'Content-Type': encoder.content_type})
+    
+    response = _request(
+        user_session, method.upper(),
+        request.href,
+        params=request.params,
+        headers=headers,
+        data=encoder)
+    
+    if response.status_code in (200, 201, 202, 204):
+        logger.debug('Success sending file in elapsed time: %s', response.elapsed)
+        return SMCResult(response, user_session=user_session)
+    
+    raise SMCOperationFailure(response)                
+
+
+def iter_response(response, chunk_size=CHUNK_SIZE):
+    """
+    Yield the items of a JSON list response as the body is received.
+    The connection is released to the pool when the generator is
+    exhausted or closed.
+    
+    :param requests.Response response: response obtained with stream=True
+    :param int chunk_size: size of chunks read from the response body
+    :raises SMCConnectionError: connection failed while reading the response
+    :return: generator of result items
+    """
+    try:
+        if response.headers.get('content-type') == 'application/json':
+            for item in iter_items(response.iter_content(chunk_size)):
+                yield item
+    except requests.exceptions.RequestException as e:
+        raise SMCConnectionError('Connection problem to SMC while reading '
+            'response: %s' % e)
+    finally:
+        response.close()
 
     
 class SMCResult(object):
@@ -228,10 +558,12 @@ class SMCResult(object):
     :ivar str content: content if return was application/octet
     :ivar str msg: error message, if set
     :ivar int code: http code
-    :ivar dict json: element full json
+    :ivar dict json: element full json. For a streaming request this is
+        a generator yielding the items of the result list as they are
+        decoded from the response.
     """
 
-    def __init__(self, respobj=None, msg=None, user_session=None):
+    def __init__(self, respobj=None, msg=None, user_session=None, stream=False):
         self.etag = None
         self.href = None
         self.content = None
@@ -239,16 +571,19 @@ class SMCResult(object):
         self.code = None
         self.user_session = user_session
         self.domain = getattr(user_session, 'domain', None)
-        self.json = self._unpack_response(respobj)  # list or dict
+        self.json = self._unpack_response(respobj, stream)  # list or dict
 
-    def _unpack_response(self, response):
+    def _unpack_response(self, response, stream=False):
         if response:
             self.code = response.status_code
             self.href = response.headers.get('location')
             self.etag = response.headers.get('ETag')
+            if stream:
+                return iter_response(response)
             if response.headers.get('content-type') == 'application/json':
                 try:
-                    result = response.json()
+                    with profiling.section('decode'):
+                        result = json_codec(self.user_session).loads(response.content)
                 except ValueError:
                     result = None
                 # Search results return list, direct link fetch
@@ -290,6 +625,4 @@ def debug(response):
     logger.debug('Response content:')
     logger.debug('%s', response.text)
     
-                    
-counters = collections.Counter(
-    {'read': 0, 'create': 0, 'update': 0, 'delete': 0, 'cache': 0})
+
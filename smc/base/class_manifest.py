@@ -0,0 +1,168 @@
+"""
+Element class manifest of typeof to module:class, used to import
+element modules on first lookup. Generated by ``python -m
+smc.base.registry``, do not edit.
+"""
+
+CLASSES = {
+    'access_control_list': 'smc.administration.access_rights:AccessControlList',
+    'active_directory_server': 'smc.administration.user_auth.servers:ActiveDirectoryServer',
+    'address_range': 'smc.elements.network:AddressRange',
+    'admin_domain': 'smc.administration.system:AdminDomain',
+    'admin_user': 'smc.elements.user:AdminUser',
+    'alias': 'smc.elements.network:Alias',
+    'antispoofing_node': 'smc.core.route:Antispoofing',
+    'api_client': 'smc.elements.user:ApiClient',
+    'application_situation': 'smc.elements.service:ApplicationSituation',
+    'as_path_access_list': 'smc.routing.bgp_access_list:ASPathAccessList',
+    'authentication_service': 'smc.administration.user_auth.servers:AuthenticationMethod',
+    'autonomous_system': 'smc.routing.bgp:AutonomousSystem',
+    'backup_task': 'smc.administration.scheduled_tasks:ServerBackupTask',
+    'bgp_connection_profile': 'smc.routing.bgp:BGPConnectionProfile',
+    'bgp_peering': 'smc.routing.bgp:BGPPeering',
+    'bgp_profile': 'smc.routing.bgp:BGPProfile',
+    'category_group_tag': 'smc.elements.other:CategoryTag',
+    'category_tag': 'smc.elements.other:Category',
+    'client_gateway': 'smc.vpn.policy:ClientGateway',
+    'community_access_list': 'smc.routing.bgp_access_list:CommunityAccessList',
+    'correlation_situation': 'smc.elements.situations:CorrelationSituation',
+    'correlation_situation_context': 'smc.elements.situations:CorrelationSituationContext',
+    'country': 'smc.elements.network:Country',
+    'create_system_snapshot_task': 'smc.administration.scheduled_tasks:SystemSnapsotTask',
+    'delete_log_task': 'smc.administration.scheduled_tasks:DeleteLogTask',
+    'delete_old_executed_task': 'smc.administration.scheduled_tasks:DeleteOldRunTask',
+    'delete_old_snapshots_task': 'smc.administration.scheduled_tasks:DeleteOldSnapshotsTask',
+    'disable_unused_admin_task': 'smc.administration.scheduled_tasks:DisableUnusedAdminTask',
+    'dns_relay_profile': 'smc.elements.profiles:DNSRelayProfile',
+    'dns_server': 'smc.elements.servers:DNSServer',
+    'domain_name': 'smc.elements.network:DomainName',
+    'dynamic_netlink': 'smc.elements.netlink:DynamicNetlink',
+    'engine_clusters': 'smc.core.engine:Engine',
+    'ethernet_rule': 'smc.policy.rule:EthernetRule',
+    'ethernet_service': 'smc.elements.service:EthernetService',
+    'expression': 'smc.elements.network:Expression',
+    'extended_community_access_list': 'smc.routing.bgp_access_list:ExtendedCommunityAccessList',
+    'external_bgp_peer': 'smc.routing.bgp:ExternalBGPPeer',
+    'external_endpoint': 'smc.vpn.elements:ExternalEndpoint',
+    'external_gateway': 'smc.vpn.elements:ExternalGateway',
+    'external_ldap_user': 'smc.administration.user_auth.users:ExternalLdapUser',
+    'external_ldap_user_domain': 'smc.administration.user_auth.users:ExternalLdapUserDomain',
+    'external_ldap_user_group': 'smc.administration.user_auth.users:ExternalLdapUserGroup',
+    'fetch_certificate_revocation_task': 'smc.administration.scheduled_tasks:FetchCertificateRevocationTask',
+    'file_filtering_policy': 'smc.policy.file_filtering:FileFilteringPolicy',
+    'file_filtering_rule': 'smc.policy.file_filtering:FileFilteringRule',
+    'filter_expression': 'smc.elements.other:FilterExpression',
+    'fw_cluster': 'smc.core.engines:FirewallCluster',
+    'fw_ipv4_access_rule': 'smc.policy.rule:IPv4Rule',
+    'fw_ipv4_nat_rule': 'smc.policy.rule_nat:IPv4NATRule',
+    'fw_ipv6_access_rule': 'smc.policy.rule:IPv6Rule',
+    'fw_ipv6_nat_rule': 'smc.policy.rule_nat:IPv6NATRule',
+    'fw_policy': 'smc.policy.layer3:FirewallPolicy',
+    'fw_template_policy': 'smc.policy.layer3:FirewallTemplatePolicy',
+    'gateway_certificate': 'smc.administration.certificates.vpn:GatewayCertificate',
+    'gateway_profile': 'smc.vpn.elements:GatewayProfile',
+    'gateway_settings': 'smc.vpn.elements:GatewaySettings',
+    'group': 'smc.elements.group:Group',
+    'host': 'smc.elements.network:Host',
+    'http_proxy': 'smc.elements.servers:HttpProxy',
+    'icmp_ipv6_service': 'smc.elements.service:ICMPIPv6Service',
+    'icmp_service': 'smc.elements.service:ICMPService',
+    'icmp_service_group': 'smc.elements.group:ICMPServiceGroup',
+    'inspection_situation': 'smc.elements.situations:InspectionSituation',
+    'inspection_situation_context': 'smc.elements.situations:InspectionSituationContext',
+    'inspection_template_policy': 'smc.policy.policy:InspectionPolicy',
+    'interface_zone': 'smc.elements.network:Zone',
+    'internal_gateway': 'smc.core.engine:InternalGateway',
+    'internal_user': 'smc.administration.user_auth.users:InternalUser',
+    'internal_user_domain': 'smc.administration.user_auth.users:InternalUserDomain',
+    'internal_user_group': 'smc.administration.user_auth.users:InternalUserGroup',
+    'ip_access_list': 'smc.routing.access_list:IPAccessList',
+    'ip_country_group': 'smc.elements.network:IPCountryGroup',
+    'ip_list': 'smc.elements.network:IPList',
+    'ip_prefix_list': 'smc.routing.prefix_list:IPPrefixList',
+    'ip_service': 'smc.elements.service:IPService',
+    'ip_service_group': 'smc.elements.group:IPServiceGroup',
+    'ips_policy': 'smc.policy.ips:IPSPolicy',
+    'ips_template_policy': 'smc.policy.ips:IPSTemplatePolicy',
+    'ipv6_access_list': 'smc.routing.access_list:IPv6AccessList',
+    'ipv6_prefix_list': 'smc.routing.prefix_list:IPv6PrefixList',
+    'l2_interface_policy': 'smc.policy.interface:InterfacePolicy',
+    'l2_interface_template_policy': 'smc.policy.interface:InterfaceTemplatePolicy',
+    'layer2_ipv4_access_rule': 'smc.policy.rule:IPv4Layer2Rule',
+    'layer2_policy': 'smc.policy.layer2:Layer2Policy',
+    'layer2_template_policy': 'smc.policy.layer2:Layer2TemplatePolicy',
+    'location': 'smc.elements.other:Location',
+    'log_server': 'smc.elements.servers:LogServer',
+    'logical_interface': 'smc.elements.other:LogicalInterface',
+    'mac_address': 'smc.elements.other:MacAddress',
+    'master_engine': 'smc.core.engines:MasterEngineCluster',
+    'match_expression': 'smc.policy.rule_elements:MatchExpression',
+    'mgt_server': 'smc.elements.servers:ManagementServer',
+    'netlink': 'smc.elements.netlink:StaticNetlink',
+    'network': 'smc.elements.network:Network',
+    'ospfv2_area': 'smc.routing.ospf:OSPFArea',
+    'ospfv2_domain_settings': 'smc.routing.ospf:OSPFDomainSetting',
+    'ospfv2_interface_settings': 'smc.routing.ospf:OSPFInterfaceSetting',
+    'ospfv2_key_chain': 'smc.routing.ospf:OSPFKeyChain',
+    'ospfv2_profile': 'smc.routing.ospf:OSPFProfile',
+    'outbound_multilink': 'smc.elements.netlink:Multilink',
+    'physical_interface': 'smc.core.interfaces:PhysicalInterface',
+    'protocol': 'smc.elements.protocols:ProtocolAgent',
+    'proxy_server': 'smc.elements.servers:ProxyServer',
+    'qos_policy': 'smc.policy.qos:QoSPolicy',
+    'rbvpn_tunnel': 'smc.vpn.route:RouteVPN',
+    'rbvpn_tunnel_monitoring_group': 'smc.vpn.route:TunnelMonitoringGroup',
+    'refresh_master_and_virtual_policy_task': 'smc.administration.scheduled_tasks:RefreshMasterEnginePolicyTask',
+    'refresh_policy_task': 'smc.administration.scheduled_tasks:RefreshPolicyTask',
+    'renew_gw_certificates_task': 'smc.administration.scheduled_tasks:RenewGatewayCertificatesTask',
+    'renew_internal_ca_task': 'smc.administration.scheduled_tasks:RenewInternalCATask',
+    'renew_internal_certificates_task': 'smc.administration.scheduled_tasks:RenewInternalCertificatesTask',
+    'report_design': 'smc.administration.reports:ReportDesign',
+    'report_file': 'smc.administration.reports:Report',
+    'report_template': 'smc.administration.reports:ReportTemplate',
+    'role': 'smc.administration.role:Role',
+    'route_map': 'smc.routing.route_map:RouteMap',
+    'route_map_rule': 'smc.routing.route_map:RouteMapRule',
+    'router': 'smc.elements.network:Router',
+    'routing_node': 'smc.core.route:Routing',
+    'rpc_service': 'smc.elements.service:RPCService',
+    'sandbox_data_center': 'smc.elements.profiles:SandboxDataCenter',
+    'sandbox_service': 'smc.elements.profiles:SandboxService',
+    'security_group': 'smc.core.engine_vss:SecurityGroup',
+    'service_group': 'smc.elements.group:ServiceGroup',
+    'sginfo_task': 'smc.administration.scheduled_tasks:SGInfoTask',
+    'single_fw': 'smc.core.engines:Layer3Firewall',
+    'single_ips': 'smc.core.engines:IPS',
+    'single_layer2': 'smc.core.engines:Layer2Firewall',
+    'situation_context_group': 'smc.elements.situations:SituationContextGroup',
+    'situation_tag': 'smc.elements.other:SituationTag',
+    'snmp_agent': 'smc.elements.profiles:SNMPAgent',
+    'sub_ipv4_fw_policy': 'smc.policy.layer3:FirewallSubPolicy',
+    'task_progress': 'smc.administration.tasks:TaskProgress',
+    'tcp_service': 'smc.elements.service:TCPService',
+    'tcp_service_group': 'smc.elements.group:TCPServiceGroup',
+    'tls_certificate_authority': 'smc.administration.certificates.tls:TLSCertificateAuthority',
+    'tls_cryptography_suite_set': 'smc.administration.certificates.tls:TLSCryptographySuite',
+    'tls_inspection_policy': 'smc.elements.other:HTTPSInspectionExceptions',
+    'tls_profile': 'smc.administration.certificates.tls:TLSProfile',
+    'tls_server_credentials': 'smc.administration.certificates.tls:TLSServerCredential',
+    'tls_signing_certificate_authority': 'smc.administration.certificates.tls:ClientProtectionCA',
+    'tunnel_interface': 'smc.core.interfaces:TunnelInterface',
+    'udp_service': 'smc.elements.service:UDPService',
+    'udp_service_group': 'smc.elements.group:UDPServiceGroup',
+    'upload_policy_task': 'smc.administration.scheduled_tasks:UploadPolicyTask',
+    'url_category': 'smc.elements.service:URLCategory',
+    'url_category_group': 'smc.elements.group:URLCategoryGroup',
+    'url_list_application': 'smc.elements.network:URLListApplication',
+    'validate_policy_task': 'smc.administration.scheduled_tasks:ValidatePolicyTask',
+    'virtual_fw': 'smc.core.engines:Layer3VirtualEngine',
+    'virtual_physical_interface': 'smc.core.interfaces:VirtualPhysicalInterface',
+    'virtual_resource': 'smc.core.engine:VirtualResource',
+    'vpn': 'smc.vpn.policy:PolicyVPN',
+    'vpn_certificate_authority': 'smc.administration.certificates.vpn:VPNCertificateCA',
+    'vpn_profile': 'smc.vpn.elements:VPNProfile',
+    'vpn_site': 'smc.vpn.elements:VPNSite',
+    'vss_container': 'smc.core.engine_vss:VSSContainer',
+    'vss_container_node': 'smc.core.engine_vss:VSSContainerNode',
+    'vss_context': 'smc.core.engine_vss:VSSContext',
+}
@@ -18,11 +18,15 @@ See :ref:`collection-reference-label` for examples on search capabilities.
 """
 import re
 import copy
+import logging
 from itertools import islice
 import smc.base.model
 from smc.base.decorators import cached_property, classproperty
 from smc.api.exceptions import FetchElementFailed, InvalidSearchFilter
 from smc.api.common import entry_point
+
+
+logger = logging.getLogger(__name__)
     
 
 class SubElementCollection(object):
@@ -384,6 +388,19 @@ class ElementCollection(object):
         >>> list(query2)
         [Router(name=Router-10.10.10.1)]
 
+    Large result sets can be streamed. The response is decoded as it is
+    received and elements are yielded as soon as they are decoded instead
+    of after the full list is retrieved. Memory use is bounded by the
+    number of elements held by the caller rather than the size of the
+    result::
+    
+        >>> for host in Host.objects.all().stream():
+        ...   ...
+    
+    Large result sets can also be retrieved in pages with ``page``, or in
+    batches with ``batch``. The next page is requested in the background
+    while the current page is processed.
+    
     .. note:: ``exists`` does not perform filtering when using ``filter_key``.
         Results on filter(kwargs) are only done by retrieving the list of
         results or iterating.
@@ -391,33 +408,126 @@ class ElementCollection(object):
     def __init__(self, **params):
         self._params = params
         self._iexact = params.pop('iexact', None)
+        self._stream = params.pop('stream', False)
+        self._page_size = params.pop('page_size', None)
 
     def __iter__(self):
+        return self._iter_elements(
+            stream=self._stream, page_size=self._page_size)
+    
+    def _iter_elements(self, stream=False, page_size=None):
         limit = self._params.pop('limit', None)
         count = 0
         
-        for item in self._list:
-            element = smc.base.model.Element.from_meta(**item)
-            if self._iexact:
-                if all(element.data.get(k) == v for k, v in self._iexact.items()):
+        # Use the cached list if the results were already retrieved
+        fetch = '_list' not in self.__dict__
+        if fetch and page_size:
+            if limit and not self._iexact:
+                page_size = min(page_size, limit)
+                items = self._iter_pages(page_size, limit)
+            else:
+                items = self._iter_pages(page_size)
+        elif fetch and stream:
+            items = self._iter_meta()
+        else:
+            fetch = False
+            items = iter(self._list)
+        
+        try:
+            for item in items:
+                element = smc.base.model.Element.from_meta(**item)
+                if self._iexact:
+                    if all(element.data.get(k) == v for k, v in self._iexact.items()):
+                        yield element
+                        count += 1
+                else:
                     yield element
                     count += 1
-            else:
-                yield element
-                count += 1
-                
-            if limit and count >= limit:
-                return
+                    
+                if limit and count >= limit:
+                    return
+        finally:
+            if fetch: # Release the connection if iteration stopped early
+                items.close()
+    
+    def _request(self, stream=False, **params):
+        params.update(
+            {k:self._params[k] for k in self._params if 'href' not in k})
+        return smc.base.model.prepared_request(
+            FetchElementFailed,
+            href=self._params.get('href'),
+            params=params,
+            stream=stream,
+            ).read().json
+    
+    def _iter_meta(self):
+        """
+        Generator yielding the element meta of each result as it is
+        decoded from the response.
+        """
+        try:
+            items = self._request(stream=True)
+        except FetchElementFailed:
+            return
+        if not items:
+            return
+        try:
+            for item in items:
+                yield item
+        finally:
+            items.close()
+    
+    def _fetch_page(self, offset, page_size):
+        try:
+            page = self._request(limit=page_size, offset=offset) if \
+                page_size else self._request()
+        except FetchElementFailed:
+            page = None
+        return page or []
+    
+    def _iter_pages(self, page_size, limit=None):
+        """
+        Generator yielding the element meta of each result, retrieved
+        in pages of page_size. The next page is fetched by a background
+        thread while the items of the current page are consumed. Paging
+        ends when a page returns less than page_size results, or when
+        `limit` results were retrieved.
+        
+        If the SMC ignores the paging parameters, the remaining results
+        are retrieved in a single request.
+        """
+        from smc.api.executor import RequestExecutor
+        executor = RequestExecutor(max_workers=1)
+        future = executor.call(self._fetch_page, 0, page_size)
+        offset = 0
+        first = None
+        try:
+            while future is not None:
+                page = future.result()
+                future = None
+                if first is not None and page[:1] == [first]:
+                    # Offset ignored, retrieve the remaining results unpaged
+                    logger.warning('Paging is not supported by the SMC for %s, '
+                        'retrieving all results.', self)
+                    page = self._fetch_page(None, None)[offset:]
+                    page_size = None
+                first = page[0] if page else None
+                offset += len(page)
+                if len(page) == page_size and not (limit and offset >= limit):
+                    # Prefetch the next page while this page is consumed
+                    future = executor.call(self._fetch_page, offset,
+                        min(page_size, limit - offset) if limit else page_size)
+                for item in page:
+                    yield item
+        finally:
+            if future is not None:
+                future.cancel()
+            executor.shutdown(wait=False)
     
     @cached_property
     def _list(self):
         try:
-            params = {k:self._params[k] for k in self._params if 'href' not in k}
-            _list = smc.base.model.prepared_request(
-                FetchElementFailed,
-                href=self._params.get('href'),
-                params=params,
-                ).read().json
+            _list = self._request()
         except FetchElementFailed:
             _list = list()
         return _list  
@@ -446,6 +556,10 @@ class ElementCollection(object):
         params = copy.deepcopy(self._params)
         if self._iexact:
             params.update(iexact=self._iexact)
+        if self._stream:
+            params.update(stream=self._stream)
+        if self._page_size:
+            params.update(page_size=self._page_size)
         params.update(**kwargs)
         clone = self.__class__(**params)
         return clone
@@ -469,6 +583,35 @@ class ElementCollection(object):
         """
         return self._clone()
 
+    def stream(self):
+        """
+        Stream the results of this collection. Elements are yielded while
+        the response is received and results are not cached, each
+        iteration sends a new query.
+        
+        :return: :class:`.ElementCollection`
+        """
+        return self._clone(stream=True)
+    
+    def page(self, size):
+        """
+        Retrieve the results in pages of `size` elements. Each page is a
+        separate query to the SMC using the `limit` and `offset` query
+        parameters. The next page is fetched in a background thread while
+        the elements of the current page are processed::
+        
+            for host in Host.objects.all().page(500):
+                ...
+        
+        When combined with ``limit``, no more results than the limit are
+        requested. Note that ``len``, ``count`` and ``exists`` retrieve the
+        full result in a single request.
+        
+        :param int size: number of elements per page
+        :return: :class:`.ElementCollection`
+        """
+        return self._clone(page_size=size)
+
     def filter(self, *filter, **kw):  # @ReservedAssignment
         """
         Filter results for specific element type.
@@ -525,13 +668,15 @@ class ElementCollection(object):
         """
         Iterator returning results in batches. When making more general queries
         that might have larger results, specify a batch result that should be
-        returned with each iteration.
+        returned with each iteration. Each batch is retrieved from the SMC as
+        a page of `num` results and the next page is fetched while the
+        current batch is processed (see :meth:`page`).
         
         :param int num: number of results per iteration
         :return: iterator holding list of results
         """
         self._params.pop('limit', None) # Limit and batch are mutually exclusive
-        it = iter(self)
+        it = self._iter_elements(page_size=num)
         while True:
             chunk = list(islice(it, num))
             if not chunk:
@@ -674,6 +819,14 @@ class CollectionManager(object):
         return self.iterator().batch(num)
     batch.__doc__ = ElementCollection.batch.__doc__
     
+    def stream(self):
+        return self.iterator(stream=True)
+    stream.__doc__ = ElementCollection.stream.__doc__
+    
+    def page(self, size):
+        return self.iterator(page_size=size)
+    page.__doc__ = ElementCollection.page.__doc__
+    
     def limit(self, count):
         return self.iterator(limit=count)
     limit.__doc__ = ElementCollection.limit.__doc__
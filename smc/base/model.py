@@ -57,6 +57,7 @@ from smc.base.structs import NestedDict
 from smc.base.decorators import cached_property, classproperty, exception,\
     create_hook, with_metaclass
 from smc.api.common import SMCRequest, fetch_meta_by_name, fetch_entry_point
+from smc.api import profiling
 from smc.api.exceptions import ElementNotFound, \
     CreateElementFailed, ModificationFailed, ResourceNotFound,\
     DeleteElementFailed, FetchElementFailed, UpdateElementFailed,\
@@ -84,13 +85,45 @@ def LoadElement(href, only_etag=False):
     
     :rtype ElementCache
     """
-    request = SMCRequest(href=href)
-    request.exception = FetchElementFailed
-    result = request.read()
-    if only_etag:
-        return result.etag
-    return ElementCache(
-        result.json, etag=result.etag)
+    with profiling.section('model', 'load'):
+        request = SMCRequest(href=href)
+        request.exception = FetchElementFailed
+        result = request.read()
+        if only_etag:
+            return result.etag
+        return ElementCache(
+            result.json, etag=result.etag)
+
+
+def revalidate_elements(elements, concurrency=1):
+    """
+    Bulk freshness check for elements that have an inflated cache. Each
+    element cache is revalidated using a conditional GET with the stored
+    ETag. Caches that are current are left untouched, caches that are out
+    of date are refreshed in place. Elements that have not yet been loaded
+    are skipped.
+    ::
+
+        engines = list(Engine.objects.all())
+        ...
+        changed = revalidate_elements(engines, concurrency=8)
+
+    :param list elements: elements to check
+    :type elements: list(ElementBase)
+    :param int concurrency: number of conditional requests to run
+        concurrently (default: 1)
+    :return: the elements whose cache was refreshed
+    :rtype: list(ElementBase)
+    """
+    loaded = [element for element in elements if 'data' in vars(element)]
+    if concurrency > 1:
+        from smc.api.executor import map_calls
+        current = map_calls(
+            lambda element: element.revalidate(), loaded, concurrency)
+    else:
+        current = [element.revalidate() for element in loaded]
+    return [element for element, is_current in zip(loaded, current)
+            if not is_current]
 
 
 @create_hook
@@ -138,17 +171,18 @@ def ElementFactory(href, smcresult=None, raise_exc=None):
     :param Exception raise_exc: exception to raise if fetch
         failed
     """
-    if smcresult is None:
-        smcresult = SMCRequest(href=href).read()
-    if smcresult.json:
-        cache = ElementCache(smcresult.json, etag=smcresult.etag)
-        typeof = lookup_class(cache.type)
-        instance = typeof(
-            name=cache.get('name'),
-            href=href,
-            type=cache.type)
-        instance.data = cache
-        return instance
+    with profiling.section('model', 'from_href'):
+        if smcresult is None:
+            smcresult = SMCRequest(href=href).read()
+        if smcresult.json:
+            cache = ElementCache(smcresult.json, etag=smcresult.etag)
+            typeof = lookup_class(cache.type)
+            instance = typeof(
+                name=cache.get('name'),
+                href=href,
+                type=cache.type)
+            instance.data = cache
+            return instance
     if raise_exc and smcresult.msg:
         raise raise_exc(smcresult.msg)
 
@@ -168,6 +202,30 @@ class ElementCache(NestedDict):
             self._etag = LoadElement(href, only_etag=True)
         return self._etag
     
+    def revalidate(self, href):
+        """
+        Revalidate this cache using a conditional GET with the stored
+        ETag. If the element has not changed on the SMC (HTTP 304), the
+        existing payload is kept. Otherwise the cache is refreshed in
+        place with the latest element json and ETag.
+        
+        :param str href: href of the element
+        :raises FetchElementFailed: failed to retrieve the element
+        :return: True if the cache was current, False if refreshed
+        :rtype: bool
+        """
+        request = SMCRequest(href=href)
+        if self._etag is not None:
+            request.headers.update({'If-None-Match': self._etag})
+        request.exception = FetchElementFailed
+        result = request.read()
+        if result.code == 304:
+            return True
+        self.data = result.json if result.json else {}
+        self._etag = result.etag
+        self.__dict__.pop('links', None)
+        return False
+    
     @cached_property
     def links(self):
         return {link['rel']:link['href'] for link in self['link']}
@@ -274,7 +332,7 @@ class ElementMeta(type):
     _map = {}
     def __new__(meta, name, bases, clsdict):  # @NoSelf
         cls = super(ElementMeta, meta).__new__(meta, name, bases, clsdict)
-        if 'typeof' in clsdict:
+        if 'typeof' in clsdict and not clsdict.get('_dynamic'):
             meta._map[clsdict['typeof']] = cls
         return cls
 
@@ -304,7 +362,19 @@ class ElementBase(RequestAction, UnicodeMixin):
     kwargs, href=.... (only partial meta), or meta={.....} (as dict)
 
     If meta is not provided, the meta attribute will be None
+    
+    When the cache is invalidated after an operation, the next access to
+    `data` fetches the full element json again. Set `_revalidate_cache` on
+    the class to keep the stale cache and revalidate it with a conditional
+    GET instead. If the element has not changed, the SMC replies with HTTP
+    304 and the existing payload is re-used. For example, to enable this for
+    engines::
+    
+        Engine._revalidate_cache = True
+    
+    Enable on ElementBase to apply to all element types.
     """
+    _revalidate_cache = False
 
     def __init__(self, **meta):
         meta_as_kw = meta.pop('meta', None)
@@ -330,10 +400,15 @@ class ElementBase(RequestAction, UnicodeMixin):
         :param dict meta: raw dict meta from smc
         :rtype: Element
         """
-        return lookup_class(meta.get('type'))(**meta)
+        with profiling.section('model', 'from_meta'):
+            return lookup_class(meta.get('type'))(**meta)
     
     @cached_property
     def data(self):
+        cache = self.__dict__.pop('_stale_cache', None)
+        if cache is not None:
+            cache.revalidate(self.href)
+            return cache
         return LoadElement(self.href)
 
     @property
@@ -352,17 +427,38 @@ class ElementBase(RequestAction, UnicodeMixin):
                 raise exception(e)
             raise
     
+    def revalidate(self):
+        """
+        Revalidate the element cache using a conditional GET. If the
+        element has not changed on the SMC the existing cache is kept,
+        otherwise it is refreshed with the latest version. If the cache
+        has not been loaded yet, it is loaded.
+        
+        :raises FetchElementFailed: failed to retrieve the element
+        :return: True if the cache was current, False if it was loaded
+            or refreshed
+        :rtype: bool
+        """
+        if 'data' in self.__dict__:
+            return self.data.revalidate(self.href)
+        self.data # Load the cache
+        return False
+    
     def _del_cache(self):
         try:
-            del self.data
-        except AttributeError:
+            cache = self.__dict__.pop('data')
+        except KeyError:
             pass
+        else:
+            if self._revalidate_cache and cache and cache._etag is not None:
+                self._stale_cache = cache
     
     def __getstate__(self):
         state = self.__dict__.copy()
         state.update(data=self.data.data)
-        if '_cache' in state:
-            del state['_cache']
+        for attr in ('_cache', '_stale_cache'):
+            if attr in state:
+                del state[attr]
         return state
 
     def __setstate__(self, state):
@@ -891,19 +987,38 @@ class UserElement(ElementBase):
         return not self.__eq__(other)
 
 
+#: Dynamic classes by (typeof, base class)
+_dynamic_classes = {}
+
+
 def lookup_class(typeof, default=Element):
-    cls = ElementMeta._map.get(typeof, None)
+    """
+    Return the element class for the typeof. The module defining the
+    class is imported on first use, see :mod:`smc.base.registry`. If no
+    class is defined for the typeof, a dynamic class deriving from default
+    is created once and reused.
+    
+    :param str typeof: element type
+    :param default: base class for a dynamic class
+    :rtype: Element
+    """
+    cls = ElementMeta._map.get(typeof)
+    if cls is None:
+        from smc.base import registry
+        cls = registry.find_class(typeof)
     if cls is None: # Create a dynamic class from meta type field
-        attrs = {'typeof': typeof}
         # There are multiple entry points for specific aliases
         # that should derive from the smc.elements.network.Alias
         # class so it has access to Alias class methods like ``resolve``.
         if 'alias' in typeof:
-            default = ElementMeta._map.get('alias')
-        cls_name = '{0}Dynamic'.format(typeof.title())
-        return type(cls_name.replace('_',''), (default,), attrs)
-        
-    return ElementMeta._map.get(typeof, default)
+            default = lookup_class('alias')
+        key = (typeof, default)
+        cls = _dynamic_classes.get(key)
+        if cls is None:
+            cls_name = '{0}Dynamic'.format(typeof.title()).replace('_', '')
+            cls = _dynamic_classes.setdefault(key, type(
+                str(cls_name), (default,), {'typeof': typeof, '_dynamic': True}))
+    return cls
 
 
 class Meta(collections.namedtuple('Meta', 'name href type')):
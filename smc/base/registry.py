@@ -0,0 +1,143 @@
+"""
+Lazy registry of element classes.
+
+Element classes register their `typeof` with
+:class:`smc.base.model.ElementMeta` when their module is imported. Rather
+than importing every module of smc-python when `smc` is imported, the
+module defining the class of a `typeof` is imported on the first lookup,
+using a manifest of `typeof` to `module:class` generated from the source
+tree (:mod:`smc.base.class_manifest`).
+
+The manifest must be regenerated when element classes are added, renamed
+or moved::
+
+    python -m smc.base.registry            # rewrite the manifest
+    python -m smc.base.registry --check    # exit with 1 if out of date
+
+A `typeof` missing from the manifest still resolves to its class once the
+module defining it has been imported; otherwise a dynamic class is used.
+
+Since element modules are no longer imported with `smc`,
+`ElementMeta._map` only holds the classes of modules imported so far.
+Call :func:`import_all` to register every class. On python 3.7+, the
+packages holding element classes import their submodules on first
+attribute access (:func:`lazy_submodules`), so attribute paths such as
+``smc.elements.network.Host`` keep working after ``import smc``. On
+earlier versions, import the module first (``import smc.elements.network``
+or ``from smc.elements.network import Host``).
+"""
+import os
+import sys
+import importlib
+from smc.base.class_manifest import CLASSES
+
+
+#: Packages holding element classes, in registration order
+PACKAGES = ('smc.policy', 'smc.elements', 'smc.routing',
+            'smc.vpn', 'smc.administration', 'smc.core')
+
+
+def find_class(typeof):
+    """
+    Import the module defining the class for typeof, if it is in the
+    manifest, and return the class.
+
+    :param str typeof: element type
+    :return: class or None if typeof is not in the manifest
+    """
+    path = CLASSES.get(typeof)
+    if path is None:
+        return None
+    module, name = path.split(':')
+    return getattr(importlib.import_module(module), name, None)
+
+
+def lazy_submodules(package):
+    """
+    Return a module level `__getattr__` (PEP 562, python 3.7+) for
+    package, importing a submodule of the package on first access as an
+    attribute. Set in the `__init__` of a package::
+
+        __getattr__ = lazy_submodules(__name__)
+
+    :param str package: name of the package
+    :rtype: callable
+    """
+    def __getattr__(name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        module = '%s.%s' % (package, name)
+        try:
+            return importlib.import_module(module)
+        except ImportError as e:
+            if getattr(e, 'name', None) != module:
+                raise # Submodule exists but failed to import
+            raise AttributeError('module %r has no attribute %r' % (
+                package, name))
+    return __getattr__
+
+
+def import_all():
+    """
+    Import all modules defining element classes so every class is
+    registered.
+
+    :return: None
+    """
+    from smc.base.util import import_submodules
+    for package in PACKAGES:
+        import_submodules(package)
+
+
+def generate_manifest():
+    """
+    Import all element modules and return the manifest of typeof
+    to `module:class`.
+
+    :rtype: dict
+    """
+    from smc.base.model import ElementMeta
+    import_all()
+    manifest = {}
+    for typeof, cls in ElementMeta._map.items():
+        module = sys.modules.get(cls.__module__)
+        # Only classes that can be imported by name
+        if getattr(module, cls.__name__, None) is cls:
+            manifest[typeof] = '%s:%s' % (cls.__module__, cls.__name__)
+    return manifest
+
+
+def render_manifest(manifest):
+    lines = [
+        '"""',
+        'Element class manifest of typeof to module:class, used to import',
+        'element modules on first lookup. Generated by ``python -m',
+        'smc.base.registry``, do not edit.',
+        '"""',
+        '',
+        'CLASSES = {']
+    for typeof in sorted(manifest):
+        lines.append("    '%s': '%s'," % (typeof, manifest[typeof]))
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+        'class_manifest.py')
+    content = render_manifest(generate_manifest())
+    if '--check' in argv:
+        with open(path) as f:
+            if f.read() != content:
+                print('%s is out of date, run python -m smc.base.registry' % path)
+                return 1
+        return 0
+    with open(path, 'w') as f:
+        f.write(content)
+    print('Wrote %s' % path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,6 +2,7 @@
 Compatibility for py2 / py3
 """
 import sys
+import threading
 import smc
 
 PY3 = sys.version_info > (3,)
@@ -16,6 +17,74 @@ if PY3:
 else:
     unicode = unicode
 
+try:
+    from contextvars import ContextVar, copy_context
+except ImportError: # Python < 3.7
+    ContextVar = copy_context = None
+
+
+class _ThreadLocalVar(threading.local):
+    """
+    Minimal ContextVar replacement bound to the current thread
+    """
+    value = None
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        token, self.value = self.value, value
+        return token
+
+    def reset(self, token):
+        self.value = token
+
+
+#: Thread local replacements returned by context_var
+_thread_local_vars = []
+
+
+def context_var(name):
+    """
+    Return a ContextVar with a default of None, or a thread local
+    replacement if contextvars is not available (Python < 3.7)
+    """
+    if ContextVar:
+        return ContextVar(name, default=None)
+    var = _ThreadLocalVar()
+    _thread_local_vars.append(var)
+    return var
+
+
+def thread_local_values():
+    """
+    Values of the thread local replacements of context variables in the
+    current thread, restored in another thread with
+    :func:`set_thread_local_values`
+
+    :rtype: list(tuple)
+    """
+    return [(var, var.get()) for var in _thread_local_vars]
+
+
+def set_thread_local_values(values):
+    """
+    Set the thread local replacements of context variables in the current
+    thread from :func:`thread_local_values`.
+
+    :return: tokens to reset the values with :func:`reset_thread_local_values`
+    """
+    return [(var, var.set(value)) for var, value in values]
+
+
+def reset_thread_local_values(tokens):
+    """
+    Reset the values set by :func:`set_thread_local_values`
+    """
+    for var, token in reversed(tokens):
+        var.reset(token)
+
+
 def min_smc_version(version):
     """
     Is version at least the minimum provided
@@ -210,15 +210,24 @@ class Node(SubElement):
                         'contact to file: {}'.format(e))
         return result.content
     
-    def dynamic_element_update(self, name_cache_object):
+    def dynamic_element_update(self, name_cache_object, progress=None):
         """
+        Send a dynamic element update file to the node. The serialized
+        update is streamed to the SMC.
+        
+        :param name_cache_object: object providing serialize(), which
+            returns the update as a string, bytes or open file
+        :param progress: optional callable called with (bytes_sent,
+            total_bytes) during the upload
+        :raises NodeCommandFailed: update failed with reason
         """
         return self.make_request(
             NodeCommandFailed,
             method='create',
             resource='dynamic_element_update',
             headers = {'content-type': 'multipart/form-data'},
-            files = {'update_file': name_cache_object.serialize()})
+            files = {'update_file': name_cache_object.serialize()},
+            progress=progress)
         
     @property
     def interface_status(self):
@@ -27,22 +27,28 @@ class Snapshot(SubElement):
     Snapshot filename will be <snapshot_name>.zip if not specified.
     """
 
-    def download(self, filename=None):
+    def download(self, filename=None, progress=None):
         """
         Download snapshot to filename
 
         :param str filename: fully qualified path including filename .zip
+        :param progress: optional callable called with (bytes_received,
+            total_bytes) during the download
         :raises EngineCommandFailed: IOError occurred downloading snapshot
-        :return: None
+        :return: SHA-256 hex digest of the saved file
+        :rtype: str
         """
         if not filename:
             filename = '{}{}'.format(self.name, '.zip')
         
         try:
-            self.make_request(
+            result = self.make_request(
                 EngineCommandFailed,
+                raw_result=True,
                 resource='content',
-                filename=filename)
+                filename=filename,
+                progress=progress)
+            return result.sha256
 
         except IOError as e:
             raise EngineCommandFailed("Snapshot download failed: {}"
@@ -117,7 +117,7 @@ class NodeWaiter(threading.Thread):
 
         :rtype: bool
         """
-        return self._done.is_set() or not self.isAlive()
+        return self._done.is_set() or not self.is_alive()
 
     def result(self, timeout=None):
         """
@@ -139,7 +139,7 @@ class NodeWaiter(threading.Thread):
         """
         Stop thread if it's still running
         """
-        if self.isAlive():
+        if self.is_alive():
             self._done.set()
 
 
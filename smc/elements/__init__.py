@@ -1 +1,6 @@
 __all__ = []
+
+from smc.base.registry import lazy_submodules
+
+# Submodules are imported on first attribute access, see smc.base.registry
+__getattr__ = lazy_submodules(__name__)
@@ -388,7 +388,7 @@ class IPList(Element):
     """
     typeof = 'ip_list'
 
-    def download(self, filename=None, as_type='zip'):
+    def download(self, filename=None, as_type='zip', progress=None):
         """
         Download the IPList. List format can be either zip, text or
         json. For large lists, it is recommended to use zip encoding.
@@ -396,6 +396,8 @@ class IPList(Element):
 
         :param str filename: Name of file to save to (required for zip)
         :param str as_type: type of format to download in: txt,json,zip (default: zip)
+        :param progress: optional callable called with (bytes_received,
+            total_bytes) while downloading to filename
         :raises IOError: problem writing to destination filename
         :return: None
         """
@@ -416,43 +418,53 @@ class IPList(Element):
                 raw_result=True,
                 resource='ip_address_list',
                 filename=filename,
-                headers=headers)
+                headers=headers,
+                progress=progress)
         
             return result.json if as_type == 'json' else result.content
 
-    def upload(self, filename=None, json=None, as_type='zip'):
+    def upload(self, filename=None, json=None, as_type='zip', progress=None):
         """
         Upload an IPList to the SMC. The contents of the upload
         are not incremental to what is in the existing IPList.
         So if the intent is to add new entries, you should first retrieve
         the existing and append to the content, then upload.
         The only upload type that can be done without loading a file as
-        the source is as_type='json'.
+        the source is as_type='json'. Files are streamed to the SMC.
 
         :param str filename: required for zip/txt uploads
         :param str json: required for json uploads
         :param str as_type: type of format to upload in: txt|json|zip (default)
+        :param progress: optional callable called with (bytes_sent,
+            total_bytes) while uploading filename
         :raises IOError: filename specified cannot be loaded
         :raises CreateElementFailed: element creation failed with reason
         :return: None
         """
         headers = {'content-type': 'multipart/form-data'}
         params = None
-        files = None
-        if filename:
-            files = {'ip_addresses': open(filename, 'rb')}
         if as_type == 'json':
             headers = {'accept': 'application/json',
                        'content-type': 'application/json'}
         elif as_type == 'txt':
             params = {'format': 'txt'}
 
-        self.make_request(
-            CreateElementFailed,
-            method='create',
-            resource='ip_address_list',
-            headers=headers, files=files, json=json,
-            params=params)
+        if not filename:
+            self.make_request(
+                CreateElementFailed,
+                method='create',
+                resource='ip_address_list',
+                headers=headers, json=json,
+                params=params)
+            return
+
+        with open(filename, 'rb') as handle:
+            self.make_request(
+                CreateElementFailed,
+                method='create',
+                resource='ip_address_list',
+                headers=headers, files={'ip_addresses': handle}, json=json,
+                params=params, progress=progress)
 
     @classmethod
     def update_or_create(cls, append_lists=True, with_status=False, **kwargs):
@@ -0,0 +1,4 @@
+from smc.base.registry import lazy_submodules
+
+# Submodules are imported on first attribute access, see smc.base.registry
+__getattr__ = lazy_submodules(__name__)
@@ -0,0 +1,751 @@
+"""
+Local stand-in for the SMC API, used to test and benchmark smc-python
+without an SMC. The server runs in a background thread and implements the
+subset of the SMC API used by smc-python:
+
+* ``/api`` version discovery and the entry point catalog
+* login (API key or login and password) and logout, with session cookies
+* element CRUD with ETags, conditional GET and 409 on a stale ETag
+* element searches by name and type, with paging (`limit` and `offset`)
+* task actions (for example `upload` or `refresh`) returning a `follower`
+  link that reports progress until the task completes, and a task result
+  download supporting `Range` and `If-Range`
+* the monitoring web socket protocol (fetch, fields, records and end),
+  replaying canned records
+* gzip or deflate encoded responses, if `compress_min_size` is set
+
+Latency and errors can be injected to measure retries, re-authentication
+and other behavior offline::
+
+    from smc import session
+    from smc.tests.standin import StandInSMC
+    from smc.elements.network import Host
+
+    with StandInSMC(latency=0.01) as smc_server:
+        session.login(url=smc_server.url, api_key=smc_server.api_key)
+        Host.create(name='myhost', address='1.1.1.1')
+        smc_server.add_fault(status=503, count=2, method='GET',
+            headers={'Retry-After': '0'})
+        smc_server.expire_sessions()
+        ...
+        session.logout()
+
+Elements can be seeded directly, including sub resources returned by a
+link of the element (for example the interfaces of an engine)::
+
+    href = smc_server.add_element('single_fw', {'name': 'fw'},
+        subresources={'physical_interface': [...]})
+
+Run a server from the command line::
+
+    python -m smc.tests.standin --port 8082 --latency 0.02
+"""
+import re
+import sys
+import json
+import time
+import zlib
+import gzip
+import base64
+import socket
+import struct
+import hashlib
+import argparse
+import itertools
+import threading
+import collections
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qs
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qs
+
+
+#: GUID used to compute the web socket handshake accept key
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+#: Entry points returned in addition to the element types
+ENTRY_POINTS = ('elements', 'logout', 'current_user', 'system',
+                'api_client', 'task_progress')
+
+#: Element actions that start a task with a follower link
+TASK_ACTIONS = ('upload', 'refresh', 'export', 'generate_snapshot',
+                'initial_contact', 'update_package', 'backup', 'import')
+
+#: Maximum records sent in a single monitoring message
+RECORD_BATCH = 200
+
+#: Content of a task result download, unless set on the task
+TASK_RESULT = b'stand-in task result'
+
+
+def sample_records(count=10):
+    """
+    Canned monitoring records, as returned with the `texts` format
+    and `pretty` field format.
+
+    :param int count: number of records
+    :rtype: list(dict)
+    """
+    return [{
+        'Creation Time': '2018-01-01 00:%02d:%02d' % (i // 60 % 60, i % 60),
+        'Src Addrs': '10.0.%d.%d' % (i // 256 % 256, i % 256),
+        'Dst Addrs': '192.168.1.%d' % (i % 254 + 1),
+        'Service': 'HTTPS',
+        'Dst Port': '443',
+        'Action': 'Allow',
+        'Sender': 'fw node 1'} for i in range(count)]
+
+
+class Fault(object):
+    """
+    Error injected in responses of the stand-in server. A request matches
+    the fault if the method and path match. Each match decrements `count`;
+    the fault is removed when it reaches 0.
+
+    :param int status: HTTP status code of the response
+    :param int count: number of requests to fail, None for all requests
+    :param str method: HTTP method to match, any method by default
+    :param str path: regular expression matched against the request path,
+        any path by default
+    :param dict headers: headers of the response, for example `Retry-After`
+    :param dict body: JSON body of the response
+    :param float delay: seconds to wait before responding
+    :param bool disconnect: close the connection without a response
+    """
+    def __init__(self, status=503, count=1, method=None, path=None,
+                 headers=None, body=None, delay=0, disconnect=False):
+        self.status = status
+        self.count = count
+        self.method = method.upper() if method else None
+        self.path = re.compile(path) if path else None
+        self.headers = headers or {}
+        self.body = body if body is not None else {
+            'details': ['Fault injected by the stand-in SMC'],
+            'message': 'Injected HTTP %s' % status,
+            'status': status}
+        self.delay = delay
+        self.disconnect = disconnect
+
+    def matches(self, method, path):
+        return (self.method is None or self.method == method) and \
+            (self.path is None or self.path.search(path) is not None)
+
+    def __repr__(self):
+        return 'Fault(status=%s, count=%s, method=%s)' % (
+            self.status, self.count, self.method)
+
+
+class StandInSMC(object):
+    """
+    Stand-in SMC API server.
+
+    :param str host: address to listen on
+    :param int port: port to listen on, a free port by default
+    :param str api_version: API version served
+    :param str api_key: API key accepted by login, any key if None
+    :param float latency: seconds added to each response, and to each
+        monitoring message
+    :param int task_polls: number of follower GETs before a task completes
+    :param int compress_min_size: gzip or deflate encode response bodies of
+        at least this many bytes when the client accepts it, None to never
+        compress
+    :param dict records: canned monitoring records by query location (for
+        example '/monitoring/log/socket') or query definition (for example
+        'BLACKLIST'). Defaults to :func:`sample_records`.
+    """
+    def __init__(self, host='127.0.0.1', port=0, api_version='6.4',
+                 api_key='standin', latency=0, task_polls=2, records=None,
+                 compress_min_size=None):
+        self.api_version = str(api_version)
+        self.api_key = api_key
+        self.latency = latency
+        self.task_polls = task_polls
+        self.compress_min_size = compress_min_size
+        self.records = records if records is not None else {}
+        self.faults = []
+        self.elements = collections.OrderedDict() # href -> element
+        self.sessions = set()
+        self.tasks = {}
+        self.requests = collections.Counter() # method -> count
+        self.logins = 0
+        self.logouts = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+        self._thread = None
+        self._server = _ThreadingHTTPServer((host, port), _handler(self))
+        self.url = 'http://%s:%s' % self._server.server_address[:2]
+        self.add_element('api_client', {'name': 'standin'})
+        self.admin_href = next(iter(self.elements))
+
+    @property
+    def base(self):
+        return '%s/%s' % (self.url, self.api_version)
+
+    def start(self):
+        """
+        Start serving in a background thread
+
+        :return: None
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._server.serve_forever)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stop the server and close the listening socket
+
+        :return: None
+        """
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exctype, value, traceback):
+        self.stop()
+
+    def serve_forever(self):
+        """
+        Serve requests in the current thread until interrupted
+        """
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    @property
+    def entry_points(self):
+        """
+        Entry point catalog served, one entry point per element type of
+        smc-python
+
+        :rtype: list(dict)
+        """
+        try:
+            from smc.base.class_manifest import CLASSES
+            rels = sorted(set(CLASSES) | set(ENTRY_POINTS))
+        except ImportError:
+            rels = sorted(ENTRY_POINTS)
+        return [{'rel': rel, 'href': '%s/elements/%s' % (self.base, rel),
+                 'method': 'GET'} for rel in rels]
+
+    def add_fault(self, status=503, count=1, method=None, path=None, **kw):
+        """
+        Inject an error in the next matching responses.
+
+        :param kw: other arguments of :class:`Fault`
+        :rtype: Fault
+        """
+        fault = Fault(status=status, count=count, method=method, path=path, **kw)
+        with self._lock:
+            self.faults.append(fault)
+        return fault
+
+    def clear_faults(self):
+        with self._lock:
+            del self.faults[:]
+
+    def expire_sessions(self):
+        """
+        Expire all sessions, as after the SMC session timeout. The next
+        request of each session receives HTTP 401.
+
+        :return: None
+        """
+        with self._lock:
+            self.sessions.clear()
+
+    def add_element(self, typeof, data, subresources=None):
+        """
+        Add an element. The element gets a `self` link, links to
+        the task actions and a link to each sub resource.
+
+        :param str typeof: element type
+        :param dict data: element data
+        :param dict subresources: rel to JSON returned by a GET of the
+            link of the rel, and extended by a POST
+        :return: href of the element
+        :rtype: str
+        """
+        with self._lock:
+            key = next(self._ids)
+            href = '%s/elements/%s/%s' % (self.base, typeof, key)
+            element = dict(data, key=key)
+            element['link'] = [{'rel': 'self', 'href': href, 'type': typeof}] + [
+                {'rel': rel, 'href': '%s/%s' % (href, rel), 'method': 'GET'}
+                for rel in TASK_ACTIONS + tuple(subresources or ())]
+            self.elements[href] = {
+                'type': typeof,
+                'data': element,
+                'etag': self._etag(),
+                'subresources': dict(subresources or {})}
+        return href
+
+    def _etag(self):
+        return '"%s"' % hashlib.md5(str(next(self._ids)).encode('utf-8')).hexdigest()
+
+    def _fault(self, method, path):
+        with self._lock:
+            for fault in self.faults:
+                if fault.matches(method, path):
+                    if fault.count is not None:
+                        fault.count -= 1
+                        if fault.count <= 0:
+                            self.faults.remove(fault)
+                    return fault
+        return None
+
+    def _records(self, location, request):
+        query = request.get('query', {})
+        for key in (query.get('definition'), location):
+            if key in self.records:
+                return list(self.records[key])
+        return sample_records()
+
+    def __repr__(self):
+        return 'StandInSMC(url=%s, elements=%s)' % (self.url, len(self.elements))
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def _handler(smc):
+    class Handler(_SMCRequestHandler):
+        server_smc = smc
+    return Handler
+
+
+class _SMCRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_smc = None
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        # Headers and body are written separately, avoid the delayed ACK
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args): # @ReservedAssignment
+        pass
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def do_PUT(self):
+        self.handle_request('PUT')
+
+    def do_DELETE(self):
+        self.handle_request('DELETE')
+
+    def read_body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            data = b''
+            while True:
+                size = int(self.rfile.readline().split(b';')[0].strip(), 16)
+                if not size:
+                    self.rfile.readline()
+                    return data
+                data += self.rfile.read(size)
+                self.rfile.readline()
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def json_body(self):
+        try:
+            return json.loads(self.body.decode('utf-8')) if self.body else None
+        except ValueError:
+            return None
+
+    def send(self, status, body=None, headers=None, content_type='application/json'):
+        if body is None:
+            data = b''
+        elif isinstance(body, bytes):
+            data = body
+        else:
+            data = json.dumps(body).encode('utf-8')
+        data, encoding = self.encode(data)
+        self.send_response(status)
+        if data:
+            self.send_header('Content-Type', content_type)
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+            self.send_header('Vary', 'Accept-Encoding')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def encode(self, data):
+        # Compress with the first accepted coding, gzip preferred
+        min_size = self.server_smc.compress_min_size
+        if min_size is None or len(data) < min_size:
+            return data, None
+        accepted = [coding.split(';')[0].strip().lower() for coding in
+            (self.headers.get('Accept-Encoding') or '').split(',')]
+        if 'gzip' in accepted:
+            return gzip_compress(data), 'gzip'
+        if 'deflate' in accepted:
+            return zlib.compress(data), 'deflate'
+        return data, None
+
+    def session_id(self):
+        match = re.search(r'JSESSIONID=([\w-]+)', self.headers.get('Cookie', ''))
+        return match.group(1) if match else None
+
+    def handle_request(self, method):
+        smc = self.server_smc
+        url = urlparse(self.path)
+        path, self.query = url.path, parse_qs(url.query)
+        self.body = b'' if self.is_websocket() else self.read_body()
+        with smc._lock:
+            smc.requests[method] += 1
+        if smc.latency:
+            time.sleep(smc.latency)
+        fault = smc._fault(method, path)
+        if fault is not None:
+            if fault.delay:
+                time.sleep(fault.delay)
+            if fault.disconnect:
+                self.close_connection = True
+                self.connection.shutdown(socket.SHUT_RDWR)
+                return
+            return self.send(fault.status, fault.body, fault.headers)
+
+        if path == '/api':
+            return self.send(200, {'version': [
+                {'rel': smc.api_version, 'href': '%s/api' % smc.base}]})
+        prefix = '/%s/' % smc.api_version
+        if not path.startswith(prefix):
+            return self.send(404, {'message': 'Unknown API version'})
+        path = path[len(prefix):]
+        if path in ('login', 'lms_login') and method == 'POST':
+            return self.login(path)
+        if path == 'api' and method == 'GET':
+            return self.send(200, {'entry_point': smc.entry_points})
+        if self.session_id() not in smc.sessions:
+            return self.send(401, {'message': 'Unauthorized'})
+        if path.endswith('/socket') and self.is_websocket():
+            return self.websocket('/' + path)
+        if path == 'elements/logout':
+            with smc._lock:
+                smc.sessions.discard(self.session_id())
+                smc.logouts += 1
+            return self.send(204)
+        if path == 'elements/current_user':
+            return self.send(200, {'value': smc.admin_href})
+        match = re.match(r'task/(\d+)(/result)?$', path)
+        if match:
+            return self.task(method, int(match.group(1)), match.group(2))
+        match = re.match(r'elements/(\w+)(?:/(\d+)(?:/(\w+))?)?$', path)
+        if not match:
+            return self.send(404, {'message': 'Not found: %s' % path})
+        typeof, key, rel = match.groups()
+        if key is None:
+            if method == 'GET':
+                return self.search(typeof)
+            if method == 'POST':
+                return self.create(typeof)
+            return self.send(405, {'message': 'Method not allowed'})
+        href = '%s/elements/%s/%s' % (smc.base, typeof, key)
+        element = smc.elements.get(href)
+        if element is None:
+            return self.send(404, {'message': 'Element not found'})
+        if rel is not None:
+            return self.subresource(method, href, element, rel)
+        return self.element(method, href, element)
+
+    def login(self, provider):
+        smc = self.server_smc
+        body = self.json_body() or {}
+        if provider == 'login':
+            valid = smc.api_key is None or body.get('authenticationkey') == smc.api_key
+        else:
+            valid = bool(self.query.get('login') and self.query.get('pwd'))
+        if not valid:
+            return self.send(401, {'message': 'Login failed'})
+        session_id = base64.b16encode(hashlib.sha1(
+            str(next(smc._ids)).encode('utf-8')).digest()[:12]).decode('ascii')
+        with smc._lock:
+            smc.sessions.add(session_id)
+            smc.logins += 1
+        self.send(200, None, {'Set-Cookie': 'JSESSIONID=%s; Path=/' % session_id})
+
+    def search(self, typeof):
+        smc = self.server_smc
+        value = self.query.get('filter', [None])[0]
+        exact = self.query.get('exact_match', ['False'])[0].lower() == 'true'
+        context = self.query.get('filter_context')
+        with smc._lock:
+            items = [(href, element) for href, element in smc.elements.items()
+                if typeof in ('elements', element['type']) and
+                (not context or element['type'] in context)]
+        result = []
+        for href, element in items:
+            name = element['data'].get('name', '')
+            if value and (name != value if exact else value.lower() not in
+                          json.dumps(element['data']).lower()):
+                continue
+            result.append({'name': name, 'href': href, 'type': element['type']})
+        offset = int(self.query.get('offset', [0])[0])
+        if 'limit' in self.query:
+            result = result[offset:offset + int(self.query['limit'][0])]
+        self.send(200, {'result': result})
+
+    def create(self, typeof):
+        smc = self.server_smc
+        data = self.json_body()
+        if not isinstance(data, dict) or not data.get('name'):
+            return self.send(400, {'message': 'Element name is required'})
+        with smc._lock:
+            if any(element['type'] == typeof and element['data'].get('name') ==
+                   data['name'] for element in smc.elements.values()):
+                return self.send(400, {'message': 'Element name %s is already '
+                    'used' % data['name']})
+            href = smc.add_element(typeof, data)
+        self.send(201, None, {'Location': href})
+
+    def element(self, method, href, element):
+        smc = self.server_smc
+        if method == 'GET':
+            if self.headers.get('If-None-Match') == element['etag']:
+                return self.send(304, None, {'ETag': element['etag']})
+            return self.send(200, element['data'], {'ETag': element['etag']})
+        if method == 'PUT':
+            data = self.json_body()
+            with smc._lock:
+                if self.headers.get('Etag') != element['etag']:
+                    return self.send(409, {'message': 'ETag does not match'})
+                if not isinstance(data, dict):
+                    return self.send(400, {'message': 'Invalid element data'})
+                data.update(key=element['data']['key'], link=element['data']['link'])
+                element.update(data=data, etag=smc._etag())
+            return self.send(200, None, {'ETag': element['etag']})
+        if method == 'DELETE':
+            with smc._lock:
+                if self.headers.get('if-match') != element['etag']:
+                    return self.send(409, {'message': 'ETag does not match'})
+                smc.elements.pop(href, None)
+            return self.send(204)
+        self.send(405, {'message': 'Method not allowed'})
+
+    def subresource(self, method, href, element, rel):
+        smc = self.server_smc
+        if rel in TASK_ACTIONS and method == 'POST':
+            with smc._lock:
+                task_id = next(smc._ids)
+                smc.tasks[task_id] = {'polls': 0, 'resource': href, 'type': rel,
+                    'body': self.body}
+            return self.send(202, self.task_status(task_id))
+        if rel not in element['subresources']:
+            return self.send(404, {'message': 'Not found: %s' % rel})
+        if method == 'GET':
+            return self.send(200, element['subresources'][rel])
+        if method == 'POST':
+            with smc._lock:
+                value = element['subresources'][rel]
+                if isinstance(value, list):
+                    value.append(self.json_body())
+                element['etag'] = smc._etag()
+            return self.send(201, None, {'Location': '%s/%s' % (href, rel)})
+        self.send(405, {'message': 'Method not allowed'})
+
+    def task_status(self, task_id):
+        smc = self.server_smc
+        task = smc.tasks[task_id]
+        done = task['polls'] >= smc.task_polls
+        href = '%s/task/%s' % (smc.base, task_id)
+        status = {
+            'follower': href,
+            'type': task['type'],
+            'resource': [task['resource']],
+            'in_progress': not done,
+            'success': done,
+            'progress': 100 if done else 100 * task['polls'] // max(smc.task_polls, 1),
+            'last_message': 'Operation completed' if done else
+                'Operation in progress',
+            'link': [{'rel': 'self', 'href': href}]}
+        if done:
+            status['link'].append({'rel': 'result', 'href': href + '/result'})
+        return status
+
+    def task(self, method, task_id, result):
+        smc = self.server_smc
+        if task_id not in smc.tasks:
+            return self.send(404, {'message': 'Task not found'})
+        if result:
+            return self.download(smc.tasks[task_id].get('result', TASK_RESULT))
+        if method == 'DELETE': # Abort
+            with smc._lock:
+                smc.tasks[task_id]['polls'] = smc.task_polls
+            return self.send(204)
+        with smc._lock:
+            smc.tasks[task_id]['polls'] += 1
+        self.send(200, self.task_status(task_id))
+
+    def download(self, data):
+        """
+        Send a file, or the byte range requested by the `Range` header if
+        the `If-Range` header, if any, matches the ETag of the file.
+        """
+        etag = '"%s"' % hashlib.md5(data).hexdigest()
+        headers = {'ETag': etag, 'Accept-Ranges': 'bytes'}
+        match = re.match(r'bytes=(\d+)-$', self.headers.get('Range', ''))
+        if_range = self.headers.get('If-Range')
+        if match and (if_range is None or if_range == etag):
+            start = int(match.group(1))
+            if start >= len(data):
+                headers.update({'Content-Range': 'bytes */%s' % len(data)})
+                return self.send(416, None, headers)
+            headers.update({'Content-Range': 'bytes %s-%s/%s' % (
+                start, len(data) - 1, len(data))})
+            return self.send(206, data[start:], headers,
+                content_type='application/octet-stream')
+        self.send(200, data, headers, content_type='application/octet-stream')
+
+    def is_websocket(self):
+        return self.headers.get('Upgrade', '').lower() == 'websocket'
+
+    def websocket(self, location):
+        """
+        Monitoring web socket: receive the query, reply with the fetch
+        id, the fields (detailed format), the records in batches and the
+        end message, then wait for the client to abort or close.
+        """
+        smc = self.server_smc
+        key = self.headers.get('Sec-WebSocket-Key', '')
+        accept = base64.b64encode(hashlib.sha1(
+            (key + WEBSOCKET_GUID).encode('ascii')).digest()).decode('ascii')
+        self.send_response(101)
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', accept)
+        self.end_headers()
+        self.wfile.flush()
+        self.close_connection = True
+
+        request = self.ws_receive()
+        if request is None:
+            return
+        fetch_id = next(smc._ids)
+        self.ws_send({'fetch': fetch_id, 'status': 'started'})
+        records = smc._records(location, request)
+        query_format = request.get('format', {})
+        if query_format.get('type') == 'detailed':
+            # Requested field ids are named after the record keys, in order
+            names = sorted(records[0]) if records else []
+            field_ids = query_format.get('field_ids') or range(len(names))
+            self.ws_send({'fetch': fetch_id, 'fields': [
+                {'id': field_id, 'name': name, 'pretty': name} for field_id, name in
+                [(field_id, names[i] if i < len(names) else 'Field %s' % field_id)
+                 for i, field_id in enumerate(field_ids)]]})
+        quantity = request.get('fetch', {}).get('quantity')
+        records = records[:quantity] if quantity is not None else records
+        for start in range(0, len(records), RECORD_BATCH):
+            if smc.latency:
+                time.sleep(smc.latency)
+            chunk = records[start:start + RECORD_BATCH]
+            self.ws_send({'fetch': fetch_id, 'records': chunk
+                if location.endswith('/log/socket') else {'added': chunk}})
+        self.ws_send({'fetch': fetch_id, 'end': 'Fetch completed'})
+        # Wait for the abort message and close frame from the client
+        self.connection.settimeout(5)
+        try:
+            while self.ws_receive() is not None:
+                pass
+        except (socket.error, ValueError):
+            pass
+
+    def ws_receive(self):
+        """
+        Receive a text frame and decode the JSON message. Returns None
+        when the connection is closed.
+        """
+        while True:
+            header = self.rfile.read(2)
+            if len(header) < 2:
+                return None
+            opcode = bytearray(header)[0] & 0x0f
+            length = bytearray(header)[1] & 0x7f
+            masked = bytearray(header)[1] & 0x80
+            if length == 126:
+                length = struct.unpack('!H', self.rfile.read(2))[0]
+            elif length == 127:
+                length = struct.unpack('!Q', self.rfile.read(8))[0]
+            mask = bytearray(self.rfile.read(4)) if masked else None
+            payload = bytearray(self.rfile.read(length))
+            if mask:
+                for i in range(len(payload)):
+                    payload[i] ^= mask[i % 4]
+            if opcode == 0x8: # Close
+                self.ws_frame(bytes(payload[:2]), opcode=0x8)
+                return None
+            if opcode == 0x9: # Ping
+                self.ws_frame(bytes(payload), opcode=0xA)
+                continue
+            if opcode == 0x1:
+                return json.loads(bytes(payload).decode('utf-8'))
+
+    def ws_send(self, message):
+        self.ws_frame(json.dumps(message).encode('utf-8'))
+
+    def ws_frame(self, payload, opcode=0x1):
+        length = len(payload)
+        if length < 126:
+            header = struct.pack('!BB', 0x80 | opcode, length)
+        elif length < 65536:
+            header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+        self.wfile.write(header + payload)
+        self.wfile.flush()
+
+
+def gzip_compress(data):
+    if hasattr(gzip, 'compress'):
+        return gzip.compress(data)
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED,
+        16 + zlib.MAX_WBITS) # Python 2
+    return compressor.compress(data) + compressor.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Local stand-in for the SMC API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8082)
+    parser.add_argument('--api-version', default='6.4')
+    parser.add_argument('--api-key', default='standin',
+        help='API key accepted by login')
+    parser.add_argument('--latency', type=float, default=0,
+        help='seconds added to each response')
+    parser.add_argument('--compress-min-size', type=int,
+        help='compress response bodies of at least this many bytes')
+    args = parser.parse_args(argv)
+    smc = StandInSMC(host=args.host, port=args.port,
+        api_version=args.api_version, api_key=args.api_key,
+        latency=args.latency, compress_min_size=args.compress_min_size)
+    print('Stand-in SMC listening on %s, api_key=%s' % (smc.url, smc.api_key))
+    smc.serve_forever()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
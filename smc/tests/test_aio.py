@@ -0,0 +1,134 @@
+import io
+import time
+import asyncio
+import unittest
+from smc.tests.standin import StandInSMC
+from smc.api.retry import RetryHandler, RetryPolicy, CircuitBreaker
+from smc.api.exceptions import CircuitBreakerOpen, SMCConnectionError
+from smc.elements.network import Host
+
+try:
+    import aiohttp  # @UnusedImport
+    from smc.api import aio
+except (ImportError, SyntaxError):
+    aio = None
+
+
+@unittest.skipIf(aio is None, 'aiohttp is not installed')
+class TestAsyncRetry(unittest.TestCase):
+
+    def setUp(self):
+        self.smc = StandInSMC()
+        self.smc.start()
+        self.loop = asyncio.new_event_loop()
+        self.session = aio.AsyncSession()
+        self.wait(self.session.login(url=self.smc.url, api_key=self.smc.api_key))
+        self.href = self.smc.add_element('host', {'name': 'h', 'address': '1.1.1.1'})
+
+    def tearDown(self):
+        self.wait(self.session.logout())
+        self.loop.close()
+        self.smc.stop()
+
+    def wait(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def read(self):
+        return self.wait(aio.AsyncSMCRequest(
+            href=self.href, user_session=self.session).read())
+
+    def test_retry_after(self):
+        self.session.set_retry_on_busy(total=3, backoff_factor=0.01)
+        self.smc.add_fault(status=503, count=2, method='GET', path='/host/',
+            headers={'Retry-After': '0'})
+        self.assertEqual(self.read().json['name'], 'h')
+        self.assertEqual(self.session.metrics.get(
+            'retries_total', method='GET', rel='host', reason=503), 2)
+
+    def test_no_retry_by_default(self):
+        self.smc.add_fault(status=503, count=1, method='GET', path='/host/')
+        self.assertEqual(self.read().code, 503)
+        self.assertEqual(self.read().json['name'], 'h')
+
+    def test_circuit_breaker(self):
+        self.session.set_retry_handler(RetryHandler(
+            policies={'GET': RetryPolicy(total=0)},
+            circuit_breaker=CircuitBreaker(failure_threshold=2, recovery_timeout=60)))
+        self.smc.add_fault(status=503, count=None, method='GET', path='/host/')
+        for _ in range(2):
+            self.assertEqual(self.read().code, 503)
+        with self.assertRaises(CircuitBreakerOpen):
+            self.read()
+
+    def test_delete_conflict(self):
+        self.wait(aio.AsyncSMCRequest(href=self.href, user_session=self.session,
+            etag='"stale"').delete())
+        self.assertNotIn(self.href, self.smc.elements)
+        self.assertEqual(self.session.metrics.get(
+            'retries_total', method='DELETE', rel='host', reason='conflict'), 1)
+
+    def test_timeout(self):
+        self.session._params['timeout'] = 0.2
+        self.smc.add_fault(status=200, method='GET', path='/host/', delay=1)
+        with self.assertRaises(SMCConnectionError):
+            self.read()
+
+    def test_upload_retried(self):
+        # The multipart body is built again for the retry
+        self.session.set_retry_on_busy(total=2, backoff_factor=0.01)
+        self.smc.add_fault(status=503, method='POST', path='/upload')
+        data = io.BytesIO(b'xx' + b'policy data' * 100)
+        data.seek(2)
+        result = self.wait(aio.AsyncSMCRequest(href=self.href + '/upload',
+            user_session=self.session, files={'file': data}).create())
+        self.assertEqual(result.code, 202)
+        self.assertEqual(self.smc.requests['POST'], 3) # login, 503, upload
+        task, = self.smc.tasks.values()
+        self.assertIn(b'policy data' * 100, task['body'])
+        self.assertNotIn(b'xx', task['body'])
+
+
+@unittest.skipIf(aio is None, 'aiohttp is not installed')
+class TestAsyncCollection(unittest.TestCase):
+
+    def setUp(self):
+        self.smc = StandInSMC()
+        self.smc.start()
+        self.loop = asyncio.new_event_loop()
+        self.session = aio.AsyncSession()
+        self.wait(self.session.login(url=self.smc.url, api_key=self.smc.api_key))
+        for address in ['10.0.0.1'] + ['10.0.0.1%s' % i for i in range(7)]:
+            self.smc.add_element('host', {'name': address, 'address': address})
+
+    def tearDown(self):
+        self.wait(self.session.logout())
+        self.loop.close()
+        self.smc.stop()
+
+    def wait(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def test_filter_loads_concurrently(self):
+        self.smc.latency = 0.1
+        collection = aio.AsyncCollection(Host.objects.filter(address='10.0.0.1'),
+            user_session=self.session)
+        start = time.time()
+        hosts = self.wait(collection.all())
+        # 8 elements of 0.1s loaded at the same time, plus the search
+        self.assertTrue(time.time() - start < 0.5)
+        self.assertEqual([host.name for host in hosts], ['10.0.0.1'])
+
+    def test_filter_concurrency_bound(self):
+        self.smc.latency = 0.1
+        collection = aio.AsyncCollection(Host.objects.filter(address='10.0.0.1'),
+            user_session=self.session, concurrency=2)
+        gets = self.smc.requests['GET']
+        start = time.time()
+        self.assertEqual(self.wait(collection.count()), 1)
+        # 8 elements loaded 2 at a time
+        self.assertTrue(time.time() - start >= 0.5)
+        self.assertEqual(self.smc.requests['GET'] - gets, 9) # search, 8 elements
+
+
+if __name__ == '__main__':
+    unittest.main()
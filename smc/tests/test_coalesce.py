@@ -0,0 +1,137 @@
+import time
+import threading
+import unittest
+from smc.api.session import Session
+from smc.api.common import SMCRequest, session_scope
+from smc.api.coalesce import RequestCoalescer
+from smc.tests.standin import StandInSMC
+
+
+class TestRequestCoalescer(unittest.TestCase):
+
+    def call_in_thread(self, coalescer, key, send, results):
+        def run():
+            try:
+                results.append(coalescer.call(key, send))
+            except Exception as e:
+                results.append(e)
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+
+    def test_key(self):
+        self.assertEqual(RequestCoalescer.key('h', {'a': 1, 'b': 2}),
+            RequestCoalescer.key('h', {'b': '2', 'a': '1'}))
+        self.assertNotEqual(RequestCoalescer.key('h', {'a': 1}),
+            RequestCoalescer.key('h', {'a': 2}))
+        self.assertNotEqual(RequestCoalescer.key('h', headers={'Accept': 'x'}),
+            RequestCoalescer.key('h'))
+
+    def test_shared(self):
+        coalescer = RequestCoalescer()
+        sent = threading.Event()
+        release = threading.Event()
+        def send():
+            sent.set()
+            release.wait(5)
+            return 'response'
+        results = []
+        first = self.call_in_thread(coalescer, 'key', send, results)
+        sent.wait(5)
+        second = self.call_in_thread(coalescer, 'key', lambda: 'other', results)
+        while coalescer._calls['key'].waiters < 1:
+            time.sleep(0.001)
+        release.set()
+        first.join()
+        second.join()
+        self.assertEqual(sorted(results), [('response', False), ('response', True)])
+        self.assertEqual(coalescer.in_flight, 0)
+
+    def test_error_shared(self):
+        coalescer = RequestCoalescer()
+        sent = threading.Event()
+        release = threading.Event()
+        def send():
+            sent.set()
+            release.wait(5)
+            raise ValueError('failed')
+        results = []
+        first = self.call_in_thread(coalescer, 'key', send, results)
+        sent.wait(5)
+        second = self.call_in_thread(coalescer, 'key', lambda: 'other', results)
+        while coalescer._calls['key'].waiters < 1:
+            time.sleep(0.001)
+        release.set()
+        first.join()
+        second.join()
+        self.assertEqual(len(results), 2)
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+
+    def test_forget(self):
+        # A request sent after a write does not join a request in flight
+        coalescer = RequestCoalescer()
+        sent = threading.Event()
+        release = threading.Event()
+        def send():
+            sent.set()
+            release.wait(5)
+            return 'before'
+        results = []
+        first = self.call_in_thread(coalescer, 'key', send, results)
+        sent.wait(5)
+        coalescer.forget()
+        self.assertEqual(coalescer.call('key', lambda: 'after'), ('after', False))
+        release.set()
+        first.join()
+        self.assertEqual(results, [('before', False)])
+
+
+class TestCoalescedRequests(unittest.TestCase):
+
+    def setUp(self):
+        self.smc = StandInSMC(latency=0.2)
+        self.smc.start()
+        self.href = self.smc.add_element('host', {'name': 'h', 'address': '1.1.1.1'})
+        self.session = Session()
+        self.session.login(url=self.smc.url, api_key=self.smc.api_key,
+            pool_maxsize=8)
+
+    def tearDown(self):
+        self.session.logout()
+        self.smc.stop()
+
+    def read(self, results):
+        with session_scope(self.session):
+            results.append(SMCRequest(href=self.href).read())
+
+    def test_concurrent_gets(self):
+        results = []
+        threads = [threading.Thread(target=self.read, args=(results,))
+            for _ in range(5)]
+        gets = self.smc.requests['GET']
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.smc.requests['GET'] - gets, 1)
+        self.assertEqual([r.json['name'] for r in results], ['h'] * 5)
+        # Each caller has it's own result
+        results[0].json['name'] = 'changed'
+        self.assertEqual(results[1].json['name'], 'h')
+        self.assertEqual(self.session.metrics.get('coalesced_requests_total'), 4)
+
+    def test_disabled(self):
+        self.session.coalescer = None
+        results = []
+        threads = [threading.Thread(target=self.read, args=(results,))
+            for _ in range(3)]
+        gets = self.smc.requests['GET']
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.smc.requests['GET'] - gets, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
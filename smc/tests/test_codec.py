@@ -0,0 +1,154 @@
+import sys
+import unittest
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+from smc.api import codec
+from smc.api.codec import JSONCodec, StdlibJSONCodec, get_codec, register_codec
+from smc.api.session import Session
+from smc.api.common import SMCRequest, session_scope
+from smc.base.model import ElementCache
+from smc.tests.standin import StandInSMC
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+ENGINE = {
+    'name': 'fw', 'nodes': [{'firewall_node': {'nodeid': 1, 'name': 'fw node 1'}}],
+    'physicalInterfaces': [{'physical_interface': {'interface_id': '0',
+        'interfaces': [{'single_node_interface': {'address': '1.1.1.1',
+            'network_value': '1.1.1.0/24', 'nodeid': 1}}]}}],
+    'antivirus': {'antivirus_enabled': False}, 'comment': u'\xe5\xe4\xf6'}
+
+
+class RecordingCodec(StdlibJSONCodec):
+    name = 'recording'
+
+    def __init__(self):
+        super(RecordingCodec, self).__init__()
+        self.dumped = []
+        self.loaded = []
+
+    def dumps(self, obj):
+        self.dumped.append(obj)
+        return super(RecordingCodec, self).dumps(obj)
+
+    def loads(self, data):
+        self.loaded.append(data)
+        return super(RecordingCodec, self).loads(data)
+
+
+class CodecTests(object):
+
+    codec = None
+
+    def test_round_trip(self):
+        codec = get_codec(self.codec)
+        self.assertEqual(codec.name, self.codec)
+        data = codec.dumps(ENGINE)
+        self.assertEqual(codec.loads(data), ENGINE)
+        # Decoded from bytes as well as str
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+        self.assertEqual(codec.loads(data), ENGINE)
+
+    def test_element_cache(self):
+        codec = get_codec(self.codec)
+        cache = ElementCache(dict(ENGINE), etag='1')
+        self.assertEqual(codec.loads(codec.dumps(cache)), ENGINE)
+        self.assertEqual(codec.loads(codec.dumps({'engine': cache})),
+            {'engine': ENGINE})
+
+    def test_not_serializable(self):
+        with self.assertRaises(TypeError):
+            get_codec(self.codec).dumps({'a': object()})
+
+
+class TestStdlibCodec(CodecTests, unittest.TestCase):
+    codec = 'json'
+
+
+@unittest.skipIf(orjson is None, 'orjson is not installed')
+class TestOrjsonCodec(CodecTests, unittest.TestCase):
+    codec = 'orjson'
+
+
+class TestGetCodec(unittest.TestCase):
+
+    def setUp(self):
+        self.instances = dict(codec._instances)
+        codec._instances.clear()
+
+    def tearDown(self):
+        codec._instances.clear()
+        codec._instances.update(self.instances)
+        codec._codecs.pop(RecordingCodec.name, None)
+
+    def test_default(self):
+        self.assertIsInstance(get_codec(), StdlibJSONCodec)
+        self.assertIs(get_codec(), get_codec('json'))
+        instance = RecordingCodec()
+        self.assertIs(get_codec(instance), instance)
+
+    def test_unknown(self):
+        with self.assertRaises(ValueError):
+            get_codec('yaml')
+
+    def test_orjson_missing(self):
+        # A None entry in sys.modules makes the import raise ImportError
+        with mock.patch.dict(sys.modules, {'orjson': None}):
+            with mock.patch.object(codec.logger, 'warning') as warning:
+                self.assertIsInstance(get_codec('orjson'), StdlibJSONCodec)
+                self.assertIs(get_codec('orjson'), get_codec('json'))
+        warning.assert_called_once()
+        self.assertEqual(get_codec('orjson').loads(get_codec('orjson').dumps(
+            ENGINE)), ENGINE)
+
+    def test_register(self):
+        register_codec(RecordingCodec)
+        self.assertIsInstance(get_codec('recording'), RecordingCodec)
+        self.assertTrue(issubclass(RecordingCodec, JSONCodec))
+
+
+class TestSessionCodec(unittest.TestCase):
+
+    def setUp(self):
+        register_codec(RecordingCodec)
+        self.smc = StandInSMC()
+        self.smc.start()
+        self.href = self.smc.add_element('host', {'name': 'h', 'address': '1.1.1.1'})
+        self.session = Session()
+
+    def tearDown(self):
+        self.session.logout()
+        self.smc.stop()
+        codec._codecs.pop(RecordingCodec.name, None)
+        codec._instances.pop(RecordingCodec.name, None)
+
+    def test_session_codec(self):
+        self.session.login(url=self.smc.url, api_key=self.smc.api_key,
+            json_codec='recording')
+        recording = self.session.json_codec
+        self.assertIsInstance(recording, RecordingCodec)
+        with session_scope(self.session):
+            result = SMCRequest(href=self.href).read()
+            self.assertEqual(result.json['address'], '1.1.1.1')
+            SMCRequest(href=self.smc.base + '/elements/host',
+                json={'name': 'h2', 'address': '2.2.2.2'}).create()
+        # Responses are decoded from bytes
+        self.assertTrue(recording.loaded)
+        self.assertTrue(all(isinstance(data, bytes) for data in recording.loaded))
+        self.assertEqual(recording.dumped, [{'name': 'h2', 'address': '2.2.2.2'}])
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            self.session.login(url=self.smc.url, api_key=self.smc.api_key,
+                json_codec='yaml')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import time
+import unittest
+from smc.api.session import Session
+from smc.api.common import session_scope
+from smc.tests.standin import StandInSMC
+from smc.elements.network import Host
+
+
+class TestPaging(unittest.TestCase):
+
+    def setUp(self):
+        self.smc = StandInSMC()
+        self.smc.start()
+        for i in range(10):
+            self.smc.add_element('host', {'name': 'host-%s' % i,
+                'address': '10.0.0.%s' % i})
+        self.session = Session()
+        self.session.login(url=self.smc.url, api_key=self.smc.api_key)
+        self.scope = session_scope(self.session)
+        self.scope.__enter__()
+
+    def tearDown(self):
+        self.scope.__exit__(None, None, None)
+        self.session.logout()
+        self.smc.stop()
+
+    def names(self, collection):
+        # Consume slowly so a prefetch in the background is sent
+        names = []
+        for host in collection:
+            names.append(host.name)
+            time.sleep(0.02)
+        return names
+
+    def searches(self):
+        time.sleep(0.1)
+        return self.session.metrics.get('requests_total', method='GET',
+            rel='elements', status=200)
+
+    def test_pages(self):
+        names = [host.name for host in Host.objects.all().page(3)]
+        self.assertEqual(names, ['host-%s' % i for i in range(10)])
+        self.assertEqual(self.searches(), 4)
+
+    def test_limit_no_extra_page(self):
+        # The limit is reached with the first page, no page is prefetched
+        names = self.names(Host.objects.limit(4).page(5))
+        self.assertEqual(names, ['host-%s' % i for i in range(4)])
+        self.assertEqual(self.searches(), 1)
+
+    def test_limit_last_page(self):
+        names = self.names(Host.objects.limit(5).page(2))
+        self.assertEqual(names, ['host-%s' % i for i in range(5)])
+        self.assertEqual(self.searches(), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import json
+import zlib
+import unittest
+from smc.api.compression import decode
+from smc.api.session import Session
+from smc.api.common import SMCRequest, session_scope
+from smc.api.exceptions import SMCConnectionError
+from smc.tests.standin import StandInSMC, gzip_compress
+
+
+ROUTING = {'name': 'fw', 'routing_node': [{'name': 'Interface %s' % i,
+    'nic_id': str(i), 'routing_node': [{'name': 'network-10.%s.0.0/16' % i,
+    'ip': '10.%s.0.0/16' % i, 'level': 'network'}]} for i in range(50)]}
+
+
+def raw_deflate(data):
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED,
+        -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+class TestDecode(unittest.TestCase):
+
+    data = json.dumps(ROUTING).encode('utf-8')
+
+    def test_gzip(self):
+        self.assertEqual(decode(gzip_compress(self.data), 'gzip'), self.data)
+        # Several gzip members are concatenated
+        self.assertEqual(decode(gzip_compress(b'ab') + gzip_compress(b'cd'),
+            'gzip'), b'abcd')
+
+    def test_deflate(self):
+        self.assertEqual(decode(zlib.compress(self.data), 'deflate'), self.data)
+        self.assertEqual(decode(raw_deflate(self.data), 'deflate'), self.data)
+
+    def test_invalid(self):
+        with self.assertRaises(zlib.error):
+            decode(b'not compressed', 'gzip')
+
+
+class TestCompressedResponses(unittest.TestCase):
+
+    def setUp(self):
+        self.smc = StandInSMC(compress_min_size=2000)
+        self.smc.start()
+        self.href = self.smc.add_element('single_fw', ROUTING)
+        self.small = self.smc.add_element('host', {'name': 'h', 'address': '1.1.1.1'})
+        self.session = Session()
+        self.session.login(url=self.smc.url, api_key=self.smc.api_key)
+        self.scope = session_scope(self.session)
+        self.scope.__enter__()
+
+    def tearDown(self):
+        self.scope.__exit__(None, None, None)
+        self.session.logout()
+        self.smc.stop()
+
+    def read(self, href):
+        return SMCRequest(href=href).read()
+
+    def test_decoded(self):
+        # The entry point catalog received at login is compressed
+        metrics = self.session.metrics
+        self.assertTrue(metrics.get('compressed_responses_total') >= 1)
+        metrics.reset()
+
+        result = self.read(self.href)
+        self.assertEqual(result.code, 200)
+        self.assertEqual(result.json['routing_node'], ROUTING['routing_node'])
+        self.assertEqual(self.read(self.small).json['address'], '1.1.1.1')
+
+        self.assertEqual(metrics.get('compressed_responses_total',
+            rel='single_fw', encoding='gzip'), 1)
+        self.assertEqual(metrics.get('compressed_responses_total'), 1)
+        wire = metrics.get('response_wire_bytes_total', rel='single_fw')
+        decoded = metrics.get('response_decoded_bytes_total', rel='single_fw')
+        self.assertTrue(0 < wire < decoded)
+        self.assertAlmostEqual(metrics.compression_ratio(), decoded / float(wire))
+        self.assertTrue(metrics.compression_ratio() > 2)
+        self.assertAlmostEqual(metrics.get('response_compression_ratio',
+            rel='single_fw'), decoded / float(wire))
+        duration, = [sample for sample in metrics.snapshot()['response_decode_seconds']]
+        self.assertEqual(duration['labels'], {'rel': 'single_fw'})
+        self.assertEqual(duration['count'], 1)
+
+    def test_not_compressed(self):
+        # Compression is only requested by the client, not forced
+        self.session.session.headers['Accept-Encoding'] = 'identity'
+        self.session.metrics.reset()
+        self.assertEqual(self.read(self.href).json['name'], 'fw')
+        self.assertEqual(self.session.metrics.get('compressed_responses_total'), 0)
+
+    def test_deflate(self):
+        self.smc.compress_min_size = None # Body is encoded by the fault
+        self.session.metrics.reset()
+        data = json.dumps(ROUTING).encode('utf-8')
+        self.smc.add_fault(status=200, method='GET', path='/single_fw/',
+            headers={'Content-Encoding': 'deflate'}, body=raw_deflate(data))
+        self.assertEqual(self.read(self.href).json, ROUTING)
+        self.assertEqual(self.session.metrics.get('compressed_responses_total',
+            rel='single_fw', encoding='deflate'), 1)
+
+    def test_invalid(self):
+        self.smc.compress_min_size = None
+        self.smc.add_fault(status=200, method='GET', path='/single_fw/',
+            headers={'Content-Encoding': 'gzip'}, body=b'not compressed')
+        with self.assertRaises(SMCConnectionError):
+            self.read(self.href)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import stat
+import shutil
+import tempfile
+import unittest
+from smc.api.diskcache import DiskCache, cache_key
+
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+@unittest.skipIf(os.name == 'nt', 'file modes not supported')
+class TestDiskCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.directory = os.path.join(self.tmp, 'cache', 'smc-python')
+        self.umask = os.umask(0o022)
+
+    def tearDown(self):
+        os.umask(self.umask)
+        shutil.rmtree(self.tmp)
+
+    def test_set_get(self):
+        cache = DiskCache(self.directory, namespace='test')
+        key = cache_key('http://1.1.1.1:8082', '6.5')
+        self.assertIsNone(cache.get(key))
+        cache.set(key, {'session': 'abc'})
+        self.assertEqual(cache.get(key), {'session': 'abc'})
+        self.assertEqual(mode(cache.path(key)), 0o600)
+        cache.delete(key)
+        self.assertIsNone(cache.get(key))
+
+    def test_directory_created_private(self):
+        # Created with mode 0700 regardless of the umask
+        os.umask(0)
+        DiskCache(self.directory).set('key', 1)
+        self.assertEqual(mode(self.directory), 0o700)
+
+    def test_shared_directory_not_used(self):
+        os.makedirs(self.directory)
+        os.chmod(self.directory, 0o755)
+        cache = DiskCache(self.directory)
+        with self.assertLogs('smc.api.diskcache', 'WARNING') as logs:
+            cache.set('key', 1)
+        self.assertIn('0755', logs.output[0])
+        self.assertEqual(os.listdir(self.directory), [])
+        # An entry written by another user is not read
+        with open(cache.path('key'), 'w') as f:
+            f.write('1')
+        self.assertIsNone(cache.get('key'))
+        os.chmod(self.directory, 0o700)
+        self.assertEqual(cache.get('key'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
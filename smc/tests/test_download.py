@@ -0,0 +1,74 @@
+import os
+import shutil
+import hashlib
+import tempfile
+import unittest
+from smc.api.session import Session
+from smc.api.common import SMCRequest, session_scope
+from smc.tests.standin import StandInSMC
+
+
+DATA = b'0123456789' * 100
+
+
+class TestDownload(unittest.TestCase):
+
+    def setUp(self):
+        self.smc = StandInSMC()
+        self.smc.start()
+        self.smc.tasks[1] = {'polls': 0, 'resource': [], 'type': 'export',
+            'result': DATA}
+        self.href = '%s/task/1/result' % self.smc.base
+        self.session = Session()
+        self.session.login(url=self.smc.url, api_key=self.smc.api_key)
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'result.zip')
+
+    def tearDown(self):
+        self.session.logout()
+        self.smc.stop()
+        shutil.rmtree(self.directory)
+
+    def download(self, **kwargs):
+        with session_scope(self.session):
+            result = SMCRequest(href=self.href, filename=self.path, **kwargs).read()
+        with open(self.path, 'rb') as handle:
+            self.assertEqual(handle.read(), DATA)
+        self.assertEqual(result.sha256, hashlib.sha256(DATA).hexdigest())
+        self.assertFalse(os.path.exists(self.path + '.part'))
+        self.assertFalse(os.path.exists(self.path + '.part.validator'))
+        return result
+
+    def partial(self, data, validator=None):
+        with open(self.path + '.part', 'wb') as handle:
+            handle.write(data)
+        if validator:
+            with open(self.path + '.part.validator', 'w') as handle:
+                handle.write(validator)
+
+    def etag(self, data):
+        return '"%s"' % hashlib.md5(data).hexdigest()
+
+    def test_download(self):
+        self.assertEqual(self.download().code, 200)
+
+    def test_resume(self):
+        self.partial(DATA[:300], self.etag(DATA))
+        self.assertEqual(self.download(resume=True).code, 206)
+
+    def test_resume_changed_resource(self):
+        # Partial file of a previous version of the resource
+        self.partial(b'x' * 300, self.etag(b'x' * 1000))
+        self.assertEqual(self.download(resume=True).code, 200)
+
+    def test_resume_without_validator(self):
+        self.partial(b'x' * 300)
+        self.assertEqual(self.download(resume=True).code, 200)
+
+    def test_resume_complete(self):
+        self.partial(DATA, self.etag(DATA))
+        self.assertEqual(self.download(resume=True).code, 206)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import shutil
+import tempfile
+import unittest
+from smc.api.entry_point import Resource
+from smc.api.exceptions import UnsupportedEntryPoint
+from smc.api.session import Session
+from smc.tests.standin import StandInSMC
+
+
+BASE = 'https://smc:8082/6.4'
+
+
+def entry_point(rel):
+    return {'rel': rel, 'href': '%s/elements/%s' % (BASE, rel), 'method': 'GET'}
+
+
+class TestResource(unittest.TestCase):
+
+    def setUp(self):
+        self.reloads = []
+        self.resource = Resource([entry_point('host'), entry_point('network'),
+            {'rel': 'system', 'href': BASE + '/system', 'method': 'GET'}],
+            reload=self.reload)
+
+    def reload(self):
+        self.reloads.append(True)
+        return [entry_point('host'), entry_point('network'), entry_point('router'),
+            {'rel': 'system', 'href': BASE + '/system', 'method': 'GET'}]
+
+    def test_get(self):
+        self.assertEqual(self.resource.get('host'), BASE + '/elements/host')
+        self.assertIn('network', self.resource)
+        self.assertEqual(self.resource.index['system'], BASE + '/system')
+        self.assertEqual(len(self.resource), 3)
+        self.assertFalse(self.reloads)
+
+    def test_rel_of(self):
+        rel_of = self.resource.rel_of
+        self.assertEqual(rel_of(BASE + '/elements/host'), 'host')
+        self.assertEqual(rel_of(BASE + '/elements/host/'), 'host')
+        self.assertEqual(rel_of(BASE + '/elements/host/12/export?format=zip'), 'host')
+        self.assertEqual(rel_of(BASE + '/system/current_policy'), 'system')
+        self.assertIsNone(rel_of(BASE + '/elements/hostname/1'))
+        self.assertIsNone(rel_of(BASE + '/elements/router/1'))
+        self.assertIsNone(rel_of(None))
+
+    def test_reload(self):
+        # A missing rel reloads the catalog once, and rel_of uses the new index
+        self.assertIsNone(self.resource.rel_of(BASE + '/elements/router/1'))
+        self.assertEqual(self.resource.get('router'), BASE + '/elements/router')
+        self.assertEqual(self.resource.rel_of(BASE + '/elements/router/1'), 'router')
+        self.assertEqual(self.resource.rel_of(BASE + '/elements/host/1'), 'host')
+        with self.assertRaises(UnsupportedEntryPoint):
+            self.resource.get('engine_clusters')
+        self.assertEqual(len(self.reloads), 1)
+
+    def test_clear(self):
+        self.resource.clear()
+        self.assertNotIn('host', self.resource)
+        self.assertIsNone(self.resource.rel_of(BASE + '/elements/host/1'))
+        with self.assertRaises(UnsupportedEntryPoint):
+            self.resource.get('host')
+        self.assertFalse(self.reloads)
+
+
+class TestCachedEntryPoints(unittest.TestCase):
+
+    def setUp(self):
+        self.smc = StandInSMC()
+        self.smc.start()
+        self.href = self.smc.add_element('host', {'name': 'h', 'address': '1.1.1.1'})
+        self.directory = tempfile.mkdtemp()
+        self.session = Session()
+
+    def tearDown(self):
+        self.session.logout()
+        self.smc.stop()
+        shutil.rmtree(self.directory)
+
+    def login(self):
+        self.session.login(url=self.smc.url, api_key=self.smc.api_key,
+            resource_cache=self.directory)
+
+    def test_stale_cache(self):
+        self.login()
+        cache = self.session.resource_cache
+        entry_points = cache.get('entry_points')
+        self.assertEqual(entry_points, self.smc.entry_points)
+        # Remove the host entry point, as if cached by an older SMC
+        cache.set('entry_points', [entry for entry in entry_points
+            if entry['rel'] != 'host'])
+        self.session.logout()
+
+        self.login()
+        self.assertIsNone(self.session._resource.rel_of(self.href))
+        self.assertEqual(self.session.entry_points.get('host'),
+            self.smc.base + '/elements/host')
+        self.assertEqual(self.session._resource.rel_of(self.href), 'host')
+        # The reloaded catalog is saved
+        self.assertEqual(cache.get('entry_points'), self.smc.entry_points)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+import json
+import unittest
+from smc.api.jsonstream import iter_items
+from smc.api.session import Session
+from smc.api.common import session_scope
+from smc.tests.standin import StandInSMC
+from smc.elements.network import Host
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestIterItems(unittest.TestCase):
+
+    document = {'result': [
+        {'name': u'héllo wörld', 'href': 'http://1.1.1.1/elements/host/1',
+         'values': [1, -2.5, 1e10, True, False, None], 'nested': {'a': [{}]}},
+        {'name': 'b', 'escaped': 'quote " and \\\\ backslash \\u00e9'},
+        12345, 0.5, 'text', [], {}]}
+
+    def test_every_split(self):
+        # Values, keys, numbers, escapes and multi byte characters split
+        # at every position
+        data = json.dumps(self.document, ensure_ascii=False).encode('utf-8')
+        for size in range(1, 40):
+            self.assertEqual(list(iter_items(chunked(data, size))),
+                self.document['result'], 'chunk size %s' % size)
+
+    def test_number_at_chunk_boundary(self):
+        self.assertEqual(list(iter_items([b'[12', b'34, 5', b'.5e', b'1]'])),
+            [1234, 55.0])
+        self.assertEqual(list(iter_items([b'[1', b'2', b'3]'])), [123])
+
+    def test_top_level_list(self):
+        self.assertEqual(list(iter_items([b' [ {"a": 1} ,', b' {"b": 2} ] '])),
+            [{'a': 1}, {'b': 2}])
+
+    def test_other_members_skipped(self):
+        data = b'{"total": 2, "meta": {"x": [1]}, "result": [1, 2]}'
+        self.assertEqual(list(iter_items(chunked(data, 3))), [1, 2])
+
+    def test_object_without_key(self):
+        self.assertEqual(list(iter_items([b'{"na', b'me": "a"}'])), [{'name': 'a'}])
+        self.assertEqual(list(iter_items([b'{}'])), [])
+
+    def test_empty(self):
+        self.assertEqual(list(iter_items([])), [])
+        self.assertEqual(list(iter_items([b'', b' '])), [])
+        self.assertEqual(list(iter_items([b'{"result": []}'])), [])
+
+    def test_text_chunks(self):
+        self.assertEqual(list(iter_items([u'{"result": [', u'"é"]}'])), [u'é'])
+
+    def test_invalid(self):
+        for data in (b'{"result": [1, 2', b'[1 2]', b'{"result": [1,]}'):
+            with self.assertRaises(ValueError):
+                list(iter_items(chunked(data, 4)))
+
+    def test_lazy(self):
+        # Items are yielded before the rest of the document is read
+        def chunks():
+            yield b'{"result": [{"a": 1}, '
+            raise AssertionError('read past the first item')
+        self.assertEqual(next(iter_items(chunks())), {'a': 1})
+
+
+class TestStreamedCollection(unittest.TestCase):
+
+    def setUp(self):
+        self.smc = StandInSMC()
+        self.smc.start()
+        for i in range(50):
+            self.smc.add_element('host', {'name': 'host-%s' % i,
+                'address': '10.0.0.%s' % i})
+        self.session = Session()
+        self.session.login(url=self.smc.url, api_key=self.smc.api_key)
+
+    def tearDown(self):
+        self.session.logout()
+        self.smc.stop()
+
+    def test_stream(self):
+        with session_scope(self.session):
+            names = [host.name for host in Host.objects.all().stream()]
+        self.assertEqual(names, ['host-%s' % i for i in range(50)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+from smc.api.metrics import MetricsRegistry
+from smc.api.session import Session
+from smc.api.common import SMCRequest, session_scope
+from smc.tests.standin import StandInSMC
+
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = MetricsRegistry()
+        self.metrics.observe_request('GET', 'host', 200, 0.02, bytes_in=100)
+        self.metrics.observe_request('GET', 'host', 200, 0.3, bytes_in=50)
+        self.metrics.observe_request('DELETE', 'host', 409, 0.01)
+        self.metrics.set_gauge('circuit_breaker_state', 1)
+
+    def test_get(self):
+        self.assertEqual(self.metrics.get('requests_total'), 3)
+        self.assertEqual(self.metrics.get('requests_total', method='GET',
+            rel='host', status=200), 2)
+        self.assertEqual(self.metrics.get('requests_total', method='GET'), 0)
+        self.assertEqual(self.metrics.get('response_bytes_total'), 150)
+        self.assertEqual(self.metrics.get('conflicts_total'), 1)
+        self.assertEqual(self.metrics.totals()['requests_total'], 3)
+
+    def test_snapshot(self):
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(sorted(snapshot['requests_total'],
+            key=lambda s: s['labels']['method']), [
+            {'labels': {'method': 'DELETE', 'rel': 'host', 'status': '409'}, 'value': 1},
+            {'labels': {'method': 'GET', 'rel': 'host', 'status': '200'}, 'value': 2}])
+        self.assertEqual(snapshot['circuit_breaker_state'],
+            [{'labels': {}, 'value': 1}])
+        get, = [s for s in snapshot['request_duration_seconds']
+            if s['labels']['method'] == 'GET']
+        self.assertEqual(get['count'], 2)
+        self.assertAlmostEqual(get['sum'], 0.32)
+        self.assertEqual(get['buckets'][0.025], 1)
+        self.assertEqual(get['buckets'][0.5], 2)
+        self.assertEqual(get['buckets'][float('inf')], 2)
+        # A snapshot is a copy
+        self.metrics.reset()
+        self.assertEqual(len(snapshot['requests_total']), 2)
+        self.assertEqual(self.metrics.snapshot(), {})
+
+    def test_prometheus(self):
+        lines = self.metrics.to_prometheus().splitlines()
+        self.assertIn('# HELP smc_requests_total SMC API requests by method, '
+            'entry point and status', lines)
+        self.assertIn('# TYPE smc_requests_total counter', lines)
+        self.assertIn('smc_requests_total{method="GET",rel="host",status="200"} 2',
+            lines)
+        self.assertIn('# TYPE smc_circuit_breaker_state gauge', lines)
+        self.assertIn('smc_circuit_breaker_state 1', lines)
+        self.assertIn('# TYPE smc_request_duration_seconds histogram', lines)
+        self.assertIn('smc_request_duration_seconds_bucket{method="GET",rel="host",'
+            'le="0.025"} 1', lines)
+        self.assertIn('smc_request_duration_seconds_bucket{method="GET",rel="host",'
+            'le="+Inf"} 2', lines)
+        self.assertIn('smc_request_duration_seconds_count{method="GET",rel="host"} 2',
+            lines)
+
+    def test_prometheus_escaping(self):
+        metrics = MetricsRegistry(prefix='test_')
+        metrics.inc('custom', rel='a"b\\c\nd')
+        self.assertIn('test_custom{rel="a\\"b\\\\c\\nd"} 1',
+            metrics.to_prometheus().splitlines())
+
+
+class TestSessionMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.smc = StandInSMC()
+        self.smc.start()
+        self.href = self.smc.add_element('host', {'name': 'h', 'address': '1.1.1.1'})
+        self.session = Session()
+        self.session.login(url=self.smc.url, api_key=self.smc.api_key)
+
+    def tearDown(self):
+        self.session.logout()
+        self.smc.stop()
+
+    def test_requests_recorded(self):
+        self.session.metrics.reset()
+        with session_scope(self.session):
+            for _ in range(3):
+                SMCRequest(href=self.href).read()
+            SMCRequest(href=self.href + '/missing').read()
+        metrics = self.session.metrics
+        self.assertEqual(metrics.get('requests_total', method='GET', rel='host',
+            status=200), 3)
+        self.assertEqual(metrics.get('requests_total', method='GET', rel='host',
+            status=404), 1)
+        self.assertTrue(metrics.get('response_bytes_total') > 0)
+        self.assertEqual(metrics.get('requests_in_flight'), 0)
+        self.assertIn('smc_requests_total{method="GET",rel="host",status="200"} 3',
+            metrics.to_prometheus().splitlines())
+        # Sessions have their own metrics
+        self.assertEqual(Session().metrics.get('requests_total'), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
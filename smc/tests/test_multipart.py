@@ -0,0 +1,129 @@
+import io
+import unittest
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+from smc.api.multipart import MultipartEncoder
+from smc.api.session import Session
+from smc.api.common import SMCRequest, session_scope
+from smc.tests.standin import StandInSMC
+
+
+class ReadCounter(io.BytesIO):
+    """
+    File that records the size of each read.
+    """
+    def __init__(self, *args, **kwargs):
+        super(ReadCounter, self).__init__(*args, **kwargs)
+        self.reads = []
+
+    def read(self, size=-1):
+        self.reads.append(size)
+        return super(ReadCounter, self).read(size)
+
+
+class Unsized(object):
+    """
+    Readable file that can not report its size or be rewound.
+    """
+    def __init__(self, data):
+        self._data = io.BytesIO(data)
+
+    def read(self, size=-1):
+        return self._data.read(size)
+
+
+class TestMultipartEncoder(unittest.TestCase):
+
+    def test_body(self):
+        encoder = MultipartEncoder({'import_file': ('export.zip', b'zipdata',
+            'application/zip'), 'name': 'policy'})
+        body = encoder.read()
+        self.assertIn(encoder.boundary, encoder.content_type)
+        self.assertEqual(len(body), encoder.len)
+        self.assertIn(b'Content-Disposition: form-data; name="import_file"; '
+            b'filename="export.zip"\r\nContent-Type: application/zip\r\n\r\n'
+            b'zipdata\r\n', body)
+        self.assertIn(b'name="name"; filename="name"\r\n\r\npolicy\r\n', body)
+        self.assertTrue(body.endswith(('--%s--\r\n' % encoder.boundary).encode()))
+
+    def test_read_in_chunks(self):
+        data = ReadCounter(b'x' * 1000)
+        progress = []
+        encoder = MultipartEncoder({'file': data}, chunk_size=256,
+            progress=lambda sent, total: progress.append((sent, total)))
+        body = b''.join(iter(lambda: encoder.read(100), b''))
+        self.assertEqual(len(body), encoder.len)
+        self.assertIn(b'x' * 1000, body)
+        self.assertTrue(all(size == 256 for size in data.reads))
+        self.assertEqual(progress[-1], (encoder.len, encoder.len))
+        # Reset rewinds the file to where it was when the encoder was made
+        encoder.reset()
+        self.assertEqual(data.tell(), 0)
+        self.assertEqual(b''.join(encoder), body)
+
+    def test_unknown_size(self):
+        encoder = MultipartEncoder({'file': Unsized(b'data')})
+        self.assertIsNone(encoder.len)
+        self.assertTrue(encoder)
+        self.assertIn(b'\r\n\r\ndata\r\n', b''.join(encoder))
+
+
+class TestUpload(unittest.TestCase):
+
+    def setUp(self):
+        self.smc = StandInSMC()
+        self.smc.start()
+        self.href = self.smc.add_element('fw_policy', {'name': 'policy'})
+        self.session = Session()
+        self.session.login(url=self.smc.url, api_key=self.smc.api_key)
+
+    def tearDown(self):
+        self.session.logout()
+        self.smc.stop()
+
+    def upload(self, files, **kwargs):
+        request = SMCRequest(href=self.href + '/upload', files=files, **kwargs)
+        with session_scope(self.session):
+            return request.create()
+
+    def test_upload_file(self):
+        data = ReadCounter(b'policy data' * 1000)
+        progress = []
+        result = self.upload({'file': data}, chunk_size=1024,
+            progress=lambda sent, total: progress.append(sent))
+        self.assertEqual(result.code, 202)
+        task, = self.smc.tasks.values()
+        self.assertIn(b'policy data' * 1000, task['body'])
+        # The file is read in chunks while the body is sent
+        self.assertTrue(len(data.reads) > 1)
+        self.assertTrue(all(size == 1024 for size in data.reads))
+        self.assertEqual(progress[-1], len(task['body']))
+
+    def test_upload_unsized(self):
+        result = self.upload({'file': Unsized(b'policy data')})
+        self.assertEqual(result.code, 202)
+        task, = self.smc.tasks.values()
+        self.assertIn(b'\r\n\r\npolicy data\r\n', task['body'])
+
+    def test_upload_retried(self):
+        # The encoder is reset and the file sent again from its start
+        self.session.set_retry_on_busy(total=2, backoff_factor=0.01)
+        self.smc.add_fault(status=503, method='POST', path='/upload')
+        data = io.BytesIO(b'xx' + b'policy data' * 100)
+        data.seek(2)
+        posts = self.smc.requests['POST']
+        with mock.patch.object(MultipartEncoder, 'reset', autospec=True,
+                side_effect=MultipartEncoder.reset) as reset:
+            result = self.upload({'file': data})
+        self.assertEqual(reset.call_count, 3) # encoder created, sent, retried
+        self.assertEqual(result.code, 202)
+        self.assertEqual(self.smc.requests['POST'] - posts, 2) # 503, upload
+        task, = self.smc.tasks.values()
+        self.assertIn(b'policy data' * 100, task['body'])
+        self.assertNotIn(b'xx', task['body'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+import smc
+from smc.api.session import Session
+from smc.api.pool import SessionPool, _logout_pools
+from smc.api.common import SMCRequest
+from smc.api.executor import map_requests
+from smc.tests.standin import StandInSMC
+
+
+class TestSessionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.smc = StandInSMC()
+        self.smc.start()
+        self.hrefs = [self.smc.add_element('host', {'name': 'host-%s' % i,
+            'address': '10.0.0.%s' % i}) for i in range(8)]
+        self.manager = smc.manager
+        self.pool = SessionPool(size=3)
+
+    def tearDown(self):
+        self.pool.logout()
+        self.manager.close_all()
+        self.smc.stop()
+
+    def login(self, **kwargs):
+        self.pool.login(url=self.smc.url, api_key=self.smc.api_key, **kwargs)
+
+    def test_distinct_logins_and_logouts(self):
+        self.login()
+        self.assertEqual(self.smc.logins, 3)
+        self.assertEqual(len(set(s.session_id for s in self.pool)), 3)
+        self.assertEqual(len(self.smc.sessions), 3)
+        # Pool sessions are not registered with the session manager
+        self.assertEqual(self.manager.sessions, [])
+        results = map_requests([SMCRequest(href=href) for href in self.hrefs],
+            concurrency=6)
+        self.assertEqual(len(results), 8)
+        self.pool.logout()
+        self.assertEqual(self.smc.logouts, 3)
+        self.assertEqual(len(self.smc.sessions), 0)
+
+    def test_default_session_kept(self):
+        session = Session()
+        session.login(url=self.smc.url, api_key=self.smc.api_key)
+        self.login()
+        self.assertEqual(self.smc.logins, 4)
+        self.assertEqual(self.manager.sessions, [session])
+        self.pool.logout()
+        self.assertEqual(self.smc.logouts, 3)
+        self.assertTrue(session.is_active)
+        self.assertEqual(self.manager.get_default_session(), session)
+        self.assertIn(session.session_id.split('=')[1], self.smc.sessions)
+        self.manager.close_all()
+        self.assertEqual(self.smc.logouts, 4)
+
+    def test_logout_at_exit(self):
+        self.login()
+        _logout_pools()
+        self.assertEqual(self.smc.logouts, 3)
+        self.assertEqual(len(self.pool), 0)
+
+    def test_session_cache_rejected(self):
+        with self.assertRaises(ValueError):
+            self.login(session_cache=True)
+        self.assertEqual(self.smc.logins, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
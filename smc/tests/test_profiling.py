@@ -0,0 +1,72 @@
+import threading
+import unittest
+import smc
+from smc.api import profiling
+from smc.api.session import Session
+from smc.api.common import session_scope
+from smc.base.model import Element
+from smc.tests.standin import StandInSMC
+from smc.elements.network import Host
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.smc = StandInSMC(latency=0.05)
+        self.smc.start()
+        self.hrefs = [self.smc.add_element('host', {'name': 'host-%s' % i,
+            'address': '10.0.0.%s' % i}) for i in range(3)]
+        self.session = Session()
+        self.session.login(url=self.smc.url, api_key=self.smc.api_key)
+        self.scope = session_scope(self.session)
+        self.scope.__enter__()
+
+    def tearDown(self):
+        self.scope.__exit__(None, None, None)
+        self.session.logout()
+        self.smc.stop()
+
+    def test_model_excludes_http(self):
+        # Requests sent while loading elements count as http only
+        with smc.profile(sample_interval=None) as p:
+            hosts = [Element.from_href(href) for href in self.hrefs]
+            for host in Host.objects.all():
+                host.data
+        self.assertEqual([host.name for host in hosts],
+            ['host-0', 'host-1', 'host-2'])
+        self.assertEqual(p.requests, 7)
+        self.assertTrue(p.totals['http'] >= 0.35)
+        self.assertTrue(0 < p.totals['model'] < 0.05)
+        self.assertTrue(sum(p.totals.values()) <= p.wall * 1.01)
+
+    def test_nested_sections(self):
+        with smc.profile(sample_interval=None) as p:
+            with profiling.section('model'):
+                with profiling.section('decode'):
+                    pass
+                with profiling.section('model'):
+                    Element.from_href(self.hrefs[0])
+        self.assertEqual(p.requests, 1)
+        self.assertTrue(p.totals['http'] >= 0.05)
+        self.assertTrue(p.totals['model'] < 0.05)
+        self.assertEqual(p._active[threading.current_thread().ident], [])
+
+    def test_sampled_threads(self):
+        # Sections started and ended in many threads while sampling
+        def run():
+            for _ in range(200):
+                with profiling.section('model', 'thread'):
+                    with profiling.section('decode'):
+                        pass
+        with smc.profile(sample_interval=0.0005) as p:
+            threads = [threading.Thread(target=run) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertTrue(p.stacks)
+        self.assertTrue(all(not frames for frames in p._active.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import threading
+import unittest
+from smc.api.session import Session
+from smc.api.common import SMCRequest, session_scope
+from smc.api.web import REAUTH_RETRIES
+from smc.tests.standin import StandInSMC
+
+
+class TestReauthentication(unittest.TestCase):
+
+    def setUp(self):
+        self.smc = StandInSMC(latency=0.01)
+        self.smc.start()
+        self.href = self.smc.add_element('host', {'name': 'h', 'address': '1.1.1.1'})
+        self.session = Session()
+        self.session.login(url=self.smc.url, api_key=self.smc.api_key)
+
+    def tearDown(self):
+        self.session.logout()
+        self.smc.stop()
+
+    def read(self):
+        with session_scope(self.session):
+            return SMCRequest(href=self.href).read()
+
+    def test_expired_session(self):
+        session_id = self.session.session_id
+        self.smc.expire_sessions()
+        self.assertEqual(self.read().code, 200)
+        self.assertEqual(self.smc.logins, 2)
+        self.assertNotEqual(self.session.session_id, session_id)
+        self.assertEqual(self.session.metrics.get('reauthentications_total'), 1)
+
+    def test_concurrent_expired_session(self):
+        # All threads receive 401 for the expired session, one logs in again
+        threads = 10
+        self.smc.expire_sessions()
+        start = threading.Event()
+        results = []
+
+        def worker():
+            start.wait()
+            results.append(self.read().code)
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        start.set()
+        for thread in workers:
+            thread.join()
+        self.assertEqual(results, [200] * threads)
+        self.assertEqual(self.smc.logins, 2)
+        self.assertEqual(self.smc.logouts, 0)
+        self.assertEqual(len(self.smc.sessions), 1)
+
+    def test_reauth_bounded(self):
+        # A request that keeps failing with 401 logs in a bounded number of times
+        self.smc.add_fault(status=401, count=10, method='GET', path='/host/')
+        result = self.read()
+        self.assertEqual(result.code, 401)
+        self.assertEqual(self.smc.logins, 1 + REAUTH_RETRIES)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import sys
+import unittest
+import subprocess
+import smc
+from smc.base import registry
+from smc.base.class_manifest import CLASSES
+
+
+def run_python(code):
+    # Fresh interpreter, element modules are not imported yet
+    process = subprocess.Popen([sys.executable, '-c', code],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(smc.__file__))))
+    out, err = process.communicate()
+    return process.returncode, out.decode('utf-8'), err.decode('utf-8')
+
+
+class TestRegistry(unittest.TestCase):
+
+    def test_manifest_up_to_date(self):
+        self.assertEqual(registry.main(['--check']), 0)
+
+    def test_lookup_manifest_classes(self):
+        code, out, err = run_python(
+            'from smc.base.model import lookup_class\n'
+            'from smc.base.class_manifest import CLASSES\n'
+            'for typeof, path in sorted(CLASSES.items()):\n'
+            '    cls = lookup_class(typeof)\n'
+            '    if "%s:%s" % (cls.__module__, cls.__name__) != path:\n'
+            '        print("%s: %s" % (typeof, cls))\n')
+        self.assertEqual(code, 0, err)
+        self.assertEqual(out, '')
+
+    def test_lookup_unknown_typeof(self):
+        from smc.base.model import lookup_class, Element
+        cls = lookup_class('no_such_type')
+        self.assertTrue(issubclass(cls, Element))
+        self.assertTrue(cls._dynamic)
+        self.assertIs(lookup_class('no_such_type'), cls)
+        self.assertNotIn('no_such_type', CLASSES)
+
+    def test_import_smc_lazy(self):
+        # Modules only needed once a session is used are not imported
+        code, out, err = run_python(
+            'import sys, smc\n'
+            'session = smc.session\n'
+            'print(" ".join(sorted(sys.modules)))\n'
+            'session.metrics, session.retry_handler, session.coalescer\n'
+            'print(" ".join(sorted(sys.modules)))\n')
+        self.assertEqual(code, 0, err)
+        imported, used = [line.split() for line in out.splitlines()]
+        for module in ('smc.api.metrics', 'smc.api.retry', 'smc.api.coalesce',
+                'smc.api.compression', 'smc.api.diskcache', 'smc.api.entry_point',
+                'smc.api.configloader', 'smc.base.model', 'smc.elements.network'):
+            self.assertNotIn(module, imported)
+        self.assertIn('smc.api.retry', used)
+
+    @unittest.skipIf(sys.version_info < (3, 7), 'requires module __getattr__')
+    def test_lazy_submodules(self):
+        code, out, err = run_python(
+            'import smc\n'
+            'print(smc.elements.network.Host.typeof)\n'
+            'print(smc.administration.user_auth.servers.__name__)\n'
+            'print(hasattr(smc.policy, "no_such_module"))\n')
+        self.assertEqual(code, 0, err)
+        self.assertEqual(out.split(), ['host',
+            'smc.administration.user_auth.servers', 'False'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,217 @@
+import time
+import unittest
+from email.utils import formatdate
+from smc.api.session import Session
+from smc.api.metrics import MetricsRegistry
+from smc.api.common import SMCRequest, session_scope
+from smc.api.exceptions import CircuitBreakerOpen
+from smc.api.retry import RetryHandler, RetryPolicy, CircuitBreaker, \
+    parse_retry_after, default_policies, etag_request
+from smc.tests.standin import StandInSMC
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after('5'), 5.0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after('soon'))
+        wait = parse_retry_after(formatdate(time.time() + 30, usegmt=True))
+        self.assertTrue(25 < wait <= 30)
+        self.assertEqual(parse_retry_after(formatdate(0, usegmt=True)), 0)
+
+    def test_backoff(self):
+        policy = RetryPolicy(backoff_factor=0.5, max_backoff=3)
+        for attempt in range(1, 10):
+            wait = policy.backoff(attempt)
+            self.assertTrue(0 <= wait <= min(3, 0.5 * 2 ** attempt))
+
+    def test_backoff_retry_after(self):
+        class Response(object):
+            headers = {'Retry-After': '2'}
+        policy = RetryPolicy(backoff_factor=0.1, max_backoff=30)
+        self.assertTrue(2 <= policy.backoff(1, Response()) <= 2.1)
+        self.assertEqual(RetryPolicy(max_backoff=1).backoff(1, Response()), 1)
+        wait = RetryPolicy(backoff_factor=0.1, respect_retry_after=False).backoff(
+            1, Response())
+        self.assertTrue(wait <= 0.2)
+
+    def test_default_policies(self):
+        policies = default_policies(total=3, methods=['GET'])
+        self.assertEqual(policies['GET'].total, 3)
+        self.assertEqual(policies['POST'].total, 0)
+        self.assertFalse(policies['POST'].idempotent)
+        self.assertEqual(policies['DELETE'].conflict_retries, 1)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def test_transitions(self):
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0.1)
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+        time.sleep(0.1)
+        # Single trial request once the recovery timeout passed
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        time.sleep(0.1)
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(breaker.failures, 0)
+        self.assertTrue(breaker.allow())
+
+
+class FakeResponse(object):
+
+    def __init__(self, status_code, etag=None):
+        self.status_code = status_code
+        self.headers = {'ETag': etag} if etag else {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession(object):
+    timeout = 10
+
+    def __init__(self):
+        self.metrics = MetricsRegistry()
+
+
+class TestRetryHandler(unittest.TestCase):
+
+    def test_etag_request(self):
+        kwargs = {'headers': {'Accept': 'application/json', 'Etag': '"1"',
+            'content-type': 'application/json', 'X-Auth': 'key'}}
+        self.assertEqual(etag_request(FakeSession(), kwargs), {'headers': {
+            'Accept': 'application/json', 'X-Auth': 'key'}, 'timeout': 10})
+        self.assertEqual(etag_request(FakeSession(), {'timeout': 2}),
+            {'headers': {}, 'timeout': 2})
+
+    def test_conflict_closes_responses(self):
+        sent = []
+        def send(method, url, **kwargs):
+            sent.append((method, kwargs))
+            if method == 'GET':
+                return FakeResponse(200, etag='"2"')
+            return FakeResponse(409 if len(sent) == 1 else 204)
+        response = RetryHandler().send(FakeSession(), send, 'DELETE', 'url',
+            headers={'Accept': 'application/json', 'Etag': '"1"'})
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual([method for method, _ in sent], ['DELETE', 'GET', 'DELETE'])
+        # The GET of the current ETag is sent with the headers and a timeout
+        self.assertEqual(sent[1][1], {'headers': {'Accept': 'application/json'},
+            'timeout': 10})
+        self.assertEqual(sent[2][1]['headers']['if-match'], '"2"')
+
+    def test_trial_interrupted(self):
+        # A trial request failing outside of the transport does not leave
+        # the circuit half open
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+        handler = RetryHandler(circuit_breaker=breaker)
+        breaker.record_failure()
+        time.sleep(0.05)
+        def fail(method, url, **kwargs):
+            raise ValueError('invalid response')
+        with self.assertRaises(ValueError):
+            handler.send(FakeSession(), fail, 'GET', 'url')
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        response = handler.send(FakeSession(),
+            lambda method, url, **kwargs: FakeResponse(200), 'GET', 'url')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+
+class TestRetry(unittest.TestCase):
+
+    def setUp(self):
+        self.smc = StandInSMC()
+        self.smc.start()
+        self.href = self.smc.add_element('host', {'name': 'h', 'address': '1.1.1.1'})
+        self.session = Session()
+        self.session.login(url=self.smc.url, api_key=self.smc.api_key)
+
+    def tearDown(self):
+        self.session.logout()
+        self.smc.stop()
+
+    def request(self, method='GET', **kwargs):
+        with session_scope(self.session):
+            request = SMCRequest(href=kwargs.pop('href', self.href), **kwargs)
+            return request._make_request(method)
+
+    def retries(self, method='GET', **labels):
+        return self.session.metrics.get('retries_total', method=method,
+            rel='host', **labels)
+
+    def test_no_retry_by_default(self):
+        self.smc.add_fault(status=503, method='GET', path='/host/')
+        self.assertEqual(self.request().code, 503)
+        self.assertEqual(self.request().code, 200)
+
+    def test_retry_after(self):
+        self.session.set_retry_on_busy(total=3, backoff_factor=0.01)
+        self.smc.add_fault(status=503, count=2, method='GET', path='/host/',
+            headers={'Retry-After': '0'})
+        self.assertEqual(self.request().json['name'], 'h')
+        self.assertEqual(self.retries(reason=503), 2)
+
+    def test_retries_exhausted(self):
+        self.session.set_retry_on_busy(total=2, backoff_factor=0.01)
+        self.smc.add_fault(status=503, count=None, method='GET', path='/host/')
+        self.assertEqual(self.request().code, 503)
+        self.assertEqual(self.retries(reason=503), 2)
+
+    def test_post_not_retried_on_read_error(self):
+        # The SMC may have received the POST
+        self.session.set_retry_on_busy(total=3, backoff_factor=0.01)
+        self.smc.add_fault(count=1, method='POST', disconnect=True)
+        with self.assertRaises(Exception):
+            self.request('POST', href=self.session.entry_points.get('host'),
+                json={'name': 'h2', 'address': '2.2.2.2'}, exception=IOError)
+        self.assertEqual(self.session.metrics.get('retries_total'), 0)
+
+    def test_get_retried_on_read_error(self):
+        self.session.set_retry_on_busy(total=3, backoff_factor=0.01)
+        self.smc.add_fault(count=1, method='GET', path='/host/', disconnect=True)
+        self.assertEqual(self.request().json['name'], 'h')
+        self.assertEqual(self.retries(reason='ConnectionError'), 1)
+
+    def test_delete_conflict(self):
+        self.assertEqual(self.request('DELETE', etag='"stale"').code, 204)
+        self.assertNotIn(self.href, self.smc.elements)
+        self.assertEqual(self.retries('DELETE', reason='conflict'), 1)
+
+    def test_circuit_breaker(self):
+        self.session.set_retry_handler(RetryHandler(
+            policies={'GET': RetryPolicy(total=0)},
+            circuit_breaker=CircuitBreaker(failure_threshold=2, recovery_timeout=0.2)))
+        fault = self.smc.add_fault(status=503, count=None, method='GET',
+            path='/host/')
+        for _ in range(2):
+            self.assertEqual(self.request().code, 503)
+        with self.assertRaises(CircuitBreakerOpen):
+            self.request()
+        self.assertEqual(self.session.metrics.get(
+            'circuit_breaker_rejections_total'), 1)
+        self.assertEqual(self.session.metrics.get('circuit_breaker_state'),
+            CircuitBreaker.OPEN)
+        # Trial request closes the circuit once the SMC recovered
+        self.smc.faults.remove(fault)
+        time.sleep(0.2)
+        self.assertEqual(self.request().code, 200)
+        self.assertEqual(self.session.metrics.get('circuit_breaker_state'),
+            CircuitBreaker.CLOSED)
+
+
+if __name__ == '__main__':
+    unittest.main()
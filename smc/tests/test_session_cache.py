@@ -0,0 +1,88 @@
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+from smc.api.session import Session, SessionManager
+from smc.api.common import SMCRequest, session_scope
+from smc.tests.standin import StandInSMC
+
+
+class TestSessionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.smc = StandInSMC()
+        self.smc.start()
+        self.href = self.smc.add_element('host', {'name': 'h', 'address': '1.1.1.1'})
+        self.directory = tempfile.mkdtemp()
+        os.chmod(self.directory, 0o700)
+        self.sessions = []
+        self.first = self.login()
+
+    def tearDown(self):
+        for session in self.sessions:
+            if session.session_id:
+                session.session.close()
+        self.smc.stop()
+        shutil.rmtree(self.directory)
+
+    def login(self):
+        # Each session has its own manager, as in a new run of a script
+        session = Session(manager=SessionManager())
+        session.login(url=self.smc.url, api_key=self.smc.api_key,
+            session_cache=self.directory)
+        self.sessions.append(session)
+        return session
+
+    def read(self, session):
+        with session_scope(session):
+            return SMCRequest(href=self.href).read()
+
+    def test_saved(self):
+        self.assertEqual(self.smc.logins, 1)
+        files = [os.path.join(root, name)
+            for root, _, names in os.walk(self.directory) for name in names]
+        self.assertTrue(files)
+        for path in files:
+            self.assertEqual(stat.S_IMODE(os.stat(path).st_mode) & 0o077, 0)
+
+    def test_resume(self):
+        requests = dict(self.smc.requests)
+        session = self.login()
+        # No login, no API version or entry point requests
+        self.assertEqual(self.smc.logins, 1)
+        self.assertEqual(self.smc.requests['POST'], requests.get('POST', 0))
+        # The current user, then the API client element for the session name
+        self.assertEqual(self.smc.requests['GET'], requests.get('GET', 0) + 2)
+        self.assertEqual(session.session_id, self.first.session_id)
+        self.assertEqual(session.api_version, self.first.api_version)
+        self.assertEqual(session.entry_points.get('current_user'),
+            self.first.entry_points.get('current_user'))
+        self.assertEqual(self.read(session).code, 200)
+
+    def test_validated_by_current_user(self):
+        self.smc.add_fault(status=401, method='GET', path='/current_user')
+        session = self.login()
+        self.assertEqual(self.smc.logins, 2)
+        self.assertNotEqual(session.session_id, self.first.session_id)
+
+    def test_expired(self):
+        # The saved session is validated and a full login done if it expired
+        self.smc.expire_sessions()
+        session = self.login()
+        self.assertEqual(self.smc.logins, 2)
+        self.assertNotEqual(session.session_id, self.first.session_id)
+        self.assertEqual(self.read(session).code, 200)
+        # The new session is saved for the next run
+        self.assertEqual(self.login().session_id, session.session_id)
+        self.assertEqual(self.smc.logins, 2)
+
+    def test_logout(self):
+        # The saved session is removed on logout
+        self.first.logout()
+        self.login()
+        self.assertEqual(self.smc.logins, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,218 @@
+import time
+import threading
+import unittest
+from smc import compat
+from smc.api import common, throttle as throttle_module
+from smc.api.session import Session
+from smc.api.common import SMCRequest, session_scope, bind_context
+from smc.api.executor import map_requests, RequestExecutor
+from smc.api.throttle import Throttle, Limit, TokenBucket, lane, current_lane
+from smc.tests.standin import StandInSMC
+from smc.elements.network import Host
+
+
+def wait_until(condition, timeout=5):
+    end = time.time() + timeout
+    while not condition():
+        if time.time() > end:
+            raise AssertionError('Timed out waiting for condition')
+        time.sleep(0.001)
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_burst(self):
+        bucket = TokenBucket(rate=10, burst=2)
+        self.assertEqual(bucket.take(), 0)
+        self.assertEqual(bucket.take(), 0)
+        wait = bucket.take()
+        self.assertTrue(0 < wait <= 0.1)
+        time.sleep(wait)
+        self.assertEqual(bucket.take(), 0)
+
+    def test_capacity(self):
+        self.assertEqual(TokenBucket(rate=0.5).capacity, 1)
+        self.assertEqual(TokenBucket(rate=20).capacity, 20)
+
+    def test_refill_capped(self):
+        bucket = TokenBucket(rate=100, burst=1)
+        time.sleep(0.05)
+        self.assertEqual(bucket.take(), 0)
+        self.assertTrue(bucket.take() > 0)
+
+
+class TestThrottle(unittest.TestCase):
+
+    def test_limit(self):
+        with self.assertRaises(ValueError):
+            Limit(rate=0)
+        with self.assertRaises(ValueError):
+            Limit(concurrency=0)
+        with self.assertRaises(ValueError):
+            with lane('bulk'):
+                pass
+
+    def test_not_throttled(self):
+        throttle = Throttle(write=Limit(concurrency=1))
+        self.assertIsNone(throttle.acquire('GET'))
+        throttle.release(None)
+
+    def test_rate(self):
+        throttle = Throttle(read=Limit(rate=20, burst=1))
+        start = time.time()
+        for _ in range(5):
+            throttle.release(throttle.acquire('GET'))
+        self.assertTrue(time.time() - start >= 0.19)
+
+    def test_concurrency(self):
+        throttle = Throttle(write=Limit(concurrency=1))
+        gate = throttle.acquire('POST')
+        acquired = threading.Event()
+        def run():
+            throttle.release(throttle.acquire('DELETE'))
+            acquired.set()
+        thread = threading.Thread(target=run)
+        thread.start()
+        wait_until(lambda: throttle.queue_depth('write') == 1)
+        self.assertFalse(acquired.is_set())
+        self.assertEqual(throttle.in_flight(), 1)
+        throttle.release(gate)
+        thread.join(5)
+        self.assertTrue(acquired.is_set())
+        self.assertEqual(throttle.in_flight(), 0)
+
+    def test_lane_ordering(self):
+        # Waiting interactive requests are sent before batch requests,
+        # even when the batch requests waited longer
+        throttle = Throttle(read=Limit(concurrency=1))
+        gate = throttle.acquire('GET')
+        order = []
+        def run(name):
+            with lane(name):
+                acquired = throttle.acquire('GET')
+                order.append(name)
+                throttle.release(acquired)
+        threads = []
+        for name in ('batch', 'batch', 'interactive', 'interactive'):
+            thread = threading.Thread(target=run, args=(name,))
+            thread.start()
+            threads.append(thread)
+            waiting = len(threads)
+            wait_until(lambda: throttle.queue_depth() == waiting)
+        self.assertEqual(throttle.queue_depth(lane='batch'), 2)
+        throttle.release(gate)
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(order, ['interactive', 'interactive', 'batch', 'batch'])
+
+    def test_current_lane(self):
+        self.assertEqual(current_lane(), 'interactive')
+        with lane('batch'):
+            self.assertEqual(current_lane(), 'batch')
+            with lane('interactive'):
+                self.assertEqual(current_lane(), 'interactive')
+            self.assertEqual(current_lane(), 'batch')
+        self.assertEqual(current_lane(), 'interactive')
+
+
+class RecordingThrottle(Throttle):
+    """
+    Throttle recording the lane of each request
+    """
+    def __init__(self, **limits):
+        super(RecordingThrottle, self).__init__(**limits)
+        self.lanes = []
+
+    def acquire(self, method, metrics=None):
+        self.lanes.append(current_lane())
+        return super(RecordingThrottle, self).acquire(method, metrics)
+
+
+class TestLanePropagation(unittest.TestCase):
+
+    def call(self, fn):
+        executor = RequestExecutor(max_workers=1)
+        try:
+            return executor.call(fn).result(5)
+        finally:
+            executor.shutdown()
+
+    def test_executor(self):
+        with lane('batch'):
+            self.assertEqual(self.call(current_lane), 'batch')
+        self.assertEqual(self.call(current_lane), 'interactive')
+
+    def test_thread_local_fallback(self):
+        # Python < 3.7: thread local values are copied to the thread
+        session = object()
+        lane_var = compat._ThreadLocalVar()
+        session_var = compat._ThreadLocalVar()
+        saved = (common.copy_context, compat._thread_local_vars,
+            throttle_module._current_lane, common._current_session)
+        common.copy_context = None
+        compat._thread_local_vars = [session_var, lane_var]
+        throttle_module._current_lane = lane_var
+        common._current_session = session_var
+        try:
+            with lane('batch'), session_scope(session):
+                fn = bind_context(lambda: (current_lane(),
+                    common.current_session()))
+            self.assertEqual(self.call(fn), ('batch', session))
+            self.assertEqual(self.call(bind_context(current_lane)),
+                'interactive')
+            # Values are reset in the worker thread once fn returns
+            executor = RequestExecutor(max_workers=1)
+            try:
+                executor.call(fn).result(5)
+                self.assertEqual(executor._executor.submit(
+                    lambda: (lane_var.get(), session_var.get())).result(5),
+                    (None, None))
+            finally:
+                executor.shutdown()
+        finally:
+            (common.copy_context, compat._thread_local_vars,
+                throttle_module._current_lane, common._current_session) = saved
+
+
+class TestThrottledSession(unittest.TestCase):
+
+    def setUp(self):
+        self.smc = StandInSMC(latency=0.1)
+        self.smc.start()
+        self.hrefs = [self.smc.add_element('host', {'name': 'host-%s' % i,
+            'address': '10.0.0.%s' % i}) for i in range(6)]
+        self.session = Session()
+        self.session.login(url=self.smc.url, api_key=self.smc.api_key,
+            throttle=Throttle(read=Limit(concurrency=2)))
+
+    def tearDown(self):
+        self.session.logout()
+        self.smc.stop()
+
+    def test_concurrency(self):
+        start = time.time()
+        with session_scope(self.session):
+            results = map_requests([SMCRequest(href=href) for href in self.hrefs],
+                concurrency=6)
+        self.assertEqual([r.json['name'] for r in results],
+            ['host-%s' % i for i in range(6)])
+        # 6 requests of 0.1s, 2 at a time
+        self.assertTrue(time.time() - start >= 0.3)
+        self.assertEqual(self.session.throttle.in_flight(), 0)
+
+    def test_lane_propagation(self):
+        # Requests sent by executor workers and by the page prefetch of a
+        # collection are in the lane of the caller
+        throttle = RecordingThrottle(read=Limit(concurrency=2))
+        self.session.set_throttle(throttle)
+        with session_scope(self.session), lane('batch'):
+            map_requests([SMCRequest(href=href) for href in self.hrefs],
+                concurrency=3)
+            names = [host.name for host in Host.objects.all().page(2)]
+        self.assertEqual(names, ['host-%s' % i for i in range(6)])
+        self.assertEqual(len(throttle.lanes), 10)
+        self.assertEqual(set(throttle.lanes), set(['batch']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import unittest
+from smc.api import tracing
+from smc.api.session import Session
+from smc.api.common import SMCRequest, session_scope
+from smc.api.exceptions import SMCConnectionError
+from smc.api.executor import RequestExecutor
+from smc.base.model import Element
+from smc.tests.standin import StandInSMC
+
+
+class TestTracing(unittest.TestCase):
+
+    def setUp(self):
+        self.smc = StandInSMC(task_polls=2)
+        self.smc.start()
+        self.href = self.smc.add_element('host', {'name': 'h', 'address': '1.1.1.1'})
+        self.session = Session()
+        self.session.login(url=self.smc.url, api_key=self.smc.api_key)
+        self.scope = session_scope(self.session)
+        self.scope.__enter__()
+        self.calls = []
+        self.hook = None
+
+    def tearDown(self):
+        if self.hook is not None:
+            tracing.remove_request_hook(self.hook)
+        self.scope.__exit__(None, None, None)
+        self.session.logout()
+        self.smc.stop()
+
+    def add_hook(self):
+        self.hook = tracing.add_request_hook(
+            on_request_start=lambda event: self.calls.append(('start', event.status)),
+            on_request_end=lambda event: self.calls.append(('end', event)))
+
+    def test_hooks(self):
+        self.add_hook()
+        SMCRequest(href=self.href).read()
+        SMCRequest(href=self.href + '/missing').read()
+        self.assertEqual([call[0] for call in self.calls],
+            ['start', 'end', 'start', 'end'])
+        self.assertEqual(self.calls[0], ('start', None)) # Not ended yet
+        event = self.calls[1][1]
+        self.assertEqual((event.method, event.href, event.rel, event.status),
+            ('GET', self.href, 'host', 200))
+        self.assertTrue(event.bytes_in > 0)
+        self.assertTrue(event.duration > 0)
+        self.assertIsNone(event.error)
+        self.assertEqual(self.calls[3][1].status, 404)
+
+        tracing.remove_request_hook(self.hook)
+        SMCRequest(href=self.href).read()
+        self.assertEqual(len(self.calls), 4)
+
+    def test_error(self):
+        self.add_hook()
+        self.smc.add_fault(method='GET', path='/host/', disconnect=True)
+        with self.assertRaises(SMCConnectionError):
+            SMCRequest(href=self.href).read()
+        event = self.calls[-1][1]
+        self.assertIsNone(event.status)
+        self.assertIsNotNone(event.error)
+
+    def test_hook_failure(self):
+        # A failing hook does not fail the request or other hooks
+        def fail(event):
+            raise ValueError('hook failed')
+        failing = tracing.add_request_hook(fail, fail)
+        try:
+            self.add_hook()
+            self.assertEqual(SMCRequest(href=self.href).read().code, 200)
+        finally:
+            tracing.remove_request_hook(failing)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_span_tracer(self):
+        exported = []
+        hrefs = [self.href, self.smc.add_element('host', {'name': 'h2'})]
+        with tracing.SpanTracer(exporter=exported.append) as tracer:
+            with tracing.span('operation', element='test') as operation:
+                SMCRequest(href=self.href).read()
+                with RequestExecutor(max_workers=2) as executor:
+                    executor.map([SMCRequest(href=href) for href in hrefs])
+            SMCRequest(href=self.href).read() # Request outside of a span
+        self.assertEqual(exported, [operation, tracer.spans[-1]])
+        self.assertEqual(operation.attributes, {'element': 'test'})
+        # Requests sent in executor threads are nested in the span
+        self.assertEqual([child.name for child in operation.children],
+            ['GET host'] * 3)
+        self.assertEqual(sorted(child.attributes['href']
+            for child in operation.children[1:]), sorted(hrefs))
+        self.assertTrue(all(child.attributes['status'] == 200
+            for child in operation.children))
+        self.assertTrue(operation.duration >= max(
+            child.duration for child in operation.children))
+        self.assertEqual(tracer.spans[-1].name, 'GET host')
+        self.assertIsNone(tracer.spans[-1].parent)
+
+        lines = tracer.timeline(operation).splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[0].startswith('operation  0.0 ms'))
+        self.assertTrue(lines[0].endswith('element=test'))
+        self.assertTrue(lines[1].startswith('  GET host'))
+        self.assertTrue(lines[1].endswith('status=200'))
+        # Spans are not recorded without a tracer
+        with tracing.span('operation') as current:
+            self.assertIsNone(current)
+
+    def test_task_timeline(self):
+        # A task and the requests polling it are grouped under the operation
+        href = self.smc.add_element('fw_policy', {'name': 'policy'})
+        policy = Element.from_href(href)
+        with tracing.SpanTracer() as tracer:
+            poller = policy.upload('fw', timeout=0.01, wait_for_finish=True)
+            poller.wait(5)
+        self.assertTrue(poller.done())
+        root = tracer.spans[-1]
+        self.assertEqual(root.name, 'FirewallPolicy.upload')
+        self.assertEqual(root.attributes, {'element': 'policy'})
+        post, poll = root.children
+        self.assertEqual(post.name, 'POST fw_policy')
+        self.assertEqual(post.attributes['status'], 202)
+        self.assertEqual(poll.name, 'Task poll')
+        self.assertEqual([child.name for child in poll.children],
+            ['GET other'] * self.smc.task_polls)
+        self.assertTrue(all(span.duration is not None for _, span in root.walk()))
+
+    def test_tracer_installed_once(self):
+        with tracing.SpanTracer():
+            with self.assertRaises(ValueError):
+                tracing.SpanTracer().install()
+
+
+if __name__ == '__main__':
+    unittest.main()